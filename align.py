@@ -4,6 +4,7 @@ import logging
 import os
 
 from packager.aligner import Aligner
+from packager.metrics import METRICS, profile
 
 logging.basicConfig(level=logging.INFO)
 LOGGER = logging.getLogger(__name__)
@@ -47,11 +48,29 @@ def run():
         type=dir_path,
         default="output_align"
     )
+    parser.add_argument(
+        "-jobs",
+        help="Number of Worker Processes Aligning File Pairs in Parallel",
+        dest="jobs",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "-profile",
+        "--profile",
+        help="Profile the Run (cProfile + tracemalloc) - Writes align.prof",
+        dest="profile",
+        action="store_true",
+    )
 
     args = parser.parse_args()
 
-    aligner = Aligner(glob(args.input_english), glob(args.input_russian), args.output_align)
-    aligner.align()
+    try:
+        with profile(args.profile, "align"):
+            aligner = Aligner(glob(args.input_english), glob(args.input_russian), args.output_align, args.jobs)
+            aligner.align()
+    finally:
+        METRICS.report()
 
 
 if __name__ == "__main__":
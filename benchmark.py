@@ -0,0 +1,745 @@
+import argparse
+from datetime import datetime, timezone
+from glob import glob
+import json
+import logging
+import os
+import platform
+import random
+import re
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+import main
+from packager.aligner import Aligner
+from packager.backends import Backend, HttpJsonBackend
+from packager.cache import TranslationMemory
+from packager import rx
+from packager.engine import TranslationEngine
+from packager.glossary import Glossary
+from packager.repacker import Repacker
+from packager.segment import TRANSLATE_TYPE_BY_TAG, TranslateType
+from packager.stub_server import StubServer
+from packager.synthetic import (
+    generate_glossary,
+    generate_index_rows,
+    generate_string_table,
+    generate_translation,
+)
+from packager.unpacker import Unpacker
+
+logging.basicConfig(level=logging.WARNING)
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+
+class StubBackend(Backend):
+    """
+    In-process backend - upper-cases text after a fixed latency and counts requests.
+    """
+    name = "stub"
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.requests = 0
+        self.characters = 0
+        self.lock = threading.Lock()
+
+    def translate_batch(self, texts: List[str]) -> List[str]:
+        with self.lock:
+            self.requests = self.requests + 1
+            self.characters = self.characters + sum(len(t) for t in texts)
+
+        time.sleep(self.latency)
+        return [text.upper() for text in texts]
+
+
+def measure(stage: str, function: Callable[[], int], size_bytes: int) -> Dict:
+    """
+    Time function, then run it again under tracemalloc for its peak memory - tracing slows the run down.
+    :param function: Stage under test returning the number of segments/rows it processed
+    """
+    time_start = time.perf_counter()
+    cpu_start = time.process_time()
+    items = function()
+    wall = time.perf_counter() - time_start
+    cpu = time.process_time() - cpu_start
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "stage": stage,
+        "bytes": size_bytes,
+        "items": items,
+        "wall_s": round(wall, 4),
+        "cpu_s": round(cpu, 4),
+        "throughput_mb_s": round(size_bytes / 2 ** 20 / wall, 3) if wall else None,
+        "items_s": round(items / wall, 1) if wall else None,
+        "peak_memory_mb": round(peak / 2 ** 20, 3),
+    }
+    LOGGER.info(
+        f"{stage}: "
+        f"Size: {size_bytes / 2 ** 20:.1f}MB "
+        f"Items: {items} "
+        f"Wall: {wall:.3f}s "
+        f"CPU: {cpu:.3f}s "
+        f"Throughput: {result['throughput_mb_s']}MB/s "
+        f"Peak Memory: {result['peak_memory_mb']}MB"
+    )
+    return result
+
+
+def bench_translate(
+    filenames: List[str],
+    latency: float,
+    cache: Optional[TranslationMemory] = None,
+    concurrency: int = 1,
+):
+    wall_total = 0.0
+    for filename in filenames:
+        with open(filename, "r", encoding="windows-1251") as input_fp:
+            file_contents = input_fp.readlines()
+
+        backend = StubBackend(latency)
+        engine = TranslationEngine(backend.translate_batch, concurrency)
+        time_start = time.perf_counter()
+        main.process_text(file_contents, engine, cache)
+        wall = time.perf_counter() - time_start
+        wall_total = wall_total + wall
+
+        LOGGER.info(
+            f"|{os.path.basename(filename)}| "
+            f"Requests: {backend.requests} "
+            f"Characters: {backend.characters} "
+            f"Wall: {wall:.3f}s"
+        )
+
+    LOGGER.info(f"Files: {len(filenames)} - Total Wall: {wall_total:.3f}s")
+
+
+def bench_http(filenames: List[str], stub: StubServer, concurrency: int = 1):
+    """
+    main.process_text through the http backend against the stub server - one backend for every file,
+    so keep-alive connections are reused across files. Retries show the cost of the injected faults.
+    """
+    with stub, HttpJsonBackend(stub.url, pool_size=concurrency) as backend:
+        engine = TranslationEngine(backend.translate_batch, concurrency)
+        time_start = time.perf_counter()
+        for filename in filenames:
+            with open(filename, "r", encoding="windows-1251") as input_fp:
+                main.process_text(input_fp.readlines(), engine)
+        wall = time.perf_counter() - time_start
+
+    LOGGER.info(
+        f"Files: {len(filenames)} "
+        f"Requests: {engine.requests} "
+        f"Retries: {engine.retries} "
+        f"Connections Opened: {backend.connections_opened} "
+        f"Characters: {stub.stats['characters']} "
+        f"Wall: {wall:.3f}s "
+        f"Requests/s: {engine.requests / wall:.1f}"
+    )
+    LOGGER.info(
+        "Injected Faults: "
+        f"Errors: {stub.stats['errors']} "
+        f"Rate Limits: {stub.stats['rate_limits']} "
+        f"Disconnects: {stub.stats['disconnects']}"
+    )
+
+
+def bench_unpack(filename: str, partition: bool) -> Dict:
+    def unpack() -> int:
+        with tempfile.TemporaryDirectory() as dir_output:
+            segments, _ = Unpacker(filename, dir_output, dir_output, partition).unpack()
+        return segments
+
+    return measure("unpack", unpack, os.path.getsize(filename))
+
+
+def bench_repack(filename: str) -> List[Dict]:
+    """
+    Repack one string table through the decoded text path & the bytes fast path.
+    Peak memory is the Python heap - pages of the memory-mapped base are not counted.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as dir_bench:
+        Unpacker(filename, dir_bench, dir_bench).unpack()
+        root = os.path.basename(filename).split(".")[0]
+        with open(os.path.join(dir_bench, f"{root}_unpacked.txt"), "r", encoding="windows-1251") as unpacked_fp:
+            rows_translated = generate_translation(unpacked_fp, mangle_ratio=0)
+        filename_translate = os.path.join(dir_bench, f"{root}_translate.txt")
+        with open(filename_translate, "w") as translate_fp:
+            translate_fp.writelines(rows_translated)
+
+        for stage, is_bytes_mode in (("repack - text", False), ("repack - bytes", True)):
+            def repack() -> int:
+                Repacker(filename, filename_translate, dir_bench, is_bytes_mode=is_bytes_mode).repack()
+                return len(rows_translated)
+
+            results.append(measure(stage, repack, os.path.getsize(filename)))
+
+    return results
+
+
+def bench_extract(filename: str) -> List[Dict]:
+    """
+    Line regexes against the expat span extractor - text extraction, unpacking & repacking of one string table.
+    """
+    results = []
+    size = os.path.getsize(filename)
+
+    def extract_regex() -> int:
+        with open(filename, "r", encoding="windows-1251") as input_fp:
+            return len(main.extract_segments(input_fp.readlines())[1])
+
+    def extract_expat() -> int:
+        with open(filename, "rb") as input_fp:
+            return len(main.extract_spans(input_fp.read())[1])
+
+    results.append(measure("extract - regex", extract_regex, size))
+    results.append(measure("extract - expat", extract_expat, size))
+
+    with tempfile.TemporaryDirectory() as dir_bench:
+        for stage, is_expat in (("unpack - regex", False), ("unpack - expat", True)):
+            def unpack() -> int:
+                segments, _ = Unpacker(filename, dir_bench, dir_bench, is_expat=is_expat).unpack()
+                return segments
+
+            results.append(measure(stage, unpack, size))
+
+        root = os.path.basename(filename).split(".")[0]
+        with open(os.path.join(dir_bench, f"{root}_unpacked.txt"), "r", encoding="windows-1251") as unpacked_fp:
+            rows_translated = generate_translation(unpacked_fp, mangle_ratio=0)
+        filename_translate = os.path.join(dir_bench, f"{root}_translate.txt")
+        with open(filename_translate, "w") as translate_fp:
+            translate_fp.writelines(rows_translated)
+
+        for stage, is_bytes_mode, is_expat in (("repack - bytes", True, False), ("repack - spans", False, True)):
+            def repack() -> int:
+                Repacker(
+                    filename,
+                    filename_translate,
+                    dir_bench,
+                    is_bytes_mode=is_bytes_mode,
+                    is_expat=is_expat,
+                ).repack()
+                return len(rows_translated)
+
+            results.append(measure(stage, repack, size))
+
+    return results
+
+
+def _classify_four_pass(rows: List[str]) -> int:
+    # Reference classifier - one regex match per row type, as _convert_to_index did before CIPHER_PREFIX
+    classified = 0
+    for row in rows:
+        match_multiline_general = rx.CIPHER_MULTILINE_GENERAL.match(row)
+        match_multiline_start = rx.CIPHER_MULTILINE_START.match(row)
+        match_multiline_end = rx.CIPHER_MULTILINE_END.match(row)
+        match_simple = rx.CIPHER_SIMPLE.match(row)
+        match = match_multiline_general or match_multiline_start or match_multiline_end or match_simple
+        int(match.groups()[0])
+        classified = classified + 1
+    return classified
+
+
+def _classify_single_pass(rows: List[str]) -> int:
+    classified = 0
+    for row in rows:
+        match = rx.CIPHER_PREFIX.match(row)
+        TRANSLATE_TYPE_BY_TAG[match.group(2)]
+        int(match.group(1))
+        classified = classified + 1
+    return classified
+
+
+def bench_index(row_count: int):
+    rows = generate_index_rows(row_count)
+
+    for name, function in (
+        ("Classify - Four Pass", _classify_four_pass),
+        ("Classify - Single Pass", _classify_single_pass),
+        ("Repacker._convert_to_index", Repacker._convert_to_index),
+    ):
+        time_start = time.perf_counter()
+        function(rows)
+        wall = time.perf_counter() - time_start
+        LOGGER.info(f"{name}: Rows: {len(rows)} Wall: {wall:.3f}s Rows/s: {len(rows) / wall:,.0f}")
+
+
+def _index_tuples(rows: List[str]) -> Dict[int, Tuple[TranslateType, str]]:
+    # Reference index - line number -> (type, text) tuple in a dictionary, as the Repacker kept it before Row
+    index = {}
+    for row in rows:
+        match = rx.CIPHER_PREFIX.match(row)
+        text = Repacker.post_process(row[match.end() + 1:].rstrip("\n"))
+        index[int(match.group(1))] = (TRANSLATE_TYPE_BY_TAG[match.group(2)], text)
+    return index
+
+
+def bench_segments(row_count: int):
+    """
+    Memory of the repack index - the (type, text) tuple dictionary against the sorted list of slotted Rows.
+    Retained is what the index holds once built, Blocks the live allocations behind it.
+    """
+    rows = generate_index_rows(row_count)
+
+    for name, function in (
+        ("Index - Tuple Dictionary", _index_tuples),
+        ("Index - Row List", Repacker._convert_to_index),
+    ):
+        time_start = time.perf_counter()
+        function(rows)
+        wall = time.perf_counter() - time_start
+
+        tracemalloc.start()
+        index = function(rows)
+        retained, peak = tracemalloc.get_traced_memory()
+        blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+        tracemalloc.stop()
+
+        LOGGER.info(
+            f"{name}: "
+            f"Rows: {len(index)} "
+            f"Wall: {wall:.3f}s "
+            f"Retained: {retained / 2 ** 20:.1f}MB "
+            f"Peak: {peak / 2 ** 20:.1f}MB "
+            f"Blocks: {blocks}"
+        )
+        del index
+
+
+def _protect_replace(protections: List[Tuple[str, str]], texts: List[str]) -> List[str]:
+    # Reference protection - one str.replace per source form, longest first, w/o word boundaries
+    texts_protected = []
+    for text in texts:
+        for form, placeholder in protections:
+            text = text.replace(form, placeholder)
+        texts_protected.append(text)
+    return texts_protected
+
+
+def _protect_regex(protections: List[Tuple[str, str]], texts: List[str]) -> List[str]:
+    # Reference protection - a single alternation of every source form, longest first
+    placeholders = dict(protections)
+    regex = re.compile(r"\b(?:" + "|".join(re.escape(form) for form, _ in protections) + r")\b")
+    return [regex.sub(lambda match: placeholders[match.group()], text) for text in texts]
+
+
+def bench_glossary(term_count: int, row_count: int):
+    """
+    Source-side protection w/ a glossary of term_count terms - a str.replace chain & a regex alternation
+    against the Aho-Corasick automaton.
+    """
+    entries = generate_glossary(term_count)
+    rng = random.Random(0)
+    texts = []
+    for row in generate_index_rows(row_count):
+        text = row[rx.CIPHER_PREFIX.match(row).end() + 1:].rstrip("\n")
+        # Half of the texts also name one of the made-up terms
+        if rng.random() < 0.5:
+            forms_source, _, _ = rng.choice(entries)
+            text = f"{text} {rng.choice(forms_source)}"
+        texts.append(text)
+
+    time_start = time.perf_counter()
+    glossary = Glossary(entries)
+    LOGGER.info(
+        f"Glossary: Terms: {term_count} Source Forms: {len(glossary.source)} "
+        f"Build: {time.perf_counter() - time_start:.3f}s"
+    )
+    protections = sorted(
+        ((form, placeholder) for form, placeholder in zip(glossary.source.terms, glossary.source.replacements)),
+        key=lambda protection: -len(protection[0]),
+    )
+
+    for name, function in (
+        ("Protect - str.replace Chain", lambda: _protect_replace(protections, texts)),
+        ("Protect - Regex Alternation", lambda: _protect_regex(protections, texts)),
+        ("Protect - Aho-Corasick", lambda: glossary.protect_many(texts)),
+        ("Protect & Normalize - Aho-Corasick", lambda: glossary.normalize_many(glossary.protect_many(texts))),
+    ):
+        time_start = time.perf_counter()
+        function()
+        wall = time.perf_counter() - time_start
+        LOGGER.info(f"{name}: Segments: {len(texts)} Wall: {wall:.3f}s Segments/s: {len(texts) / wall:,.0f}")
+
+
+def bench_suite(size_mb: float, multiline_ratio: float, dir_bench: str) -> List[Dict]:
+    """
+    Run every stage over one synthetic string table: unpack -> translate (stub) -> align -> repack.
+    """
+    dirs = {name: os.path.join(dir_bench, name) for name in ("xml", "unpack", "repack", "english", "align", "out")}
+    for directory in dirs.values():
+        os.makedirs(directory, exist_ok=True)
+
+    filename_xml = os.path.join(dirs["xml"], "st_synthetic.xml")
+    generate_string_table(filename_xml, int(size_mb * 2 ** 20), multiline_ratio)
+    size_xml = os.path.getsize(filename_xml)
+    results = []
+
+    # Unpack - the output is kept as the input of the later stages
+    Unpacker(filename_xml, dirs["unpack"], dirs["repack"]).unpack()
+    filename_unpacked = os.path.join(dirs["unpack"], "st_synthetic_unpacked.txt")
+    results.append(bench_unpack(filename_xml, False))
+
+    # Translate - main.process_text against the stub translator, no latency
+    with open(filename_xml, "r", encoding="windows-1251") as input_fp:
+        contents_xml = input_fp.readlines()
+
+    def translate() -> int:
+        engine = TranslationEngine(StubBackend().translate_batch)
+        main.process_text(contents_xml, engine)
+        return engine.requests
+
+    results.append(measure("translate", translate, size_xml))
+
+    # Align - a mangled upper-cased translation against the Russian unpacked rows
+    with open(filename_unpacked, "r", encoding="windows-1251") as unpacked_fp:
+        rows_translated = generate_translation(unpacked_fp)
+    filename_english = os.path.join(dirs["english"], "st_synthetic_english.txt")
+    with open(filename_english, "w", encoding="windows-1251") as english_fp:
+        english_fp.writelines(rows_translated)
+
+    def align() -> int:
+        Aligner([filename_english], [filename_unpacked], dirs["align"]).align()
+        return len(rows_translated)
+
+    results.append(measure("align", align, os.path.getsize(filename_english)))
+
+    # Repack - the aligned translation back into the XML
+    filename_translate = os.path.join(dirs["repack"], "st_synthetic_translate.txt")
+    with open(os.path.join(dirs["align"], "st_synthetic_aligned.txt"), "r", encoding="windows-1251") as aligned_fp:
+        contents_aligned = aligned_fp.read()
+    with open(filename_translate, "w") as translate_fp:
+        translate_fp.write(contents_aligned)
+
+    def repack() -> int:
+        Repacker(filename_xml, filename_translate, dirs["out"]).repack()
+        return len(rows_translated)
+
+    results.append(measure("repack", repack, size_xml))
+
+    return results
+
+
+def save_results(filename: str, results: List[Dict], parameters: Dict):
+    """
+    Append a run to a JSON file holding every previous run - compare throughput over time.
+    """
+    runs = []
+    if os.path.isfile(filename):
+        with open(filename, "r", encoding="utf-8") as results_fp:
+            runs = json.load(results_fp)
+
+    runs.append({
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": parameters,
+        "results": results,
+    })
+
+    with open(filename, "w", encoding="utf-8") as results_fp:
+        json.dump(runs, results_fp, indent=1)
+    LOGGER.info(f"Results: {filename} - Runs: {len(runs)}")
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark the Translation Pipeline Stages")
+    subparsers = parser.add_subparsers(dest="stage", required=True)
+
+    parser_suite = subparsers.add_parser("suite", help="Unpack, Translate, Align & Repack a Synthetic String Table")
+    parser_suite.add_argument(
+        "-size",
+        help="Size of the Synthetic String Table (MB)",
+        dest="size",
+        type=float,
+        default=5,
+    )
+    parser_suite.add_argument(
+        "-multiline",
+        help="Share of Multiline Entries in the Synthetic String Table",
+        dest="multiline",
+        type=float,
+        default=0.3,
+    )
+    parser_suite.add_argument(
+        "-json",
+        help="Append Results to This JSON File",
+        dest="json",
+        default=None,
+    )
+
+    parser_translate = subparsers.add_parser("translate", help="main.process_text Against a Local Stub Translator")
+    parser_translate.add_argument(
+        "-in",
+        help="Russian XML File(s) - Synthetic String Table Generated When Omitted",
+        dest="input",
+        default=None,
+    )
+    parser_translate.add_argument(
+        "-size",
+        help="Size of the Synthetic String Table (MB)",
+        dest="size",
+        type=float,
+        default=0.5,
+    )
+    parser_translate.add_argument(
+        "-latency",
+        help="Simulated Round Trip Latency per Request (Seconds)",
+        dest="latency",
+        type=float,
+        default=0.05,
+    )
+    parser_translate.add_argument(
+        "-cache",
+        help="Translation Memory File (SQLite) - Run Twice to Measure a Warm Cache",
+        dest="cache",
+        default=None,
+    )
+    parser_translate.add_argument(
+        "-concurrency",
+        help="Number of Translation Requests in Flight at Once",
+        dest="concurrency",
+        type=int,
+        default=1,
+    )
+
+    parser_http = subparsers.add_parser("http", help="http Backend Against the Local Stub Server w/ Fault Injection")
+    parser_http.add_argument(
+        "-in",
+        help="Russian XML File(s) - Synthetic String Table Generated When Omitted",
+        dest="input",
+        default=None,
+    )
+    parser_http.add_argument(
+        "-size",
+        help="Size of the Synthetic String Table (MB)",
+        dest="size",
+        type=float,
+        default=0.5,
+    )
+    parser_http.add_argument(
+        "-latency",
+        help="Simulated Processing Time per Request (Seconds)",
+        dest="latency",
+        type=float,
+        default=0.05,
+    )
+    parser_http.add_argument(
+        "-concurrency",
+        help="Number of Translation Requests in Flight at Once",
+        dest="concurrency",
+        type=int,
+        default=4,
+    )
+    parser_http.add_argument(
+        "-error-rate",
+        help="Share of Requests Answered w/ 503 Service Unavailable",
+        dest="error_rate",
+        type=float,
+        default=0.0,
+    )
+    parser_http.add_argument(
+        "-rate-limit-rate",
+        help="Share of Requests Answered w/ 429 Too Many Requests",
+        dest="rate_limit_rate",
+        type=float,
+        default=0.0,
+    )
+    parser_http.add_argument(
+        "-disconnect-rate",
+        help="Share of Requests Whose Connection is Dropped w/o a Response",
+        dest="disconnect_rate",
+        type=float,
+        default=0.0,
+    )
+
+    parser_unpack = subparsers.add_parser("unpack", help="Unpacker Throughput & Peak Memory")
+    parser_unpack.add_argument(
+        "-in",
+        help="Russian XML File - Synthetic Multiline String Table Generated When Omitted",
+        dest="input",
+        default=None,
+    )
+    parser_unpack.add_argument(
+        "-size",
+        help="Size of the Synthetic String Table (MB)",
+        dest="size",
+        type=float,
+        default=100,
+    )
+    parser_unpack.add_argument(
+        "-part",
+        help="Partition Files by Character Limit",
+        dest="partition",
+        action="store_true",
+    )
+
+    parser_repack = subparsers.add_parser("repack", help="Repacker Text Path vs Bytes Fast Path")
+    parser_repack.add_argument(
+        "-in",
+        help="Russian XML File - Synthetic String Table Generated When Omitted",
+        dest="input",
+        default=None,
+    )
+    parser_repack.add_argument(
+        "-size",
+        help="Size of the Synthetic String Table (MB)",
+        dest="size",
+        type=float,
+        default=100,
+    )
+
+    parser_extract = subparsers.add_parser("extract", help="Line Regexes vs the Expat Span Extractor")
+    parser_extract.add_argument(
+        "-in",
+        help="Russian XML File - Synthetic String Table Generated When Omitted",
+        dest="input",
+        default=None,
+    )
+    parser_extract.add_argument(
+        "-size",
+        help="Size of the Synthetic String Table (MB)",
+        dest="size",
+        type=float,
+        default=50,
+    )
+
+    parser_index = subparsers.add_parser("index", help="Row Classification Throughput of the Repacker Index")
+    parser_index.add_argument(
+        "-rows",
+        help="Number of Unpacked Rows",
+        dest="rows",
+        type=int,
+        default=2_000_000,
+    )
+
+    parser_segments = subparsers.add_parser("segments", help="Retained Memory & Allocations of the Repacker Index")
+    parser_segments.add_argument(
+        "-rows",
+        help="Number of Unpacked Rows",
+        dest="rows",
+        type=int,
+        default=1_000_000,
+    )
+
+    parser_glossary = subparsers.add_parser("glossary", help="Glossary Term Protection - Replace Chain vs Aho-Corasick")
+    parser_glossary.add_argument(
+        "-terms",
+        help="Number of Glossary Terms",
+        dest="terms",
+        type=int,
+        default=5000,
+    )
+    parser_glossary.add_argument(
+        "-rows",
+        help="Number of Segments",
+        dest="rows",
+        type=int,
+        default=5_000,
+    )
+
+    args = parser.parse_args()
+
+    # Keep per-file progress logging out of the measurement
+    main.LOGGER.setLevel(logging.WARNING)
+    logging.getLogger("packager").setLevel(logging.WARNING)
+
+    if args.stage == "suite":
+        with tempfile.TemporaryDirectory() as dir_bench:
+            results = bench_suite(args.size, args.multiline, dir_bench)
+        if args.json:
+            save_results(args.json, results, {"size_mb": args.size, "multiline_ratio": args.multiline})
+        return
+
+    if args.stage == "index":
+        bench_index(args.rows)
+        return
+
+    if args.stage == "segments":
+        bench_segments(args.rows)
+        return
+
+    if args.stage == "glossary":
+        bench_glossary(args.terms, args.rows)
+        return
+
+    if args.stage == "extract":
+        if args.input:
+            bench_extract(args.input)
+            return
+
+        with tempfile.TemporaryDirectory() as dir_bench:
+            filename = os.path.join(dir_bench, "st_bench.xml")
+            generate_string_table(filename, int(args.size * 2 ** 20))
+            bench_extract(filename)
+        return
+
+    if args.stage == "repack":
+        if args.input:
+            bench_repack(args.input)
+            return
+
+        with tempfile.TemporaryDirectory() as dir_bench:
+            filename = os.path.join(dir_bench, "st_bench.xml")
+            generate_string_table(filename, int(args.size * 2 ** 20))
+            bench_repack(filename)
+        return
+
+    if args.stage == "http":
+        stub = StubServer(
+            latency=args.latency,
+            error_rate=args.error_rate,
+            rate_limit_rate=args.rate_limit_rate,
+            disconnect_rate=args.disconnect_rate,
+        )
+        if args.input:
+            bench_http(sorted(glob(args.input)), stub, args.concurrency)
+            return
+
+        with tempfile.TemporaryDirectory() as dir_bench:
+            filename = os.path.join(dir_bench, "st_bench.xml")
+            generate_string_table(filename, int(args.size * 2 ** 20), multiline_ratio=0)
+            bench_http([filename], stub, args.concurrency)
+        return
+
+    if args.stage == "unpack":
+        if args.input:
+            bench_unpack(args.input, args.partition)
+            return
+
+        with tempfile.TemporaryDirectory() as dir_bench:
+            filename = os.path.join(dir_bench, "st_bench.xml")
+            # Long multiline entries - the worst case for building multiline bodies
+            generate_string_table(filename, int(args.size * 2 ** 20), multiline_ratio=1.0, body_lines=(200, 200))
+            bench_unpack(filename, args.partition)
+        return
+
+    cache = TranslationMemory(args.cache) if args.cache else None
+
+    try:
+        if args.input:
+            bench_translate(glob(args.input), args.latency, cache, args.concurrency)
+            return
+
+        with tempfile.TemporaryDirectory() as dir_bench:
+            filename = os.path.join(dir_bench, "st_bench.xml")
+            generate_string_table(filename, int(args.size * 2 ** 20), multiline_ratio=0)
+            bench_translate([filename], args.latency, cache, args.concurrency)
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+if __name__ == "__main__":
+    run()
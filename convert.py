@@ -0,0 +1,88 @@
+import argparse
+from glob import glob
+import logging
+import os
+
+from packager.constants import RECORDS_EXTENSION
+from packager import records
+
+logging.basicConfig(level=logging.INFO)
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+
+def type_intermediate(path: str):
+    filenames = glob(path)
+    if not filenames:
+        raise argparse.ArgumentTypeError(f"{path} does not match any file")
+    for filename in filenames:
+        if not filename.endswith((".txt", RECORDS_EXTENSION)):
+            raise argparse.ArgumentTypeError(f"File: {filename} is not a valid TXT or JSONL file")
+    return path
+
+
+def dir_path(path):
+    if os.path.isdir(path):
+        return path
+    else:
+        raise argparse.ArgumentTypeError(f"readable_dir:{path} is not a valid path")
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Convert Unpacked/Translated Text To & From JSONL Records")
+    parser.add_argument(
+        "-in",
+        help="Text (.txt) or JSONL (.jsonl) File(s) - Each is Converted to the Other Format",
+        dest="input",
+        type=type_intermediate,
+        required=True,
+    )
+    parser.add_argument(
+        "-outdir",
+        help="Output Directory for Converted File(s)",
+        dest="output",
+        type=dir_path,
+        required=True,
+    )
+    parser.add_argument(
+        "-xml-ext",
+        help="Extension of the Source XML Recorded in Converted Records",
+        dest="xml_ext",
+        default=".xml",
+    )
+
+    args = parser.parse_args()
+
+    for filename in sorted(glob(args.input)):
+        convert_file(filename, args.output, args.xml_ext)
+
+
+def text_encoding(filename: str):
+    # Unpacker output is windows-1251 - translated text is read with the platform default, as the Repacker does
+    return "windows-1251" if "_unpacked" in os.path.basename(filename) else None
+
+
+def convert_file(filename: str, output_directory: str, xml_ext: str = ".xml") -> str:
+    filename_suffix = os.path.basename(filename)
+    root, extension = os.path.splitext(filename_suffix)
+
+    if extension == RECORDS_EXTENSION:
+        output_filename = os.path.join(output_directory, root + ".txt")
+        with open(filename, "r", encoding="utf-8") as input_fp:
+            with open(output_filename, "w", encoding=text_encoding(filename)) as output_fp:
+                output_fp.writelines(records.records_to_rows(records.read_records(input_fp)))
+    else:
+        # <root>_unpacked-N / <root>_translate-N -> <root>.xml
+        filename_xml = root.rsplit("_", 1)[0] + xml_ext
+        output_filename = os.path.join(output_directory, root + RECORDS_EXTENSION)
+        with open(filename, "r", encoding=text_encoding(filename)) as input_fp:
+            with open(output_filename, "w", encoding="utf-8") as output_fp:
+                written = records.write_records(output_fp, records.rows_to_records(input_fp, filename_xml))
+        LOGGER.info(f"File: {filename_suffix} - Records: {written}")
+
+    LOGGER.info(f"File: {filename_suffix} - Writing: {output_filename} - Successful")
+    return output_filename
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,138 @@
+import argparse
+import logging
+import os
+
+from main import AUTH_KEY
+from packager.backends import BACKENDS, create_backend
+from packager.daemon import create_api_server, TranslationDaemon
+from packager.fuzzy import FuzzyMemory
+from packager.glossary import Glossary
+from packager.metrics import METRICS
+
+logging.basicConfig(level=logging.INFO)
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+
+def dir_path(path):
+    if os.path.isdir(path):
+        return path
+    else:
+        raise argparse.ArgumentTypeError(f"readable_dir:{path} is not a valid path")
+
+
+def run():
+    parser = argparse.ArgumentParser(
+        description="Watch a Directory & Translate New or Modified XML File(s) w/ Warm Caches & Connections"
+    )
+    parser.add_argument(
+        "-in",
+        help="Directory of Russian XML File(s) to Watch",
+        dest="input",
+        type=dir_path,
+        required=True,
+    )
+    parser.add_argument(
+        "-out",
+        help="Output Directory For Translated XML File(s)",
+        dest="output",
+        type=dir_path,
+        required=True,
+    )
+    parser.add_argument(
+        "-backend",
+        help="Translation Backend - http Posts JSON to -url, echo Returns the Source Text (Dry Run)",
+        dest="backend",
+        choices=BACKENDS,
+        default="deepl",
+    )
+    parser.add_argument("-url", help="Endpoint of the http Backend", dest="url", default=None)
+    parser.add_argument("-cache", help="Translation Memory File (SQLite)", dest="cache", default=None)
+    parser.add_argument(
+        "-fuzzy",
+        help="Reuse Translations of Near-Duplicate Segments at or Above This Similarity (0-1)",
+        dest="fuzzy",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "-concurrency",
+        help="Number of Translation Requests in Flight at Once",
+        dest="concurrency",
+        type=int,
+        default=4,
+    )
+    parser.add_argument(
+        "-rate",
+        help="Maximum Translation Requests per Second",
+        dest="rate",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "-poll",
+        help="Seconds Between Scans of the Watched Directory",
+        dest="poll",
+        type=float,
+        default=1.0,
+    )
+    parser.add_argument(
+        "-glossary",
+        help="Term File (TSV) - Protects Source Terms From the Translator & Normalizes Their Translations",
+        dest="glossary",
+        default=None,
+    )
+    parser.add_argument(
+        "-debug",
+        help="Directory For the Unpacked & Translated Intermediate Text",
+        dest="debug",
+        type=dir_path,
+        default=None,
+    )
+    parser.add_argument("-host", help="Address the Status/Jobs API Listens On", dest="host", default="127.0.0.1")
+    parser.add_argument("-port", help="Port the Status/Jobs API Listens On", dest="port", type=int, default=8766)
+    parser.add_argument(
+        "-socket",
+        help="Serve the Status/Jobs API on This Unix Socket Instead of TCP",
+        dest="socket",
+        default=None,
+    )
+
+    args = parser.parse_args()
+    if args.backend == "http" and not args.url:
+        parser.error("-backend http requires -url")
+
+    backend = create_backend(args.backend, auth_key=AUTH_KEY, url=args.url, pool_size=args.concurrency)
+    fuzzy = FuzzyMemory(args.fuzzy) if args.fuzzy is not None else None
+    glossary = Glossary.from_file(args.glossary) if args.glossary else None
+    daemon = TranslationDaemon(
+        args.input,
+        args.output,
+        backend,
+        args.cache,
+        fuzzy,
+        args.concurrency,
+        args.rate,
+        args.poll,
+        args.debug,
+        glossary,
+    )
+    server = create_api_server(daemon, args.host, args.port, args.socket)
+
+    daemon.start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        LOGGER.info("Stopping...")
+    finally:
+        server.server_close()
+        daemon.stop()
+        backend.close()
+        daemon.fuzzy.report()
+        METRICS.report()
+        if args.socket is not None and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    run()
@@ -1,14 +1,25 @@
 import argparse
+from glob import glob
 import logging
 import os
 import re
-from typing import List
+from typing import List, Optional, Set, Tuple, Union
 
-import deepl
+from packager.backends import Backend, BACKENDS, create_backend, DeepLBackend
+from packager.cache import TranslationMemory
+from packager.engine import TranslationEngine
+from packager.extractor import TextExtractor, TextSpan, XmlError
+from packager.fuzzy import FuzzyMemory
+from packager.glossary import Glossary
+from packager.journal import Journal
+from packager.metrics import METRICS, profile
+from packager.scheduler import DEFAULT_PRIORITIES, QuotaScheduler
+from packager.translator import translate_segments
 
 AUTH_KEY = "c74da11c-7113-125c-70dd-870ce82ecf59:fx"
 RX_TRANS = re.compile("<text>(.*)</text>")
 
+logging.basicConfig(level=logging.INFO)
 LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.INFO)
 
@@ -20,53 +31,321 @@ def dir_path(path):
         raise argparse.ArgumentTypeError(f"readable_dir:{path} is not a valid path")
 
 
-def xml_file(path):
-    if os.path.isfile(path) and path.endswith(".xml"):
-        return path
-    else:
-        raise argparse.ArgumentTypeError(f"{path} is not a valid XML file")
+def type_xml(path: str):
+    filenames = glob(path)
+    if not filenames:
+        raise argparse.ArgumentTypeError(f"{path} does not match any file")
+    for filename in filenames:
+        if not (os.path.isfile(filename) and filename.endswith(".xml")):
+            raise argparse.ArgumentTypeError(f"{filename} is not a valid XML file")
+    return path
 
 
 def run():
     parser = argparse.ArgumentParser(description="Convert XML File(s) w/ Russian Text to English Text.")
-    parser.add_argument("-in", help="Input XML File", dest="input", type=xml_file, required=True)
+    parser.add_argument("-in", help="Input XML File(s)", dest="input", type=type_xml, required=True)
     parser.add_argument("-out", help="Output directory", dest="output", type=dir_path, required=True)
+    parser.add_argument(
+        "-backend",
+        help="Translation Backend - http Posts JSON to -url, echo Returns the Source Text (Dry Run)",
+        dest="backend",
+        choices=BACKENDS,
+        default="deepl",
+    )
+    parser.add_argument("-url", help="Endpoint of the http Backend", dest="url", default=None)
+    parser.add_argument("-cache", help="Translation Memory File (SQLite)", dest="cache", default=None)
+    parser.add_argument(
+        "-cache-max-entries",
+        help="Evict Least Recently Used Translations Beyond This Count",
+        dest="cache_max_entries",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "-cache-max-age",
+        help="Evict Translations Unused For This Many Days",
+        dest="cache_max_age",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "-fuzzy",
+        help="Reuse Translations of Near-Duplicate Segments at or Above This Similarity (0-1)",
+        dest="fuzzy",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "-concurrency",
+        help="Number of Translation Requests in Flight at Once",
+        dest="concurrency",
+        type=int,
+        default=4,
+    )
+    parser.add_argument(
+        "-rate",
+        help="Maximum Translation Requests per Second",
+        dest="rate",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "-journal",
+        help="Checkpoint File - a Rerun w/ the Same Journal Resumes Where the Last Run Stopped",
+        dest="journal",
+        default=None,
+    )
+    parser.add_argument(
+        "-quota",
+        help="Character Budget For This Run - Capped by the Quota the Backend Reports",
+        dest="quota",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "-priority",
+        help="File Name Patterns Translated First, in Order (e.g. *dialog* *task*)",
+        dest="priority",
+        nargs="+",
+        default=list(DEFAULT_PRIORITIES),
+    )
+    parser.add_argument(
+        "-expat",
+        help="Find Text w/ the XML Parser Instead of the Line Regex - Malformed XML Falls Back to the Regex",
+        dest="expat",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-glossary",
+        help="Term File (TSV) - Protects Source Terms From the Translator & Normalizes Their Translations",
+        dest="glossary",
+        default=None,
+    )
+    parser.add_argument(
+        "-profile",
+        "--profile",
+        help="Profile the Run (cProfile + tracemalloc) - Writes main.prof",
+        dest="profile",
+        action="store_true",
+    )
 
     args = parser.parse_args()
+    if args.backend == "http" and not args.url:
+        parser.error("-backend http requires -url")
 
-    xmltrans(args.input, args.output)
+    LOGGER.info(f"Configuring {args.backend} Backend...")
+    # One backend for the whole run - its connections are shared by every file
+    backend = create_backend(args.backend, auth_key=AUTH_KEY, url=args.url, pool_size=args.concurrency)
+    LOGGER.info(f"Configuring {args.backend} Backend... Done!")
 
+    quota = backend.quota_remaining()
+    if quota is not None:
+        LOGGER.info(f"Backend Quota Remaining: {quota} Characters")
+    if args.quota is not None:
+        quota = args.quota if quota is None else min(quota, args.quota)
+    scheduler = QuotaScheduler(quota, args.priority)
 
-def xmltrans(input_filename: str, output_dir: str):
+    cache = None
+    if args.cache:
+        cache = TranslationMemory(
+            args.cache,
+            backend=backend.name,
+            max_entries=args.cache_max_entries,
+            max_age_days=args.cache_max_age,
+        )
 
-    LOGGER.info("Configuring DeepL Translator...")
-    translator_deepl = deepl.Translator(AUTH_KEY)
-    LOGGER.info("Configuring DeepL Translator... Done!")
+    fuzzy = None
+    if args.fuzzy is not None:
+        fuzzy = FuzzyMemory(args.fuzzy)
+        # Seed with everything translated in earlier runs
+        if cache is not None:
+            fuzzy.add_many(cache.items())
 
-    # # Retrieve list of XML files in directory
-    # input_filenames = glob(path_input_files)
-    # input_filenames_xml = [input_filename for input_filename in input_filenames if input_filename.endswith(".xml")]
+    journal = Journal(args.journal) if args.journal else None
+    glossary = Glossary.from_file(args.glossary) if args.glossary else None
 
-    # Translate the content of XML file
-    with open(input_filename, "r", encoding="windows-1251") as input_fp:
-        LOGGER.info(f"Loading file: {input_filename} into memory...")
-        file_contents = input_fp.readlines()
-        LOGGER.info("Beginning File Translation...")
-        file_contents_translate = process_text(file_contents, translator_deepl)
-        LOGGER.info("File Translation Complete!")
+    try:
+        with profile(args.profile, "main"):
+            files_deferred = xmltrans(
+                sorted(glob(args.input)),
+                args.output,
+                cache,
+                args.concurrency,
+                args.rate,
+                fuzzy,
+                backend,
+                journal,
+                scheduler,
+                args.expat,
+                glossary,
+            )
+        if files_deferred:
+            LOGGER.warning(
+                "Stopped Before Exceeding the Quota - Rerun to Translate the Deferred Files: "
+                f"{', '.join(files_deferred)}"
+            )
+    finally:
+        backend.close()
+        if journal is not None:
+            journal.close()
+        if cache is not None:
+            cache.close()
+        if fuzzy is not None:
+            fuzzy.report()
+        METRICS.report()
+
+
+def xmltrans(
+    input_filenames: List[str],
+    output_dir: str,
+    cache: Optional[TranslationMemory] = None,
+    concurrency: int = 1,
+    rate: Optional[float] = None,
+    fuzzy: Optional[FuzzyMemory] = None,
+    backend: Optional[Backend] = None,
+    journal: Optional[Journal] = None,
+    scheduler: Optional[QuotaScheduler] = None,
+    is_expat: bool = False,
+    glossary: Optional[Glossary] = None,
+) -> List[str]:
+    """
+    :param is_expat: Find text w/ the XML parser instead of the line regex
+    :param glossary: Terms swapped for placeholders before translation & normalized after
+    :return: Files deferred because their translation would exceed the scheduler's quota
+    """
+
+    if backend is None:
+        backend = DeepLBackend(AUTH_KEY)
+    engine = TranslationEngine(backend.translate_batch, concurrency, rate)
+
+    # Files written by an earlier run of this journal are not translated again
+    if journal is not None:
+        files_done = [input_filename for input_filename in input_filenames if journal.is_done(input_filename)]
+        if files_done:
+            LOGGER.info(f"Skipping Files Already Written: {len(files_done)}")
+            input_filenames = [input_filename for input_filename in input_filenames if input_filename not in files_done]
+    if scheduler is not None:
+        input_filenames = scheduler.order(input_filenames)
 
-        output_filename = f"{output_dir}/{input_filename.split('/')[-1]}"
-        LOGGER.info(f"Writing Translation to output file: {output_filename}")
-        with open(output_filename, "w", encoding="utf-8") as output_fp:
-            output_fp.writelines(file_contents_translate)
+    # Load every XML file & collect its segments so all files share one pool of requests
+    files_contents = []
+    files_segments = []
+    # What is sent for each segment - the raw text w/ any glossary terms protected
+    files_segments_source = []
+    with METRICS.timer("extract"):
+        for input_filename in input_filenames:
+            file_contents, segments = load_file(input_filename, is_expat)
+            files_contents.append(file_contents)
+            files_segments.append(segments)
+            files_segments_source.append(glossary.protect_many(segments[1]) if glossary is not None else segments[1])
+
+    files_deferred = []
+    if scheduler is not None:
+        segments_source_all = [
+            text_source for segments_source in files_segments_source for text_source in segments_source
+        ]
+        input_filenames, files_deferred = scheduler.plan(
+            list(zip(input_filenames, files_segments_source)),
+            known_segments(segments_source_all, cache, journal),
+        )
+        files_contents = files_contents[:len(input_filenames)]
+        files_segments = files_segments[:len(input_filenames)]
+        files_segments_source = files_segments_source[:len(input_filenames)]
+
+    LOGGER.info("Beginning File Translation...")
+    segments_source_all = [text_source for segments_source in files_segments_source for text_source in segments_source]
+    with METRICS.timer("translate"):
+        segments_translate_all = translate_segments(segments_source_all, engine, cache, fuzzy, journal)
+    if glossary is not None:
+        segments_translate_all = glossary.normalize_many(segments_translate_all, segments_source_all)
+    METRICS.count("api_requests", engine.requests)
+    METRICS.count("api_retries", engine.retries)
+    LOGGER.info(f"File Translation Complete! Requests: {engine.requests} Retries: {engine.retries}")
+
+    # Write each file back out in its original order
+    offset = 0
+    for input_filename, file_contents, (segments_idx, segments_raw) in zip(
+        input_filenames, files_contents, files_segments
+    ):
+        segments_translate = segments_translate_all[offset:offset + len(segments_raw)]
+        offset = offset + len(segments_raw)
+        with METRICS.timer("write"):
+            if isinstance(file_contents, bytes):
+                file_contents_translate = apply_span_translations(file_contents, segments_idx, segments_translate)
+            else:
+                file_contents_translate = apply_translations(
+                    file_contents, segments_idx, segments_raw, segments_translate
+                )
+
+            output_filename = f"{output_dir}/{input_filename.split('/')[-1]}"
+            LOGGER.info(f"Writing Translation to output file: {output_filename}")
+            with open(output_filename, "w", encoding="utf-8") as output_fp:
+                output_fp.writelines(file_contents_translate)
+        if journal is not None:
+            journal.mark_done(input_filename)
 
         LOGGER.info(f"XML Translation for file: {input_filename} -> {output_filename} complete!")
 
+    return files_deferred
 
-def process_text(text: List[str], translator_deepl: deepl.Translator) -> List[str]:
-    text_processed = []
+
+def load_file(filename: str, is_expat: bool = False) -> Tuple[Union[List[str], bytes], Tuple[List, List[str]]]:
+    """
+    :return: (XML lines - or the undecoded XML w/ is_expat, (line indexes or <text> spans, raw segments))
+    """
+    if is_expat:
+        with open(filename, "rb") as input_fp:
+            LOGGER.info(f"Loading file: {filename} into memory...")
+            data = input_fp.read()
+        try:
+            return data, extract_spans(data, filename)
+        except XmlError as e:
+            LOGGER.warning(f"{e} - Falling Back to Line Matching")
+
+    with open(filename, "r", encoding="windows-1251") as input_fp:
+        LOGGER.info(f"Loading file: {filename} into memory...")
+        file_contents = input_fp.readlines()
+    return file_contents, extract_segments(file_contents)
+
+
+def known_segments(
+    segments: List[str],
+    cache: Optional[TranslationMemory] = None,
+    journal: Optional[Journal] = None,
+) -> Set[str]:
+    # Segments translated without a request - the scheduler does not charge them to the quota
+    known = set()
+    if journal is not None:
+        known.update(journal.get_many(segments))
+    if cache is not None:
+        known.update(cache.contains_many([segment for segment in segments if segment not in known]))
+    return known
+
+
+def process_text(
+    text: List[str],
+    engine: TranslationEngine,
+    cache: Optional[TranslationMemory] = None,
+    fuzzy: Optional[FuzzyMemory] = None,
+    glossary: Optional[Glossary] = None,
+) -> List[str]:
+    segments_idx, segments_raw = extract_segments(text)
+    if glossary is None:
+        segments_translate = translate_segments(segments_raw, engine, cache, fuzzy)
+    else:
+        segments_source = glossary.protect_many(segments_raw)
+        segments_translate = translate_segments(segments_source, engine, cache, fuzzy)
+        segments_translate = glossary.normalize_many(segments_translate, segments_source)
+    return apply_translations(text, segments_idx, segments_raw, segments_translate)
+
+
+def extract_segments(text: List[str]) -> Tuple[List[int], List[str]]:
+    # Collect every line with text to be translated so they can be sent in batches
+    segments_idx = []
+    segments_raw = []
+    # Per-line logging is only paid for when DEBUG is actually enabled
+    is_debug = LOGGER.isEnabledFor(logging.DEBUG)
     for idx, line in enumerate(text):
-        LOGGER.info(f"Processing line: {idx}...")
         # Find the text in the line to be translated
         matches = RX_TRANS.search(line)
         if matches:
@@ -77,24 +356,51 @@ def process_text(text: List[str], translator_deepl: deepl.Translator) -> List[st
                 LOGGER.error(f"{match_count} matches found for line: {idx}: {line}")
                 raise Exception(f"Multiple matches found for line: {idx}: {line}")
 
-            LOGGER.info(f"Processing line: {idx} - MATCH FOUND!")
-            # The actual translation work - call the DeepL API
-            text_raw = matches.group(1)
-            text_translate = translator_deepl.translate_text(text_raw, target_lang="EN-US")
-            text_translate = text_translate.text
-
-            LOGGER.info(
-                f"Processing line: {idx}:"
-                f"{text_raw}"
-                "->"
-                f"{text_translate}"
-            )
-            line_translate = line.replace(text_raw, text_translate)
-            text_processed.append(line_translate)
-        else:
-            LOGGER.info(f"Processing line: {idx} - no match found")
-            LOGGER.info(f"{line}")
-            text_processed.append(line)
+            if is_debug:
+                LOGGER.debug("Processing line: %d - MATCH FOUND!", idx)
+            segments_idx.append(idx)
+            segments_raw.append(matches.group(1))
+        elif is_debug:
+            LOGGER.debug("Processing line: %d - no match found: %s", idx, line)
+
+    METRICS.count("lines_scanned", len(text))
+    METRICS.count("segments_extracted", len(segments_raw))
+    return segments_idx, segments_raw
+
+
+def extract_spans(data: bytes, filename: str = "") -> Tuple[List[TextSpan], List[str]]:
+    # Every <text> element - its content is sent as written, line breaks included
+    spans = list(TextExtractor(data, filename))
+    METRICS.count("segments_extracted", len(spans))
+    return spans, [span.text for span in spans]
+
+
+def apply_translations(
+    text: List[str],
+    segments_idx: List[int],
+    segments_raw: List[str],
+    segments_translate: List[str],
+) -> List[str]:
+    # Put the translations back on the lines they were taken from
+    text_processed = text.copy()
+    is_debug = LOGGER.isEnabledFor(logging.DEBUG)
+    for idx, text_raw, text_translate in zip(segments_idx, segments_raw, segments_translate):
+        if is_debug:
+            LOGGER.debug("Processing line: %d: %s -> %s", idx, text_raw, text_translate)
+        text_processed[idx] = text[idx].replace(text_raw, text_translate)
+
+    return text_processed
+
+
+def apply_span_translations(data: bytes, spans: List[TextSpan], segments_translate: List[str]) -> List[str]:
+    # Put the translations in place of the spans they were taken from - the XML between is decoded as is
+    text_processed = []
+    position = 0
+    for span, text_translate in zip(spans, segments_translate):
+        text_processed.append(data[position:span.start].decode("windows-1251"))
+        text_processed.append(text_translate)
+        position = span.end
+    text_processed.append(data[position:].decode("windows-1251"))
 
     return text_processed
 
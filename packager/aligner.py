@@ -1,20 +1,63 @@
+from bisect import bisect_left
+from concurrent.futures import as_completed, ProcessPoolExecutor
 import logging
 import os
 import re
-from typing import Dict, List
+import time
+from typing import Dict, List, Optional, Tuple
+
+from packager.metrics import METRICS, collect
+from packager.packer import find_packed_partitions
+from packager import rx
+from packager.segment import pause_gc, Row, TAGS
+
 LOGGER = logging.getLogger(__name__)
 
-RX_LINE_PREFIX = re.compile(r"\[(\d+)](?::(ML[ES]?):)?")
 # RX_LINE_REDUNDANT = re.compile(r"\[d*].*(\[\d+])")
 RX_LINE_REDUNDANT = re.compile(r"\[.*(\[\d+])")
-RX_LINE_NO_MALFORMED = re.compile(r"(\[\d+)[^]]")
+# Whatever remains of a mangled prefix - "[12 text", "12] text", "[12]:ML text", ":MLE: text", "[ text"
+RX_PREFIX_BROKEN = re.compile(r"\[?(\d*)]?(?::ML[SE]?:?)? ?")
+
+
+def generate_lookup(filenames: List[str]) -> Dict[str, str]:
+    """
+    Retrieves "parallel" Russian file.
+    Will be used as ground truth for line numbers and file size.
+    """
+    lookup = {}
+    for filename in filenames:
+        filename_suffix = filename.split(os.path.sep)[-1]
+        filename_root_array = filename_suffix.split("_")[:-1]
+        filename_root = "_".join(filename_root_array)
+        lookup[filename_root] = filename
+
+    return lookup
+
+
+def check_unpacked(filenames: List[str]):
+    """
+    Rows are keyed by line number - reject packed partitions, where a line number may belong to several files.
+    """
+    filenames_packed = find_packed_partitions(filenames)
+    if filenames_packed:
+        raise Exception(
+            "File Mismatch. "
+            f"Packed Partition(s) Hold Rows of Several Files - Repack Them w/ -manifest: {', '.join(filenames_packed)}"
+        )
 
 
 class Aligner:
-    def __init__(self, filenames_base: List[str], filenames_anchor: List[str], output_directory: str):
-        self.map_filenames_base: Dict[str, str] = self._generate_lookup(filenames_base)
-        self.map_filenames_anchor: Dict[str, str] = self._generate_lookup(filenames_anchor)
+    def __init__(
+        self,
+        filenames_base: List[str],
+        filenames_anchor: List[str],
+        output_directory: str,
+        jobs: int = 1,
+    ):
+        self.map_filenames_base: Dict[str, str] = generate_lookup(filenames_base)
+        self.map_filenames_anchor: Dict[str, str] = generate_lookup(filenames_anchor)
         self.output_directory = output_directory
+        self.jobs = jobs
 
         if len(filenames_base) is not len(filenames_anchor):
             raise Exception(
@@ -22,52 +65,108 @@ class Aligner:
                 f"English: {len(filenames_base)}"
                 f"Russian: {len(filenames_anchor)}"
             )
+        check_unpacked(filenames_base + filenames_anchor)
 
-    def align(self):
+    def align(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Align every file pair - pairs are independent & run in worker processes when jobs > 1.
+        Failures are collected across all pairs & raised together once every pair has been attempted.
+        :return: Root filename -> (rows aligned, characters aligned)
+        """
         LOGGER.info("Beginning File Alignment: " + str(self.map_filenames_base.keys()))
+        time_start = time.perf_counter()
 
-        for filename_base_root, filename_base in self.map_filenames_base.items():
-            LOGGER.info(f"{filename_base_root}: Processing...")
+        results: Dict[str, Tuple[int, int]] = {}
+        failures: Dict[str, str] = {}
+        if self.jobs > 1:
+            with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+                futures = {
+                    executor.submit(collect, self.align_file, filename_base_root): filename_base_root
+                    for filename_base_root in self.map_filenames_base
+                }
+                for future in as_completed(futures):
+                    filename_base_root = futures[future]
+                    try:
+                        results[filename_base_root], snapshot = future.result()
+                    except Exception as e:
+                        failures[filename_base_root] = str(e)
+                        continue
+                    # Worker metrics are recorded in the worker process - fold them back in
+                    METRICS.merge(snapshot)
+        else:
+            for filename_base_root in self.map_filenames_base:
+                try:
+                    results[filename_base_root] = self.align_file(filename_base_root)
+                except Exception as e:
+                    failures[filename_base_root] = str(e)
 
-            LOGGER.info(f"{filename_base_root}: Retrieving Anchor File")
-            filename_anchor = self.map_filenames_anchor[filename_base_root]
+        elapsed = time.perf_counter() - time_start
+        rows = sum(rows for rows, _ in results.values())
+        characters = sum(characters for _, characters in results.values())
+        LOGGER.info(
+            f"Aligned Files: {len(results)} - "
+            f"Failed: {len(failures)} - "
+            f"Rows: {rows} - "
+            f"Characters: {characters} - "
+            f"Elapsed: {elapsed:.2f}s - "
+            f"Rows/s: {rows / elapsed if elapsed else 0:.0f}"
+        )
 
-            LOGGER.info(f"{filename_base_root}: Loading base into memory...")
-            contents_base = self._read_file(filename_base)
+        if failures:
+            report = "\n".join(f"  {root}: {error}" for root, error in sorted(failures.items()))
+            LOGGER.error(f"Alignment Failed For {len(failures)} File(s):\n{report}")
+            raise Exception(f"File Alignment Failed. Files: {', '.join(sorted(failures))}")
 
-            LOGGER.info(f"{filename_base_root}: Loading anchor into memory...")
-            contents_anchor = self._read_file(filename_anchor)
+        return results
 
-            LOGGER.info(f"{filename_base_root}: Verifying Line Count...")
-            if len(contents_base) != len(contents_anchor):
-                raise Exception(
-                    "Line Count Mismatch."
-                    f"{filename_base}: {len(contents_base)}"
-                    f"{filename_anchor}: {len(contents_anchor)}"
-                )
+    def align_file(self, filename_base_root: str) -> Tuple[int, int]:
+        filename_base = self.map_filenames_base[filename_base_root]
+        LOGGER.info(f"{filename_base_root}: Processing...")
 
-            LOGGER.info(f"{filename_base_root}: Repairing...")
-            contents_base_repair = self._repair_text(contents_base, contents_anchor)
+        LOGGER.info(f"{filename_base_root}: Retrieving Anchor File")
+        filename_anchor = self.map_filenames_anchor.get(filename_base_root)
+        if filename_anchor is None:
+            raise Exception(f"Anchor File Missing. Base: {filename_base}")
 
-            LOGGER.info(f"{filename_base_root}: Writing Repaired File...")
-            self._write_to_file(contents_base_repair, filename_base_root)
+        LOGGER.info(f"{filename_base_root}: Loading base into memory...")
+        contents_base = self._read_file(filename_base)
 
-            LOGGER.info(f"{filename_base_root}: Alignment Successful")
+        LOGGER.info(f"{filename_base_root}: Loading anchor into memory...")
+        rows_anchor = []
+        with pause_gc():
+            for line_anchor in self._read_file(filename_anchor):
+                match_anchor = rx.CIPHER_PREFIX.match(line_anchor)
+                if not match_anchor:
+                    raise Exception(f"Invalid Anchor Row format: {line_anchor}")
+                # Only the line number & tag of an anchor row are used - its text is not kept
+                rows_anchor.append(Row(int(match_anchor.group(1)), TAGS[match_anchor.group(2)], ""))
 
-    @staticmethod
-    def _generate_lookup(filenames: List[str]) -> Dict[str, str]:
-        """
-        Retrieves "parallel" Russian file.
-        Will be used as ground truth for line numbers and file size.
-        """
-        lookup = {}
-        for filename in filenames:
-            filename_suffix = filename.split(os.path.sep)[-1]
-            filename_root_array = filename_suffix.split("_")[:-1]
-            filename_root = "_".join(filename_root_array)
-            lookup[filename_root] = filename
+        if len(contents_base) != len(rows_anchor):
+            LOGGER.info(
+                f"{filename_base_root}: Line Count Drift - "
+                f"Base: {len(contents_base)} Anchor: {len(rows_anchor)}"
+            )
+
+        LOGGER.info(f"{filename_base_root}: Repairing...")
+        with METRICS.timer("align"):
+            contents_base_repair, rows_unplaced = self.repair_text(contents_base, rows_anchor)
+        METRICS.count("rows_aligned", len(contents_base_repair))
+        METRICS.count("rows_unrecoverable", len(rows_unplaced))
+
+        # Translated text that fits no anchor row would be lost on repack - fail the file for a manual pass
+        if rows_unplaced:
+            report = "".join(f"  {row}" for row in rows_unplaced)
+            LOGGER.error(f"{filename_base_root}: Unrecoverable Rows: {len(rows_unplaced)}\n{report}")
+            raise Exception(f"Row Mismatch. Unrecoverable Rows: {len(rows_unplaced)} - Base: {filename_base}")
+        rows_missing = len(rows_anchor) - len(contents_base_repair)
+        if rows_missing:
+            LOGGER.warning(f"{filename_base_root}: Rows Without Translation: {rows_missing}")
+
+        LOGGER.info(f"{filename_base_root}: Writing Repaired File...")
+        self._write_to_file(contents_base_repair, filename_base_root)
 
-        return lookup
+        LOGGER.info(f"{filename_base_root}: Alignment Successful")
+        return len(contents_base_repair), sum(len(line) for line in contents_base_repair)
 
     @staticmethod
     def _read_file(filename: str, encoding: str = "windows-1251") -> List[str]:
@@ -80,55 +179,149 @@ class Aligner:
 
         return contents
 
-    def _repair_text(self, contents_base: List[str], contents_anchor: List[str]) -> List[str]:
-        contents_base_repair = contents_base.copy()
-
-        # Repair Mangled Line Numbers
-        iter_base = iter(enumerate(contents_base))
-        iter_anchor = iter(enumerate(contents_anchor))
-
-        idx_base, line_base = next(iter_base)
-        idx_anchor, line_anchor = next(iter_anchor)
-
-        while True:
-            line_base_update = self._verify_or_repair_line(line_base, line_anchor)
-            contents_base_repair[idx_base] = line_base_update
-            try:
-                idx_base, line_base = next(iter_base)
-                idx_anchor, line_anchor = next(iter_anchor)
-            except StopIteration:
-                break
-
-        return contents_base_repair
-
-    def _verify_or_repair_line(self, line_base: str, line_anchor: str) -> str:
-        match_base = RX_LINE_PREFIX.match(line_base)
-        match_anchor = RX_LINE_PREFIX.match(line_anchor)
-
-        line_base = self._remove_redundancy(line_base)
-
-        if match_base:
-            if match_base.groups() != match_anchor.groups():
-                match_line_base = match_base.groups(1)
-                match_line_anchor = match_anchor.groups(1)
-                raise Exception(
-                    "File Alignment Error - Invalid Match"
-                    f"{match_line_base}: Base: {match_base.groups()}"
-                    f"{match_line_anchor}: Base: {match_anchor.groups()}"
-                )
-            line_repair = line_base
-        elif RX_LINE_NO_MALFORMED.match(line_base):
-            line_repair = self._text_replace(RX_LINE_NO_MALFORMED, match_anchor.group() + " ", line_base)
-        elif line_base[0] == "[":
-            line_repair = line_base.replace("[", match_anchor.group() + " ")
-        else:
-            raise Exception(
-                "File Alignment Error - Invalid Case"
-                f"Base: {line_base}"
-                f"Anchor: {line_anchor}"
-            )
+    @classmethod
+    def repair_text(cls, contents_base: List[str], rows_anchor: List[Row]) -> Tuple[List[str], List[str]]:
+        """
+        Key every base row to an anchor row by its [N]/:MLx: prefix rather than by position, so dropped or
+        merged rows only affect themselves. Rows with a mangled prefix are recovered from the known rows
+        around them - by the line number they still carry, or by position when the counts between agree.
+        :param contents_base: Translated rows as read - prefixes may be mangled
+        :param rows_anchor: Unpacked rows, the ground truth for line numbers & tags - their text is not used
+        :return: (repaired rows in line number order, rows that could not be placed)
+        """
+        anchor_index = {row.line_number: position for position, row in enumerate(rows_anchor)}
 
-        return line_repair
+        lines_base = [cls._remove_redundancy(line) for line in contents_base]
+        matched: List[Optional[int]] = [None] * len(lines_base)
+
+        # Rows whose prefix is intact - a single dictionary lookup each
+        candidates: List[Tuple[int, int]] = []
+        line_number_counts: Dict[int, int] = {}
+        for position_base, line_base in enumerate(lines_base):
+            match_base = rx.CIPHER_PREFIX.match(line_base)
+            if not match_base:
+                continue
+            line_number = int(match_base.group(1))
+            line_number_counts[line_number] = line_number_counts.get(line_number, 0) + 1
+            position_anchor = anchor_index.get(line_number)
+            if position_anchor is not None and rows_anchor[position_anchor].tag == match_base.group(2):
+                candidates.append((position_base, position_anchor))
+
+        # A line number carried twice can't tell which row is mistyped - both are left to the recovery below
+        candidates = [
+            candidate for candidate in candidates if line_number_counts[rows_anchor[candidate[1]].line_number] == 1
+        ]
+        for position_base, position_anchor in cls._increasing_subsequence(candidates):
+            matched[position_base] = position_anchor
+
+        # Every run of unmatched rows lies between two known rows - recover it within that window
+        rows_unplaced: List[int] = []
+        gap: List[int] = []
+        anchor_low = -1
+        for position_base in range(len(lines_base) + 1):
+            if position_base < len(lines_base) and matched[position_base] is None:
+                gap.append(position_base)
+                continue
+
+            anchor_high = matched[position_base] if position_base < len(lines_base) else len(rows_anchor)
+            if gap:
+                cls._recover_gap(gap, anchor_low, anchor_high, lines_base, anchor_index, matched, rows_unplaced)
+                gap = []
+            anchor_low = anchor_high
+
+        contents_base_repair = []
+        for line_base, position_anchor in zip(lines_base, matched):
+            if position_anchor is None:
+                continue
+            row_anchor = rows_anchor[position_anchor]
+            match_base = rx.CIPHER_PREFIX.match(line_base)
+            # "[1]:ML:" starts w/ "[1]" - compare line number & tag, not the text of the prefix
+            if (
+                match_base is None
+                or int(match_base.group(1)) != row_anchor.line_number
+                or match_base.group(2) != row_anchor.tag
+            ):
+                # Replace whatever is left of the mangled prefix with the anchor's
+                match_broken = cls._match_broken_prefix(line_base)
+                if match_broken:
+                    line_base = line_base[match_broken.end():]
+                line_base = f"{row_anchor.prefix} {line_base}"
+            contents_base_repair.append(line_base)
+
+        return contents_base_repair, [lines_base[position] for position in sorted(rows_unplaced)]
+
+    @staticmethod
+    def _increasing_subsequence(candidates: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """
+        Longest run of (base position, anchor position) candidates whose anchor positions increase, in O(n log n).
+        A row that jumps past its successors is left out however far it jumps, instead of shadowing them.
+        """
+        # Smallest anchor position ending a run of each length, the candidate it belongs to & each one's predecessor
+        tails: List[int] = []
+        tails_candidate: List[int] = []
+        predecessors: List[int] = []
+        for index, (_, position_anchor) in enumerate(candidates):
+            length = bisect_left(tails, position_anchor)
+            predecessors.append(tails_candidate[length - 1] if length else -1)
+            if length == len(tails):
+                tails.append(position_anchor)
+                tails_candidate.append(index)
+            else:
+                tails[length] = position_anchor
+                tails_candidate[length] = index
+
+        subsequence = []
+        index = tails_candidate[-1] if tails_candidate else -1
+        while index >= 0:
+            subsequence.append(candidates[index])
+            index = predecessors[index]
+        subsequence.reverse()
+        return subsequence
+
+    @staticmethod
+    def _match_broken_prefix(line: str) -> Optional[re.Match]:
+        # Bare leading digits ("2 bandits") are text, not a prefix - a bracket or tag must remain
+        match = RX_PREFIX_BROKEN.match(line)
+        return match if match.group().strip(" 0123456789") else None
+
+    @staticmethod
+    def _recover_gap(
+        gap: List[int],
+        anchor_low: int,
+        anchor_high: int,
+        lines_base: List[str],
+        anchor_index: Dict[int, int],
+        matched: List[Optional[int]],
+        rows_unplaced: List[int],
+    ):
+        """
+        Place unmatched base rows between anchor positions anchor_low & anchor_high (both exclusive).
+        A row still carrying a usable line number ("[12 text") splits the window; the rows left in each
+        window are placed by position only when their count equals the free anchor rows.
+        """
+        def place_by_position(positions: List[int], low: int, high: int):
+            if len(positions) == high - low - 1:
+                for offset, position in enumerate(positions, start=1):
+                    matched[position] = low + offset
+            else:
+                rows_unplaced.extend(positions)
+
+        pending = []
+        for position_base in gap:
+            match_broken = Aligner._match_broken_prefix(lines_base[position_base])
+            position_anchor = None
+            if match_broken and match_broken.group(1):
+                position_anchor = anchor_index.get(int(match_broken.group(1)))
+
+            if position_anchor is not None and anchor_low < position_anchor < anchor_high:
+                place_by_position(pending, anchor_low, position_anchor)
+                matched[position_base] = position_anchor
+                anchor_low = position_anchor
+                pending = []
+            else:
+                pending.append(position_base)
+
+        place_by_position(pending, anchor_low, anchor_high)
 
     @staticmethod
     def _remove_redundancy(line: str) -> str:
@@ -153,9 +346,3 @@ class Aligner:
         filename_write = f"{self.output_directory}{os.path.sep}{filename_root}_aligned.txt"
         with open(filename_write, "w", encoding="windows-1251") as fp_write:
             fp_write.writelines(contents)
-
-    @staticmethod
-    def _text_replace(regex: re.Pattern, text_replace: str, text_old: str):
-        r = regex.search(text_old).span(1)
-        text_new = text_old[:r[0]] + text_replace + text_old[r[1]:]
-        return text_new
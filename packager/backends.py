@@ -0,0 +1,213 @@
+from abc import ABC, abstractmethod
+import http.client
+import json
+import logging
+import queue
+import threading
+from typing import List, Optional, TYPE_CHECKING
+from urllib.parse import urlsplit
+
+from packager.engine import RateLimitError, RetryableError
+from packager.metrics import METRICS
+
+if TYPE_CHECKING:
+    import deepl
+
+LOGGER = logging.getLogger(__name__)
+
+BACKENDS = ("deepl", "http", "echo")
+
+
+class Backend(ABC):
+    """
+    A translation service - translate_batch sends one request for a list of texts.
+    Transient failures are raised as RetryableError / RateLimitError so the TranslationEngine retries them.
+    One backend is created per run & shared by every file, so its connections are reused across files.
+    """
+    name = "backend"
+
+    def __init__(self, target_lang: str = "EN-US"):
+        self.target_lang = target_lang
+
+    @abstractmethod
+    def translate_batch(self, texts: List[str]) -> List[str]:
+        """
+        :return: Translations aligned w/ texts
+        """
+
+    def quota_remaining(self) -> Optional[int]:
+        """
+        :return: Characters left on the account, None when the backend has no quota
+        """
+        return None
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class EchoBackend(Backend):
+    """
+    Returns the source text unchanged - a dry run that never leaves the machine.
+    """
+    name = "echo"
+
+    def translate_batch(self, texts: List[str]) -> List[str]:
+        return list(texts)
+
+
+class DeepLBackend(Backend):
+    """
+    DeepL API through the official client - the client keeps its own HTTP session across requests.
+    """
+    name = "deepl"
+
+    def __init__(self, auth_key: str, target_lang: str = "EN-US"):
+        super().__init__(target_lang)
+        # Imported on first use - commands that never reach DeepL start without loading it
+        import deepl
+
+        self.deepl = deepl
+        self.translator: "deepl.Translator" = deepl.Translator(auth_key)
+
+    def translate_batch(self, texts: List[str]) -> List[str]:
+        try:
+            results = self.translator.translate_text(texts, target_lang=self.target_lang)
+        except self.deepl.TooManyRequestsException as e:
+            raise RateLimitError(str(e)) from e
+        except self.deepl.ConnectionException as e:
+            raise RetryableError(str(e)) from e
+        return [result.text for result in results]
+
+    def quota_remaining(self) -> Optional[int]:
+        usage = self.translator.get_usage()
+        if usage.character is None or not usage.character.valid:
+            return None
+        return max(0, usage.character.limit - usage.character.count)
+
+    def close(self):
+        close = getattr(self.translator, "close", None)
+        if close is not None:
+            close()
+
+
+class HttpJsonBackend(Backend):
+    """
+    Generic JSON over HTTP service - POST {"texts": [...], "target_lang": ...} -> {"translations": [...]}.
+    Connections are kept alive & pooled; a connection is only returned to the pool once its response
+    has been read in full, and is dropped on any error or when the server asks to close it.
+    """
+    name = "http"
+
+    def __init__(
+        self,
+        url: str,
+        target_lang: str = "EN-US",
+        pool_size: int = 8,
+        timeout: float = 30.0,
+        auth_key: Optional[str] = None,
+    ):
+        super().__init__(target_lang)
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise Exception(f"Unsupported URL Scheme. URL: {url}")
+
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = parts.path or "/"
+        if parts.query:
+            self.path = f"{self.path}?{parts.query}"
+        self.timeout = timeout
+
+        self.headers = {"Content-Type": "application/json; charset=utf-8", "Connection": "keep-alive"}
+        if auth_key:
+            self.headers["Authorization"] = f"Bearer {auth_key}"
+
+        self.pool: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue(maxsize=pool_size)
+        self.connections_opened = 0
+        self.lock = threading.Lock()
+
+    def _acquire(self) -> http.client.HTTPConnection:
+        try:
+            return self.pool.get_nowait()
+        except queue.Empty:
+            with self.lock:
+                self.connections_opened = self.connections_opened + 1
+            return self.connection_class(self.host, self.port, timeout=self.timeout)
+
+    def _release(self, connection: http.client.HTTPConnection):
+        try:
+            self.pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def translate_batch(self, texts: List[str]) -> List[str]:
+        body = json.dumps({"texts": texts, "target_lang": self.target_lang}, ensure_ascii=False).encode("utf-8")
+
+        connection = self._acquire()
+        try:
+            connection.request("POST", self.path, body, self.headers)
+            response = connection.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            connection.close()
+            raise RetryableError(f"Connection Failed: {e!r}") from e
+
+        if response.will_close:
+            connection.close()
+        else:
+            self._release(connection)
+
+        if response.status == 429:
+            retry_after = response.getheader("Retry-After")
+            raise RateLimitError(
+                f"Rate Limited. Status: {response.status}",
+                float(retry_after) if retry_after else None,
+            )
+        if response.status >= 500:
+            raise RetryableError(f"Server Error. Status: {response.status}")
+        if response.status != 200:
+            raise Exception(f"Translation Request Failed. Status: {response.status} - {payload[:200]!r}")
+
+        translations = json.loads(payload.decode("utf-8"))["translations"]
+        if len(translations) != len(texts):
+            raise Exception(
+                "Translation Count Mismatch. "
+                f"Sent: {len(texts)} - Received: {len(translations)}"
+            )
+        return translations
+
+    def close(self):
+        while True:
+            try:
+                self.pool.get_nowait().close()
+            except queue.Empty:
+                break
+        METRICS.count("connections_opened", self.connections_opened)
+        LOGGER.info(f"HTTP Backend: {self.host}:{self.port} - Connections Opened: {self.connections_opened}")
+
+
+def create_backend(
+    name: str,
+    target_lang: str = "EN-US",
+    auth_key: Optional[str] = None,
+    url: Optional[str] = None,
+    pool_size: int = 8,
+) -> Backend:
+    if name == "deepl":
+        return DeepLBackend(auth_key, target_lang)
+    if name == "http":
+        if not url:
+            raise Exception("Backend URL Missing. The http backend requires a URL.")
+        # The DeepL key is never sent to another service
+        return HttpJsonBackend(url, target_lang, pool_size)
+    if name == "echo":
+        return EchoBackend(target_lang)
+    raise Exception(f"Unknown Backend. Backend: {name} - Expected One of: {', '.join(BACKENDS)}")
+
@@ -0,0 +1,169 @@
+import hashlib
+import logging
+import sqlite3
+import time
+import unicodedata
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+class TranslationMemory:
+    """
+    On-disk translation memory backed by SQLite.
+    Entries are keyed by a hash of the normalized source text, target language and translation backend.
+    """
+    def __init__(
+        self,
+        filename: str,
+        backend: str = "deepl",
+        target_lang: str = "EN-US",
+        max_entries: Optional[int] = None,
+        max_age_days: Optional[float] = None,
+    ):
+        self.filename = filename
+        self.backend = backend
+        self.target_lang = target_lang
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+
+        self.hits = 0
+        self.misses = 0
+
+        self.connection = sqlite3.connect(self.filename)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "key TEXT PRIMARY KEY, "
+            "source TEXT NOT NULL, "
+            "translation TEXT NOT NULL, "
+            "backend TEXT NOT NULL, "
+            "target_lang TEXT NOT NULL, "
+            "created REAL NOT NULL, "
+            "accessed REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_translations_accessed ON translations (accessed)")
+        self.connection.commit()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        # Unify unicode representation & collapse runs of whitespace
+        text = unicodedata.normalize("NFC", text)
+        return " ".join(text.split())
+
+    def key(self, text: str) -> str:
+        key_raw = f"{self.backend}\0{self.target_lang}\0{self.normalize(text)}"
+        return hashlib.sha256(key_raw.encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: List[str]) -> Dict[str, str]:
+        """
+        Look up translations for texts.
+        :param texts: Source texts
+        :return: Mapping of source text -> translation for every text found in the cache
+        """
+        keys = {text: self.key(text) for text in texts}
+        found = self._select(set(keys.values()))
+
+        if found:
+            now = time.time()
+            self.connection.executemany(
+                "UPDATE translations SET accessed = ? WHERE key = ?",
+                [(now, key) for key in found],
+            )
+            self.connection.commit()
+
+        translations = {}
+        for text in texts:
+            key = keys[text]
+            if key in found:
+                translations[text] = found[key]
+                self.hits = self.hits + 1
+            else:
+                self.misses = self.misses + 1
+
+        return translations
+
+    def contains_many(self, texts: List[str]) -> Set[str]:
+        """
+        Texts with a cached translation - a dry lookup that leaves hit counts & access times untouched.
+        """
+        keys = {text: self.key(text) for text in texts}
+        found = self._select(set(keys.values()))
+        return {text for text, key in keys.items() if key in found}
+
+    def _select(self, keys: Set[str]) -> Dict[str, str]:
+        found = {}
+        keys_list = list(keys)
+        # Stay under SQLite's bound parameter limit
+        for start in range(0, len(keys_list), 500):
+            chunk = keys_list[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.connection.execute(
+                f"SELECT key, translation FROM translations WHERE key IN ({placeholders})",
+                chunk,
+            )
+            for key, translation in rows:
+                found[key] = translation
+        return found
+
+    def put_many(self, pairs: List[Tuple[str, str]]):
+        """
+        Store translations.
+        :param pairs: (source text, translation) pairs
+        """
+        now = time.time()
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO translations "
+            "(key, source, translation, backend, target_lang, created, accessed) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (self.key(source), source, translation, self.backend, self.target_lang, now, now)
+                for source, translation in pairs
+            ],
+        )
+        self.connection.commit()
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        """
+        Every (source text, translation) pair of this backend & target language - seeds a FuzzyMemory.
+        """
+        rows = self.connection.execute(
+            "SELECT source, translation FROM translations WHERE backend = ? AND target_lang = ?",
+            (self.backend, self.target_lang),
+        )
+        yield from rows
+
+    def evict(self) -> int:
+        """
+        Remove entries older than max_age_days & least recently used entries beyond max_entries.
+        :return: Number of entries removed
+        """
+        removed = 0
+
+        if self.max_age_days is not None:
+            cutoff = time.time() - self.max_age_days * SECONDS_PER_DAY
+            cursor = self.connection.execute("DELETE FROM translations WHERE accessed < ?", (cutoff,))
+            removed = removed + cursor.rowcount
+
+        if self.max_entries is not None:
+            cursor = self.connection.execute(
+                "DELETE FROM translations WHERE key NOT IN "
+                "(SELECT key FROM translations ORDER BY accessed DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+            removed = removed + cursor.rowcount
+
+        self.connection.commit()
+        if removed:
+            LOGGER.info(f"Translation Memory: {self.filename} - Evicted {removed} entries")
+
+        return removed
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+    def close(self):
+        self.evict()
+        LOGGER.info(f"Translation Memory: {self.filename} - Hits: {self.hits} Misses: {self.misses}")
+        self.connection.close()
@@ -1,4 +1,16 @@
 CHARACTER_LIMIT = 5000
+# Maximum number of texts DeepL accepts in a single translate request
+TRANSLATE_BATCH_LIMIT = 50
+# Corpus-wide packed partitions & the manifest mapping them back to their source files
+PACK_PARTITION_PREFIX = "corpus"
+PACK_MANIFEST_FILENAME = "manifest.json"
+# Sharded work queue - shards are packed partitions, far larger than a single request
+SHARD_CHARACTER_LIMIT = 100_000
+SHARD_DIRECTORY = "shards"
+# Per-file record of segment hashes & translations for incremental re-translation
+SIDECAR_SUFFIX = "_segments.json"
+# Structured intermediate format - one JSON record per segment
+RECORDS_EXTENSION = ".jsonl"
 DELIMITER_NEWLINE = ";NEW_LINE;"
 DELIMITER_MULTILINE_GENERAL = ":ML:"
 DELIMITER_MULTILINE_START = ":MLS:"
@@ -0,0 +1,339 @@
+from glob import glob
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import itertools
+import json
+import logging
+import os
+import queue
+import socketserver
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from packager.backends import Backend
+from packager.cache import TranslationMemory
+from packager.engine import TranslationEngine
+from packager.fuzzy import FuzzyMemory
+from packager.glossary import Glossary
+from packager.metrics import METRICS
+from packager.pipeline import Pipeline
+
+LOGGER = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class Job:
+    def __init__(self, job_id: int, filename: str, origin: str):
+        self.job_id = job_id
+        self.filename = filename
+        self.origin = origin
+        self.status = JOB_QUEUED
+        self.error: Optional[str] = None
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.event = threading.Event()
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.job_id,
+            "file": self.filename,
+            "origin": self.origin,
+            "status": self.status,
+            "error": self.error,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+            "duration_s": round(self.finished - self.started, 4) if self.finished and self.started else None,
+        }
+
+
+class TranslationDaemon:
+    """
+    Resident unpack -> translate -> repack service.
+    A watcher polls the input directory & queues every XML file that is new or modified, once its size &
+    modification time hold still for one poll. A single worker runs the queued files through the Pipeline,
+    keeping the backend's connections, the translation memory & the fuzzy memory warm between jobs - an edited
+    file only sends the segments that changed. Jobs are also submitted & inspected through a local HTTP API.
+    """
+    def __init__(
+        self,
+        dir_input: str,
+        output_directory: str,
+        backend: Backend,
+        filename_cache: Optional[str] = None,
+        fuzzy: Optional[FuzzyMemory] = None,
+        concurrency: int = 4,
+        rate: Optional[float] = None,
+        poll_interval: float = 1.0,
+        dir_debug: Optional[str] = None,
+        glossary: Optional[Glossary] = None,
+    ):
+        self.dir_input = dir_input
+        self.output_directory = output_directory
+        self.backend = backend
+        self.filename_cache = filename_cache
+        # Exact repeats are reused from memory even when no similarity threshold was asked for
+        self.fuzzy = fuzzy if fuzzy is not None else FuzzyMemory(threshold=1.0)
+        self.engine = TranslationEngine(backend.translate_batch, concurrency, rate)
+        self.poll_interval = poll_interval
+        self.dir_debug = dir_debug
+        self.glossary = glossary
+
+        self.jobs: Dict[int, Job] = {}
+        self.jobs_queued: Dict[str, Job] = {}
+        self.job_ids = itertools.count(1)
+        self.queue: "queue.Queue[Optional[Job]]" = queue.Queue()
+        self.lock = threading.Lock()
+
+        self.stats_seen: Dict[str, Tuple[int, int]] = {}
+        self.stats_pending: Dict[str, Tuple[int, int]] = {}
+        self.started = time.time()
+        self.stopping = threading.Event()
+        self.threads: List[threading.Thread] = []
+
+    def start(self):
+        self._scan_initial()
+        self.threads = [
+            threading.Thread(target=self._work, name="daemon-worker", daemon=True),
+            threading.Thread(target=self._watch, name="daemon-watcher", daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+        LOGGER.info(f"Watching: {self.dir_input} - Output: {self.output_directory}")
+
+    def stop(self):
+        self.stopping.set()
+        self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def submit(self, filename: str, origin: str = "api") -> Job:
+        """
+        Queue a file - a file already waiting in the queue is not queued twice.
+        """
+        with self.lock:
+            job = self.jobs_queued.get(filename)
+            if job is not None:
+                return job
+
+            job = Job(next(self.job_ids), filename, origin)
+            self.jobs[job.job_id] = job
+            self.jobs_queued[filename] = job
+        self.queue.put(job)
+        LOGGER.info(f"|{os.path.basename(filename)}| Job {job.job_id} Queued ({origin})")
+        return job
+
+    def _stat(self, filename: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        stats = {}
+        for filename in glob(os.path.join(self.dir_input, "*.xml")):
+            stat = self._stat(filename)
+            if stat is not None:
+                stats[filename] = stat
+        return stats
+
+    def _scan_initial(self):
+        # Files without an up to date output are translated on start
+        for filename, stat in sorted(self._scan().items()):
+            self.stats_seen[filename] = stat
+            filename_output = os.path.join(self.output_directory, os.path.basename(filename))
+            stat_output = self._stat(filename_output)
+            if stat_output is None or stat_output[0] < stat[0]:
+                self.submit(filename, "start")
+
+    def _watch(self):
+        while not self.stopping.wait(self.poll_interval):
+            stats = self._scan()
+            for filename, stat in sorted(stats.items()):
+                if self.stats_seen.get(filename) == stat:
+                    self.stats_pending.pop(filename, None)
+                    continue
+
+                # Wait for a file that is still being written to settle
+                if self.stats_pending.get(filename) != stat:
+                    self.stats_pending[filename] = stat
+                    continue
+
+                del self.stats_pending[filename]
+                self.stats_seen[filename] = stat
+                self.submit(filename, "watch")
+
+            for filename in set(self.stats_seen) - set(stats):
+                del self.stats_seen[filename]
+
+    def _work(self):
+        # The SQLite connection belongs to the thread that uses it
+        cache = None
+        if self.filename_cache:
+            cache = TranslationMemory(self.filename_cache, backend=self.backend.name)
+            self.fuzzy.add_many(cache.items())
+
+        try:
+            while True:
+                job = self.queue.get()
+                if job is None:
+                    break
+                self._run_job(job, cache)
+        finally:
+            if cache is not None:
+                cache.close()
+
+    def _run_job(self, job: Job, cache: Optional[TranslationMemory]):
+        with self.lock:
+            self.jobs_queued.pop(job.filename, None)
+            job.status = JOB_RUNNING
+            job.started = time.time()
+
+        try:
+            with METRICS.timer("jobs"):
+                Pipeline(
+                    [job.filename],
+                    self.output_directory,
+                    self.engine,
+                    cache,
+                    self.dir_debug,
+                    self.fuzzy,
+                    self.glossary,
+                ).run()
+        except Exception as e:
+            LOGGER.exception(f"|{os.path.basename(job.filename)}| Job {job.job_id} Failed")
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = JOB_FAILED
+        else:
+            job.status = JOB_DONE
+        finally:
+            job.finished = time.time()
+            job.event.set()
+            METRICS.count(f"jobs_{job.status}")
+
+        LOGGER.info(
+            f"|{os.path.basename(job.filename)}| Job {job.job_id} {job.status.title()} - "
+            f"{job.finished - job.started:.3f}s"
+        )
+
+    def status(self) -> Dict:
+        with self.lock:
+            statuses = [job.status for job in self.jobs.values()]
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "watching": self.dir_input,
+            "output": self.output_directory,
+            "backend": self.backend.name,
+            "files_watched": len(self.stats_seen),
+            "jobs": {status: statuses.count(status) for status in (JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED)},
+            "memory_entries": len(self.fuzzy),
+            "api_requests": self.engine.requests,
+            "api_retries": self.engine.retries,
+            "metrics": METRICS.snapshot(),
+        }
+
+    def job(self, job_id: int) -> Optional[Job]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def job_list(self) -> List[Dict]:
+        with self.lock:
+            return [job.to_dict() for job in self.jobs.values()]
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def handler_class(daemon: TranslationDaemon):
+    """
+    GET /status, GET /jobs, GET /jobs/<id>
+    POST /jobs {"file": path, "wait": bool} - queue a file, optionally blocking until its job finishes
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def address_string(self) -> str:
+            # Unix socket clients have no address
+            return self.client_address[0] if self.client_address else "unix"
+
+        def log_message(self, format, *args):
+            LOGGER.debug("API: " + format, *args)
+
+        def _send_json(self, status: int, payload):
+            body = json.dumps(payload, ensure_ascii=False, indent=1).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.rstrip("/")
+            if path == "/status":
+                self._send_json(200, daemon.status())
+            elif path == "/jobs":
+                self._send_json(200, daemon.job_list())
+            elif path.startswith("/jobs/") and path[len("/jobs/"):].isdigit():
+                job = daemon.job(int(path[len("/jobs/"):]))
+                if job is None:
+                    self._send_json(404, {"message": "Job Not Found"})
+                else:
+                    self._send_json(200, job.to_dict())
+            else:
+                self._send_json(404, {"message": "Not Found"})
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/jobs":
+                self._send_json(404, {"message": "Not Found"})
+                return
+
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                filename = os.path.join(daemon.dir_input, request["file"])
+            except (ValueError, KeyError, TypeError) as e:
+                self._send_json(400, {"message": f"Invalid Request: {e!r}"})
+                return
+            # Absolute paths, ../ & symbolic links may not lead a client out of the watched directory
+            dir_input = os.path.realpath(daemon.dir_input)
+            filename_real = os.path.realpath(filename)
+            if os.path.commonpath([dir_input, filename_real]) != dir_input:
+                self._send_json(400, {"message": f"File: {request['file']} is outside the watched directory"})
+                return
+            # Named as the watcher names it, so a file queued by both runs once
+            filename = os.path.join(daemon.dir_input, os.path.relpath(filename_real, dir_input))
+            if not (os.path.isfile(filename) and filename.endswith(".xml")):
+                self._send_json(400, {"message": f"File: {filename} is not a valid XML file"})
+                return
+
+            job = daemon.submit(filename)
+            if request.get("wait"):
+                job.event.wait()
+                self._send_json(200 if job.status == JOB_DONE else 500, job.to_dict())
+            else:
+                self._send_json(202, job.to_dict())
+
+    return Handler
+
+
+def create_api_server(
+    daemon: TranslationDaemon,
+    host: str = "127.0.0.1",
+    port: int = 8766,
+    socket_path: Optional[str] = None,
+) -> socketserver.BaseServer:
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, handler_class(daemon))
+        LOGGER.info(f"API: unix:{socket_path}")
+        return server
+
+    server = ThreadingHTTPServer((host, port), handler_class(daemon))
+    server.daemon_threads = True
+    LOGGER.info(f"API: http://{host}:{server.server_address[1]}")
+    return server
@@ -0,0 +1,136 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
+import random
+import threading
+import time
+from typing import Callable, Iterator, List, Optional, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+
+class RetryableError(Exception):
+    """
+    Raised by a translate_batch callable when the request failed transiently & may be sent again.
+    """
+
+
+class RateLimitError(RetryableError):
+    """
+    Raised by a translate_batch callable when the backend rejected the request for exceeding its rate limit (HTTP 429).
+    """
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket - each request consumes one token, tokens refill at a fixed rate.
+    A backend-requested pause (Retry-After) blocks every caller until it expires.
+    """
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.tokens >= 1:
+                    self.tokens = self.tokens - 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+class TranslationEngine:
+    """
+    Sends translation batches concurrently through a thread pool.
+    Requests are paced by an optional token bucket & retried with exponential backoff and jitter.
+    """
+    def __init__(
+        self,
+        translate_batch: Callable[[List[str]], List[str]],
+        concurrency: int = 1,
+        rate: Optional[float] = None,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+    ):
+        self.translate_batch = translate_batch
+        self.concurrency = max(1, concurrency)
+        self.bucket = TokenBucket(rate) if rate else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.requests = 0
+        self.retries = 0
+        self.counter_lock = threading.Lock()
+
+    def map(self, batches: List[List[str]]) -> Iterator[Tuple[int, List[str]]]:
+        """
+        Translate batches concurrently.
+        :param batches: Lists of texts, one list per request
+        :return: (batch position, translated texts) pairs in completion order
+        """
+        if self.concurrency == 1 or len(batches) <= 1:
+            for position, texts in enumerate(batches):
+                yield position, self._translate_with_retry(texts)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {
+                executor.submit(self._translate_with_retry, texts): position
+                for position, texts in enumerate(batches)
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def _translate_with_retry(self, texts: List[str]) -> List[str]:
+        attempt = 0
+        while True:
+            if self.bucket is not None:
+                self.bucket.acquire()
+
+            with self.counter_lock:
+                self.requests = self.requests + 1
+
+            try:
+                return self.translate_batch(texts)
+            except RetryableError as e:
+                if attempt >= self.max_retries:
+                    raise
+
+                delay = self._backoff(attempt)
+                if isinstance(e, RateLimitError) and e.retry_after is not None:
+                    delay = max(delay, e.retry_after)
+                    if self.bucket is not None:
+                        self.bucket.pause(e.retry_after)
+
+                LOGGER.warning(f"Request failed: {e} - Retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                with self.counter_lock:
+                    self.retries = self.retries + 1
+
+                time.sleep(delay)
+                attempt = attempt + 1
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter - spreads retries from concurrent workers apart
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
@@ -0,0 +1,190 @@
+from contextlib import contextmanager
+import mmap
+import os
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from xml.parsers import expat
+
+from packager.segment import Row, Segment, TAG_MULTILINE_END, TAG_MULTILINE_GENERAL, TAG_MULTILINE_START
+
+ENCODING_XML = "windows-1251"
+# Bytes handed to the parser at a time - spans are yielded after every chunk
+CHUNK_SIZE = 2 ** 20
+BYTE_SLASH = ord("/")
+LENGTH_TEXT_TAG = len("<text")
+
+XmlData = Union[bytes, mmap.mmap]
+
+
+class XmlError(Exception):
+    """
+    The file is not well-formed XML, or holds what rows keyed by line cannot - the line based regexes are the fallback.
+    """
+
+
+class TextSpan:
+    """
+    The content of one <text> element - the byte offsets of the content in the file (tags excluded), the
+    lines it starts & ends on, the id of the last <string> opened & the content as written (entities unexpanded).
+    """
+    __slots__ = ("string_id", "start", "end", "line_start", "line_end", "text")
+
+    def __init__(
+        self,
+        string_id: Optional[str],
+        start: int,
+        end: int,
+        line_start: int,
+        line_end: int,
+        text: Optional[str],
+    ):
+        self.string_id = string_id
+        self.start = start
+        self.end = end
+        self.line_start = line_start
+        self.line_end = line_end
+        self.text = text
+
+    def lines(self) -> List[str]:
+        # One entry per XML line the content touches - the \r of a CRLF ending is not part of the text
+        return [line[:-1] if line.endswith("\r") else line for line in self.text.split("\n")]
+
+    def __repr__(self) -> str:
+        return (
+            f"TextSpan({self.string_id!r}, {self.start}, {self.end}, {self.line_start}, {self.line_end}, "
+            f"{self.text!r})"
+        )
+
+
+@contextmanager
+def map_file(filename: str) -> Iterator[XmlData]:
+    """
+    Memory-map a file read only - an empty file cannot be mapped & is handed out as empty bytes.
+    """
+    with open(filename, "rb") as xml_fp:
+        if os.fstat(xml_fp.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(xml_fp.fileno(), 0, access=mmap.ACCESS_READ) as xml_map:
+            yield xml_map
+
+
+class TextExtractor:
+    """
+    Streams every <text> element of an XML document through expat.
+    Only element starts reach Python - the content is sliced from the document by the byte offset expat reports
+    for the start tag up to the next closing tag, so it is exactly what the file holds whatever the whitespace &
+    however many elements share a line, and markup inside comments is never picked up.
+    Self-closing <text/> elements are skipped.
+    """
+    def __init__(self, data: XmlData, filename: str = "", encoding: str = ENCODING_XML, is_decoded: bool = True):
+        """
+        :param data: Undecoded XML - bytes or a memory map
+        :param is_decoded: Decode the text of every span - splicing only needs the offsets & lines
+        """
+        self.data = data
+        self.filename = filename
+        self.encoding = encoding
+        self.is_decoded = is_decoded
+
+        # Every byte is a valid ISO-8859-1 character - the parser never maps the declared encoding,
+        # & the byte offsets it reports are offsets into data
+        self.parser = expat.ParserCreate(encoding="iso-8859-1")
+        self.parser.ordered_attributes = True
+        self.parser.StartElementHandler = self._start_element
+
+        # (string id, start, end, first line) of the spans found in the current chunk
+        self.pending: List[Tuple[Optional[str], int, int, int]] = []
+        self.string_id: Optional[str] = None
+
+    def __iter__(self) -> Iterator[TextSpan]:
+        """
+        :raise XmlError: The document is not well-formed
+        """
+        # An empty file has nothing to translate
+        if not len(self.data):
+            return
+
+        try:
+            for position in range(0, len(self.data), CHUNK_SIZE):
+                self.parser.Parse(self.data[position:position + CHUNK_SIZE], False)
+                yield from self._flush()
+            self.parser.Parse(b"", True)
+        except expat.ExpatError as e:
+            raise XmlError(f"Invalid XML. File: {self.filename} - Line: {e.lineno} - {expat.ErrorString(e.code)}")
+        yield from self._flush()
+
+    def _flush(self) -> List[TextSpan]:
+        if not self.pending:
+            return []
+
+        data = self.data
+        contents = [data[start:end] for _, start, end, _ in self.pending]
+        if self.is_decoded:
+            # Decode the chunk's texts in a single call - NUL is not allowed in XML, so it cannot occur in a text
+            texts = b"\0".join(contents).decode(self.encoding).split("\0")
+        else:
+            texts = [None] * len(contents)
+        spans = [
+            TextSpan(string_id, start, end, line_start, line_start + content.count(b"\n"), text)
+            for (string_id, start, end, line_start), content, text in zip(self.pending, contents, texts)
+        ]
+        self.pending = []
+        return spans
+
+    def _start_element(self, name: str, attributes: List[str]):
+        if name == "text":
+            data = self.data
+            tag_start = self.parser.CurrentByteIndex
+            tag_end = data.find(b">", tag_start)
+            # A self-closing <text/> has no content
+            if data[tag_end - 1] == BYTE_SLASH:
+                return
+            # The parser has checked the element is well-formed - its content ends at the next closing tag
+            end = data.find(b"</text", tag_end)
+            line_start = self.parser.CurrentLineNumber
+            if tag_end - tag_start > LENGTH_TEXT_TAG:
+                # Attributes may break the start tag over lines
+                line_start = line_start + data[tag_start:tag_end].count(b"\n")
+            self.pending.append((self.string_id, tag_end + 1, end, line_start))
+        elif name == "string":
+            # Attributes come as [name, value, name, value, ...]
+            names = attributes[::2]
+            string_id = attributes[2 * names.index("id") + 1] if "id" in names else None
+            if string_id is not None and not string_id.isascii():
+                string_id = string_id.encode("iso-8859-1").decode(self.encoding)
+            self.string_id = string_id
+
+
+def span_segment(span: TextSpan) -> Segment:
+    """
+    The rows the line based Unpacker writes for the same <text> element - a single line is one simple row,
+    a multiline body has a start row & an end row when the text shares a line with a tag & one row per line
+    between, which holds the whole XML line.
+    """
+    lines = span.lines()
+    if len(lines) == 1:
+        return Segment(span.line_start, span.line_end, span.string_id, [Row(span.line_start, None, lines[0])])
+
+    rows = []
+    if lines[0]:
+        rows.append(Row(span.line_start, TAG_MULTILINE_START, lines[0]))
+    for offset in range(1, len(lines) - 1):
+        rows.append(Row(span.line_start + offset, TAG_MULTILINE_GENERAL, lines[offset]))
+    if lines[-1]:
+        rows.append(Row(span.line_end, TAG_MULTILINE_END, lines[-1]))
+    return Segment(span.line_start, span.line_end, span.string_id, rows)
+
+
+def splice_rows(content: bytes, line_start: int, rows: List[Row], encoding: str = ENCODING_XML) -> bytes:
+    """
+    Replace the lines of a span's content w/ translated rows - each row replaces the line it was taken from,
+    untouched lines & line endings are kept as they are.
+    :param content: The undecoded span content
+    :param rows: Rows on the lines of the span, in line number order
+    """
+    lines = content.split(b"\n")
+    for row in rows:
+        offset = row.line_number - line_start
+        ending = b"\r" if lines[offset].endswith(b"\r") else b""
+        lines[offset] = row.text.encode(encoding) + ending
+    return b"\n".join(lines)
@@ -0,0 +1,162 @@
+from collections import Counter
+import logging
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from packager.cache import TranslationMemory
+from packager.metrics import METRICS
+
+LOGGER = logging.getLogger(__name__)
+
+# Tokens a translator copies through verbatim - %c[...] colour codes, $$ACTION$$ key bindings & numbers
+RX_TOKEN = re.compile(r"%c\[[^\]]*]|\$\$\w+\$\$|\d+(?:[.,]\d+)*")
+TOKEN_MASK = "\0"
+
+
+class FuzzyMemory:
+    """
+    In-memory fuzzy translation memory over previously translated segments.
+    Tokens are masked before matching, so segments differing only by numbers or tokens match exactly;
+    other near-duplicates are found through an inverted index of character n-grams & accepted when their
+    Jaccard similarity reaches the threshold. The tokens of the new segment are substituted into the reused
+    translation - a match whose tokens cannot be mapped is rejected.
+    """
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        ngram: int = 3,
+        max_candidates: int = 5,
+        max_postings: int = 2000,
+    ):
+        self.threshold = threshold
+        self.ngram = ngram
+        self.max_candidates = max_candidates
+        # n-grams shared by more entries than this are too common to rank candidates by
+        self.max_postings = max_postings
+
+        # (source, translation, n-grams of the masked source)
+        self.entries: List[Tuple[str, str, FrozenSet[str]]] = []
+        self.entries_by_mask: Dict[str, int] = {}
+        self.index: Dict[str, List[int]] = {}
+
+        self.hits_masked = 0
+        self.hits_fuzzy = 0
+        self.misses = 0
+        self.characters_saved = 0
+
+    @staticmethod
+    def mask(text: str) -> str:
+        return RX_TOKEN.sub(TOKEN_MASK, TranslationMemory.normalize(text))
+
+    def _grams(self, masked: str) -> FrozenSet[str]:
+        if len(masked) <= self.ngram:
+            return frozenset((masked,))
+        return frozenset(masked[position:position + self.ngram] for position in range(len(masked) - self.ngram + 1))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add_many(self, pairs: Iterable[Tuple[str, str]]):
+        for source, translation in pairs:
+            masked = self.mask(source)
+            if masked in self.entries_by_mask:
+                continue
+
+            grams = self._grams(masked)
+            entry_id = len(self.entries)
+            self.entries.append((source, translation, grams))
+            self.entries_by_mask[masked] = entry_id
+            for gram in grams:
+                self.index.setdefault(gram, []).append(entry_id)
+
+    def lookup_many(self, texts: List[str]) -> Dict[str, str]:
+        """
+        :return: Mapping of source text -> reused translation for every text with an acceptable match
+        """
+        translations = {}
+        if not self.entries:
+            return translations
+
+        for text in texts:
+            translation = self.lookup(text)
+            if translation is not None:
+                translations[text] = translation
+        return translations
+
+    def lookup(self, text: str) -> Optional[str]:
+        masked = self.mask(text)
+
+        entry_id = self.entries_by_mask.get(masked)
+        if entry_id is not None:
+            translation = self.resubstitute(self.entries[entry_id][0], self.entries[entry_id][1], text)
+            if translation is not None:
+                self.hits_masked = self.hits_masked + 1
+                self.characters_saved = self.characters_saved + len(text)
+                return translation
+
+        # A threshold of 1 only accepts identical masked text - no candidate search needed
+        candidates = self._candidates(masked) if self.threshold < 1.0 else []
+        for similarity, entry_id in candidates:
+            if similarity < self.threshold:
+                break
+            source, translation, _ = self.entries[entry_id]
+            translation = self.resubstitute(source, translation, text)
+            if translation is not None:
+                self.hits_fuzzy = self.hits_fuzzy + 1
+                self.characters_saved = self.characters_saved + len(text)
+                return translation
+
+        self.misses = self.misses + 1
+        return None
+
+    def _candidates(self, masked: str) -> List[Tuple[float, int]]:
+        grams = self._grams(masked)
+        shared = Counter()
+        for gram in grams:
+            postings = self.index.get(gram)
+            if postings is not None and len(postings) <= self.max_postings:
+                shared.update(postings)
+
+        candidates = []
+        for entry_id, _ in shared.most_common(self.max_candidates):
+            grams_entry = self.entries[entry_id][2]
+            candidates.append((len(grams & grams_entry) / len(grams | grams_entry), entry_id))
+
+        return sorted(candidates, reverse=True)
+
+    @staticmethod
+    def resubstitute(source_old: str, translation_old: str, source_new: str) -> Optional[str]:
+        """
+        Carry the tokens of source_new into the translation of source_old.
+        :return: None when the tokens cannot be mapped one to one or one is missing from the translation
+        """
+        tokens_old = RX_TOKEN.findall(source_old)
+        tokens_new = RX_TOKEN.findall(source_new)
+        if len(tokens_old) != len(tokens_new):
+            return None
+
+        mapping = {}
+        for token_old, token_new in zip(tokens_old, tokens_new):
+            if mapping.setdefault(token_old, token_new) != token_new:
+                return None
+
+        tokens_translation = set(RX_TOKEN.findall(translation_old))
+        for token_old, token_new in mapping.items():
+            if token_old != token_new and token_old not in tokens_translation:
+                return None
+
+        return RX_TOKEN.sub(lambda match: mapping.get(match.group(), match.group()), translation_old)
+
+    def report(self):
+        lookups = self.hits_masked + self.hits_fuzzy + self.misses
+        hit_rate = (self.hits_masked + self.hits_fuzzy) / lookups if lookups else 0
+        METRICS.count("fuzzy_hits", self.hits_masked + self.hits_fuzzy)
+        METRICS.count("fuzzy_characters_saved", self.characters_saved)
+        LOGGER.info(
+            f"Fuzzy Memory: Entries: {len(self.entries)} - "
+            f"Masked Hits: {self.hits_masked} - "
+            f"Fuzzy Hits: {self.hits_fuzzy} - "
+            f"Misses: {self.misses} - "
+            f"Hit Rate: {hit_rate:.1%} - "
+            f"Characters Saved: {self.characters_saved}"
+        )
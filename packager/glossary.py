@@ -0,0 +1,225 @@
+from collections import deque
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from packager.metrics import METRICS
+
+LOGGER = logging.getLogger(__name__)
+
+# Term file columns - source forms, target & target variants; several forms in a column are split by "|"
+DELIMITER_COLUMN = "\t"
+DELIMITER_FORM = "|"
+# A placeholder is copied through verbatim by the translator, like the $$ACTION$$ key bindings
+PLACEHOLDER_PREFIX = "$$TERM"
+PLACEHOLDER = PLACEHOLDER_PREFIX + "{}$$"
+
+
+class TermAutomaton:
+    """
+    Aho-Corasick automaton over a set of terms - every occurrence of every term is found in a single pass
+    over the text, however many terms there are.
+    Matches are whole words: a term starting or ending w/ a letter or digit does not match inside a word.
+    Overlapping matches resolve to the leftmost, then the longest.
+    """
+    def __init__(self, replacements: Dict[str, str]):
+        """
+        :param replacements: Term -> replacement text
+        """
+        self.terms: List[str] = []
+        self.replacements: List[str] = []
+        # Trie transitions, failure links & the terms ending at each state - the state's own & its suffixes'
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.outputs: List[Tuple[int, ...]] = [()]
+
+        for term, replacement in replacements.items():
+            if term:
+                self._add(term, replacement)
+        self._link()
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def _add(self, term: str, replacement: str):
+        state = 0
+        for char in term:
+            state_next = self.goto[state].get(char)
+            if state_next is None:
+                state_next = len(self.goto)
+                self.goto[state][char] = state_next
+                self.goto.append({})
+                self.fail.append(0)
+                self.outputs.append(())
+            state = state_next
+
+        self.outputs[state] = (len(self.terms),)
+        self.terms.append(term)
+        self.replacements.append(replacement)
+
+    def _link(self):
+        # Breadth first - the failure state of every state is shallower & already linked
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, state_next in self.goto[state].items():
+                queue.append(state_next)
+                state_fail = self.fail[state]
+                while state_fail and char not in self.goto[state_fail]:
+                    state_fail = self.fail[state_fail]
+                state_fail = self.goto[state_fail].get(char, 0)
+                self.fail[state_next] = state_fail
+                self.outputs[state_next] = self.outputs[state_next] + self.outputs[state_fail]
+
+    def find(self, text: str) -> List[Tuple[int, int, int]]:
+        """
+        :return: (start, end, term index) of every non-overlapping whole-word match, in text order
+        """
+        goto = self.goto
+        fail = self.fail
+        outputs = self.outputs
+        terms = self.terms
+
+        matches = []
+        state = 0
+        for end, char in enumerate(text, start=1):
+            state_next = goto[state].get(char)
+            while state_next is None and state:
+                state = fail[state]
+                state_next = goto[state].get(char)
+            state = state_next or 0
+            for term_index in outputs[state]:
+                matches.append((end - len(terms[term_index]), end, term_index))
+
+        if not matches:
+            return matches
+
+        # Leftmost-longest, skipping matches that overlap one already taken or sit inside a word
+        matches.sort(key=lambda match: (match[0], -match[1]))
+        selected = []
+        position = 0
+        for start, end, term_index in matches:
+            if start < position:
+                continue
+            term = terms[term_index]
+            if term[0].isalnum() and start and text[start - 1].isalnum():
+                continue
+            if term[-1].isalnum() and end < len(text) and text[end].isalnum():
+                continue
+            selected.append((start, end, term_index))
+            position = end
+        return selected
+
+    def replace(self, text: str) -> Tuple[str, int]:
+        """
+        :return: (text w/ every match replaced, number of replacements)
+        """
+        matches = self.find(text)
+        if not matches:
+            return text, 0
+
+        pieces = []
+        position = 0
+        for start, end, term_index in matches:
+            pieces.append(text[position:start])
+            pieces.append(self.replacements[term_index])
+            position = end
+        pieces.append(text[position:])
+        return "".join(pieces), len(matches)
+
+
+class Glossary:
+    """
+    Enforces fixed translations of STALKER terminology - factions, locations, items.
+    Before translation every source form of a term is swapped for a placeholder the translator leaves alone;
+    after translation the placeholders become the term's target & known variants of the target are normalized
+    to it. Each step is one automaton pass over a segment, whatever the size of the glossary.
+    Manually translated text has no placeholders - only its variants are normalized.
+    """
+    def __init__(self, entries: Iterable[Tuple[List[str], str, List[str]]]):
+        """
+        :param entries: (source forms, target, target variants) - a term w/o source forms is only normalized
+        """
+        protections: Dict[str, str] = {}
+        normalizations: Dict[str, str] = {}
+        for term_index, (forms_source, target, variants) in enumerate(entries):
+            placeholder = PLACEHOLDER.format(term_index)
+            for form in forms_source:
+                if form in protections:
+                    LOGGER.warning(f"Duplicate Glossary Term: {form} - Keeping the last occurrence")
+                protections[form] = placeholder
+            if forms_source:
+                normalizations[placeholder] = target
+            for variant in variants:
+                normalizations[variant] = target
+
+        self.source = TermAutomaton(protections)
+        self.target = TermAutomaton(normalizations)
+
+    @classmethod
+    def from_file(cls, filename: str) -> "Glossary":
+        """
+        One term per line - "source forms<TAB>target[<TAB>target variants]", e.g.
+          Долг|Долга|Долгу|Долгом|Долге<TAB>Duty<TAB>Dolg|Debt
+        Blank lines & lines starting w/ # are ignored.
+        """
+        entries = []
+        with open(filename, "r", encoding="utf-8") as glossary_fp:
+            for line_number, line in enumerate(glossary_fp, start=1):
+                line = line.rstrip("\r\n")
+                if not line.strip() or line.startswith("#"):
+                    continue
+
+                columns = line.split(DELIMITER_COLUMN)
+                if not 2 <= len(columns) <= 3 or not columns[1].strip():
+                    raise Exception(f"Invalid Glossary Row format. File: {filename} - Line: {line_number}: {line}")
+                forms_source = cls._split_forms(columns[0])
+                variants = cls._split_forms(columns[2]) if len(columns) == 3 else []
+                entries.append((forms_source, columns[1].strip(), variants))
+
+        glossary = cls(entries)
+        LOGGER.info(
+            f"Glossary: {filename} - "
+            f"Terms: {len(entries)} - "
+            f"Source Forms: {len(glossary.source)} - "
+            f"Target Forms: {len(glossary.target)}"
+        )
+        return glossary
+
+    @staticmethod
+    def _split_forms(column: str) -> List[str]:
+        return [form.strip() for form in column.split(DELIMITER_FORM) if form.strip()]
+
+    def protect(self, text: str) -> str:
+        text, count = self.source.replace(text)
+        if count:
+            METRICS.count("glossary_protected", count)
+        return text
+
+    def normalize(self, text: str) -> str:
+        text, count = self.target.replace(text)
+        if count:
+            METRICS.count("glossary_normalized", count)
+        return text
+
+    def protect_many(self, texts: List[str]) -> List[str]:
+        with METRICS.timer("glossary"):
+            return [self.protect(text) for text in texts]
+
+    def normalize_many(self, texts: List[str], texts_source: Optional[List[str]] = None) -> List[str]:
+        """
+        :param texts_source: The protected texts the translations came from - placeholders the translator
+            dropped or mangled are reported
+        """
+        with METRICS.timer("glossary"):
+            texts_normalized = [self.normalize(text) for text in texts]
+
+        if texts_source is not None:
+            lost = sum(
+                text_source.count(PLACEHOLDER_PREFIX) - text.count(PLACEHOLDER_PREFIX)
+                for text_source, text in zip(texts_source, texts)
+                if PLACEHOLDER_PREFIX in text_source
+            )
+            if lost > 0:
+                METRICS.count("glossary_placeholders_lost", lost)
+                LOGGER.warning(f"Glossary Placeholders Lost in Translation: {lost}")
+        return texts_normalized
@@ -0,0 +1,67 @@
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from packager.constants import SIDECAR_SUFFIX
+
+LOGGER = logging.getLogger(__name__)
+
+# Unpacker line prefixes ([N], [N]:ML:, ...) at the start of every row - removed before hashing
+RX_ROW_PREFIX = re.compile(r"^\[\d+](?::ML[SE]?:)? ?", re.MULTILINE)
+
+# (line offset from the segment's first line, TranslateType value, translated text)
+SidecarRow = Tuple[int, str, str]
+
+
+class Sidecar:
+    """
+    Per-file record of each <text> segment's source hash & the translation used for it.
+    Segments are keyed by their <string id>, falling back to their first line number.
+    """
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.segments: Dict[str, Dict] = {}
+
+        if os.path.isfile(self.filename):
+            with open(self.filename, "r", encoding="utf-8") as sidecar_fp:
+                self.segments = json.load(sidecar_fp)["segments"]
+            LOGGER.info(f"Sidecar: {self.filename} - Loaded {len(self.segments)} segments")
+
+    @classmethod
+    def for_base(cls, filename_base: str, directory: str) -> "Sidecar":
+        base_root = os.path.basename(filename_base).split(".")[0]
+        return cls(os.path.join(directory, base_root + SIDECAR_SUFFIX))
+
+    @staticmethod
+    def key(string_id: Optional[str], idx_start: int) -> str:
+        return string_id if string_id is not None else f"line:{idx_start}"
+
+    @staticmethod
+    def fingerprint(text: str) -> str:
+        # Line numbers shift when strings are added above - hash the source text only
+        return hashlib.sha256(RX_ROW_PREFIX.sub("", text).encode("utf-8")).hexdigest()
+
+    def is_current(self, key: str, text: str) -> bool:
+        entry = self.segments.get(key)
+        return entry is not None and entry["hash"] == self.fingerprint(text) and bool(entry["rows"])
+
+    def rows(self, key: str) -> List[SidecarRow]:
+        return [tuple(row) for row in self.segments[key]["rows"]]
+
+    def update(self, segments: Dict[str, Tuple[str, List[SidecarRow]]]):
+        """
+        Replace the recorded segments - segments no longer in the source file are dropped.
+        :param segments: key -> (source text, translated rows)
+        """
+        self.segments = {
+            key: {"hash": self.fingerprint(text), "rows": [list(row) for row in rows]}
+            for key, (text, rows) in segments.items()
+        }
+
+    def save(self):
+        with open(self.filename, "w", encoding="utf-8") as sidecar_fp:
+            json.dump({"segments": self.segments}, sidecar_fp, ensure_ascii=False)
+        LOGGER.info(f"Sidecar: {self.filename} - Saved {len(self.segments)} segments")
@@ -0,0 +1,100 @@
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Set, Tuple
+
+from packager.records import dumps
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Journal:
+    """
+    Append-only checkpoint of a translation run - one JSON line per translated segment & per written file.
+    Translations are buffered & flushed to disk (fsync) every flush_pairs pairs or flush_interval seconds,
+    so a run that dies midway loses at most one interval; a rerun loads the journal, sends none of the
+    journaled segments again & skips the files already written.
+    A line cut short by a crash is ignored on load.
+    """
+    def __init__(self, filename: str, flush_interval: float = 5.0, flush_pairs: int = 500):
+        self.filename = filename
+        self.flush_interval = flush_interval
+        self.flush_pairs = flush_pairs
+
+        self.translations: Dict[str, str] = {}
+        self.files_done: Set[str] = set()
+        self._load()
+
+        self.buffer: List[str] = []
+        self.flushed = time.monotonic()
+        self.checkpoints = 0
+        self.journal_fp = open(self.filename, "a", encoding="utf-8")
+
+    def _load(self):
+        if not os.path.isfile(self.filename):
+            return
+
+        with open(self.filename, "r", encoding="utf-8") as journal_fp:
+            for line_number, line in enumerate(journal_fp, 1):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    LOGGER.warning(f"|{os.path.basename(self.filename)}| Skipping Truncated Entry: Line {line_number}")
+                    continue
+
+                if "file" in record:
+                    self.files_done.add(record["file"])
+                else:
+                    self.translations[record["source"]] = record["translation"]
+
+        LOGGER.info(
+            f"|{os.path.basename(self.filename)}| Resuming - "
+            f"Segments: {len(self.translations)} - "
+            f"Files Done: {len(self.files_done)}"
+        )
+
+    @staticmethod
+    def file_key(filename: str) -> str:
+        return os.path.abspath(filename)
+
+    def is_done(self, filename: str) -> bool:
+        return self.file_key(filename) in self.files_done
+
+    def get_many(self, texts: Iterable[str]) -> Dict[str, str]:
+        return {text: self.translations[text] for text in texts if text in self.translations}
+
+    def put_many(self, pairs: List[Tuple[str, str]]):
+        for source, translation in pairs:
+            if self.translations.get(source) == translation:
+                continue
+            self.translations[source] = translation
+            self.buffer.append(dumps({"source": source, "translation": translation}))
+
+        if len(self.buffer) >= self.flush_pairs or time.monotonic() - self.flushed >= self.flush_interval:
+            self.checkpoint()
+
+    def mark_done(self, filename: str):
+        # A file is only marked once every translation it uses is on disk
+        self.files_done.add(self.file_key(filename))
+        self.buffer.append(dumps({"file": self.file_key(filename)}))
+        self.checkpoint()
+
+    def checkpoint(self):
+        if self.buffer:
+            self.journal_fp.writelines(self.buffer)
+            self.journal_fp.flush()
+            os.fsync(self.journal_fp.fileno())
+            self.buffer = []
+            self.checkpoints = self.checkpoints + 1
+        self.flushed = time.monotonic()
+
+    def close(self):
+        self.checkpoint()
+        self.journal_fp.close()
+        LOGGER.info(
+            f"|{os.path.basename(self.filename)}| Journal Closed - "
+            f"Segments: {len(self.translations)} - "
+            f"Files Done: {len(self.files_done)} - "
+            f"Checkpoints: {self.checkpoints}"
+        )
@@ -0,0 +1,103 @@
+from collections import defaultdict
+from contextlib import contextmanager
+import cProfile
+import io
+import logging
+import pstats
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterator, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Metrics:
+    """
+    Process-wide stage timers & counters, reported once at exit instead of logging every line.
+    """
+    def __init__(self):
+        self.timers: Dict[str, float] = defaultdict(float)
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        time_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - time_start
+            with self.lock:
+                self.timers[name] = self.timers[name] + elapsed
+
+    def count(self, name: str, amount: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters[name] + amount
+
+    def reset(self):
+        with self.lock:
+            self.timers.clear()
+            self.counters.clear()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self.lock:
+            return {"timers": dict(self.timers), "counters": dict(self.counters)}
+
+    def merge(self, snapshot: Dict[str, Dict]):
+        # Fold in the metrics of a worker process
+        with self.lock:
+            for name, elapsed in snapshot["timers"].items():
+                self.timers[name] = self.timers[name] + elapsed
+            for name, amount in snapshot["counters"].items():
+                self.counters[name] = self.counters[name] + amount
+
+    def report(self):
+        snapshot = self.snapshot()
+        if not snapshot["timers"] and not snapshot["counters"]:
+            return
+
+        lines = ["Summary:"]
+        for name, elapsed in sorted(snapshot["timers"].items()):
+            lines.append(f"  {name:<24} {elapsed:>10.3f}s")
+        for name, amount in sorted(snapshot["counters"].items()):
+            lines.append(f"  {name:<24} {amount:>10}")
+        LOGGER.info("\n".join(lines))
+
+
+METRICS = Metrics()
+
+
+def collect(function: Callable, *args) -> Tuple[Any, Dict[str, Dict]]:
+    """
+    Run function in a worker process & return its result together with the metrics it recorded.
+    """
+    METRICS.reset()
+    result = function(*args)
+    return result, METRICS.snapshot()
+
+
+@contextmanager
+def profile(enabled: bool, name: str, top: int = 25) -> Iterator[None]:
+    """
+    Optionally capture a cProfile & tracemalloc peak for the enclosed block.
+    The raw profile is written to <name>.prof for later inspection (snakeviz, pstats).
+    """
+    if not enabled:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        profiler.dump_stats(f"{name}.prof")
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(top)
+        LOGGER.info(f"Profile: {name}.prof - Peak Memory: {peak / 2 ** 20:.1f}MB\n{stream.getvalue()}")
@@ -0,0 +1,230 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import json
+import logging
+import os
+from typing import Dict, List, Set, Tuple
+
+from packager.constants import CHARACTER_LIMIT, PACK_MANIFEST_FILENAME, PACK_PARTITION_PREFIX
+from packager.incremental import Sidecar
+from packager.metrics import METRICS, collect
+from packager.unpacker import Unpacker
+
+LOGGER = logging.getLogger(__name__)
+
+# (source file position, first line number, last line number, unpacked text)
+PackSegment = Tuple[int, int, int, str]
+
+
+class Packer:
+    """
+    Packs the unpacked segments of many XML files into the fewest partitions under the character limit.
+    Segments are placed first-fit-decreasing; a multiline group is a single segment & is never split.
+    A manifest maps every partition back to its source files & line ranges.
+    """
+    def __init__(
+        self,
+        filenames: List[str],
+        dir_output_unpack: str,
+        dir_input_repack: str,
+        character_limit: int = CHARACTER_LIMIT,
+        jobs: int = 1,
+        incremental: bool = False,
+    ):
+        self.filenames = filenames
+        self.dir_output_unpack = dir_output_unpack
+        self.dir_input_repack = dir_input_repack
+        self.character_limit = character_limit
+        self.jobs = jobs
+        self.incremental = incremental
+
+    def pack(self) -> List[List[PackSegment]]:
+        LOGGER.info(f"Packing {len(self.filenames)} files...")
+        with METRICS.timer("unpack"):
+            segments = self._extract()
+        with METRICS.timer("pack"):
+            partitions = self.first_fit_decreasing(segments, self.character_limit)
+
+        characters = sum(len(segment[3]) for segment in segments)
+        METRICS.count("segments_unpacked", len(segments))
+        METRICS.count("characters_unpacked", characters)
+        fill = characters / (len(partitions) * self.character_limit) if partitions else 0
+        LOGGER.info(
+            f"Packed Segments: {len(segments)} - "
+            f"Characters: {characters} - "
+            f"Partitions: {len(partitions)} - "
+            f"Average Fill: {fill:.1%}"
+        )
+
+        self._write_partitions(partitions)
+        self._write_manifest(partitions)
+
+        return partitions
+
+    def _extract(self) -> List[PackSegment]:
+        arguments = [
+            (position, filename, self.dir_output_unpack, self.dir_input_repack, self.incremental)
+            for position, filename in enumerate(self.filenames)
+        ]
+        if self.jobs > 1:
+            results = []
+            with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+                for result, snapshot in executor.map(collect, repeat(extract_segments), *zip(*arguments)):
+                    results.append(result)
+                    METRICS.merge(snapshot)
+        else:
+            results = [extract_segments(*argument) for argument in arguments]
+
+        return [segment for result in results for segment in result]
+
+    @staticmethod
+    def first_fit_decreasing(segments: List[PackSegment], character_limit: int) -> List[List[PackSegment]]:
+        """
+        Place segments longest first into the first partition with room - a partition holds fewer than
+        character_limit characters, matching the Unpacker. A segment too long for any partition gets its own.
+        :return: Partitions, each sorted back into source order
+        """
+        segments_sorted = sorted(segments, key=lambda segment: len(segment[3]), reverse=True)
+        capacity = _CapacityTree(len(segments_sorted), character_limit)
+        partitions: List[List[PackSegment]] = []
+
+        for segment in segments_sorted:
+            length = len(segment[3])
+            # Leftmost partition where the segment keeps the total strictly under the limit
+            position = capacity.find_first(length + 1) if length < character_limit else None
+            if position is None:
+                position = len(partitions)
+                partitions.append([])
+                capacity.consume(position, min(length, character_limit))
+            else:
+                capacity.consume(position, length)
+            partitions[position].append(segment)
+
+        for partition in partitions:
+            partition.sort(key=lambda segment: (segment[0], segment[1]))
+
+        return partitions
+
+    def _partition_root(self, position: int) -> str:
+        return f"{PACK_PARTITION_PREFIX}-{position}"
+
+    def _write_partitions(self, partitions: List[List[PackSegment]]):
+        for position, partition in enumerate(partitions):
+            root = self._partition_root(position)
+            output_filename = f"{self.dir_output_unpack}/{root}_unpacked.txt"
+            with open(output_filename, "w", encoding="windows-1251") as output_fp:
+                output_fp.writelines(segment[3] for segment in partition)
+
+            # Create Empty File w/ Proper Naming Scheme in Repacker Input Directory
+            with open(f"{self.dir_input_repack}/{root}_translate.txt", "w"):
+                pass
+
+        LOGGER.info(f"Writing: {len(partitions)} partitions to {self.dir_output_unpack} - Successful")
+
+    def _write_manifest(self, partitions: List[List[PackSegment]]):
+        manifest = {
+            "character_limit": self.character_limit,
+            "files": [os.path.basename(filename) for filename in self.filenames],
+            "partitions": [
+                {
+                    "partition": self._partition_root(position),
+                    "characters": sum(len(segment[3]) for segment in partition),
+                    "segments": [
+                        {
+                            "file": os.path.basename(self.filenames[segment[0]]),
+                            "lines": [segment[1], segment[2]],
+                            "rows": segment[3].count("\n"),
+                        }
+                        for segment in partition
+                    ],
+                }
+                for position, partition in enumerate(partitions)
+            ],
+        }
+
+        manifest_filename = f"{self.dir_input_repack}/{PACK_MANIFEST_FILENAME}"
+        with open(manifest_filename, "w", encoding="utf-8") as manifest_fp:
+            json.dump(manifest, manifest_fp, ensure_ascii=False, indent=1)
+        LOGGER.info(f"Writing: {manifest_filename} - Successful")
+
+
+def find_packed_partitions(filenames: List[str]) -> List[str]:
+    """
+    Partitions mix the rows of many files, each numbered from its own start, so a line number may repeat -
+    tools keying rows by line number must not read them.
+    :return: Files that are partitions listed in a manifest in their directory
+    """
+    partitions_by_directory: Dict[str, Set[str]] = {}
+    packed = []
+    for filename in filenames:
+        directory = os.path.dirname(filename)
+        if directory not in partitions_by_directory:
+            partitions_by_directory[directory] = set()
+            filename_manifest = os.path.join(directory, PACK_MANIFEST_FILENAME)
+            if os.path.exists(filename_manifest):
+                with open(filename_manifest, "r", encoding="utf-8") as manifest_fp:
+                    manifest = json.load(manifest_fp)
+                partitions_by_directory[directory] = {
+                    partition["partition"] for partition in manifest.get("partitions", [])
+                }
+
+        filename_root = "_".join(os.path.basename(filename).split("_")[:-1])
+        if filename_root in partitions_by_directory[directory]:
+            packed.append(filename)
+
+    return packed
+
+
+def extract_segments(
+    position: int,
+    filename: str,
+    dir_output_unpack: str,
+    dir_input_repack: str,
+    incremental: bool = False,
+) -> List[PackSegment]:
+    sidecar = Sidecar.for_base(filename, dir_input_repack) if incremental else None
+    unpacker = Unpacker(filename, dir_output_unpack, dir_input_repack)
+    segments = []
+    with open(filename, "r", encoding="windows-1251") as input_fp:
+        for segment in unpacker.iter_segments(input_fp):
+            # Segments unchanged since the last repack are carried forward by the Repacker
+            if sidecar is not None and sidecar.is_current(
+                Sidecar.key(segment.string_id, segment.line_start), segment.format()
+            ):
+                continue
+            text = unpacker.post_process_segment(segment).format()
+            segments.append((position, segment.line_start, segment.line_end, text))
+
+    return segments
+
+
+class _CapacityTree:
+    """
+    Max segment tree over the remaining capacity of each partition - finds the first fit in O(log n).
+    Unopened partitions hold the full character limit.
+    """
+    def __init__(self, size: int, character_limit: int):
+        self.size = 1
+        while self.size < max(1, size):
+            self.size = self.size * 2
+        self.tree = [character_limit] * (2 * self.size)
+        self.opened = 0
+
+    def find_first(self, need: int):
+        # Only partitions that already hold segments are candidates
+        if self.opened == 0 or self.tree[1] < need:
+            return None
+        node = 1
+        while node < self.size:
+            node = 2 * node if self.tree[2 * node] >= need else 2 * node + 1
+        position = node - self.size
+        return position if position < self.opened else None
+
+    def consume(self, position: int, amount: int):
+        self.opened = max(self.opened, position + 1)
+        node = position + self.size
+        self.tree[node] = self.tree[node] - amount
+        node = node // 2
+        while node:
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+            node = node // 2
@@ -0,0 +1,113 @@
+import logging
+import os
+from typing import List, Optional, Tuple
+
+from packager.cache import TranslationMemory
+from packager.engine import TranslationEngine
+from packager.fuzzy import FuzzyMemory
+from packager.glossary import Glossary
+from packager.metrics import METRICS
+from packager.repacker import Repacker
+from packager.segment import pause_gc, Row
+from packager.translator import translate_segments
+from packager.unpacker import Unpacker
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Pipeline:
+    """
+    Unpack -> translate -> repack without intermediate files.
+    Rows keep their line number & type from unpack to repack - only their text reaches the translator,
+    so no prefix can be mangled & there is nothing to align. Only the final XML is written,
+    plus the unpacked & translated text when a debug directory is given.
+    """
+    def __init__(
+        self,
+        filenames: List[str],
+        output_directory: str,
+        engine: TranslationEngine,
+        cache: Optional[TranslationMemory] = None,
+        dir_debug: Optional[str] = None,
+        fuzzy: Optional[FuzzyMemory] = None,
+        glossary: Optional[Glossary] = None,
+    ):
+        self.filenames = filenames
+        self.output_directory = output_directory
+        self.engine = engine
+        self.cache = cache
+        self.dir_debug = dir_debug
+        self.fuzzy = fuzzy
+        self.glossary = glossary
+
+    def run(self):
+        # Unpack every file first so all files share one pool of translation requests
+        files_contents = []
+        files_rows = []
+        with METRICS.timer("unpack"):
+            for filename in self.filenames:
+                base_contents, rows = self.unpack(filename)
+                files_contents.append(base_contents)
+                files_rows.append(rows)
+                self._write_debug(filename, "unpacked", rows)
+
+        LOGGER.info(f"Translating {len(self.filenames)} files...")
+        # The engine may be shared by several runs - only this run's requests are counted
+        requests = self.engine.requests
+        retries = self.engine.retries
+        with METRICS.timer("translate"):
+            files_rows_translated = self.translate(files_rows)
+        METRICS.count("api_requests", self.engine.requests - requests)
+        METRICS.count("api_retries", self.engine.retries - retries)
+
+        for filename, base_contents, rows_translated in zip(self.filenames, files_contents, files_rows_translated):
+            self._write_debug(filename, "translate", rows_translated)
+
+            with METRICS.timer("repack"):
+                repack_contents = Repacker.repack_rows(base_contents, rows_translated)
+            METRICS.count("rows_repacked", len(rows_translated))
+
+            output_filename = os.path.join(self.output_directory, os.path.basename(filename))
+            with open(output_filename, "w", encoding="windows-1251") as output_fp:
+                output_fp.writelines(repack_contents)
+            LOGGER.info(f"File: {os.path.basename(filename)} - Writing: {output_filename} - Successful")
+
+    @staticmethod
+    def unpack(filename: str) -> Tuple[List[str], List[Row]]:
+        """
+        :return: (XML lines, unpacked rows - one per translated XML line)
+        """
+        with open(filename, "r", encoding="windows-1251") as input_fp:
+            base_contents = input_fp.readlines()
+
+        unpacker = Unpacker(filename, "", "")
+        rows = []
+        with pause_gc():
+            for segment in unpacker.iter_segments(base_contents):
+                rows.extend(unpacker.post_process_segment(segment).rows)
+        METRICS.count("rows_unpacked", len(rows))
+
+        return base_contents, rows
+
+    def translate(self, files_rows: List[List[Row]]) -> List[List[Row]]:
+        """
+        Translate the text of every row - a translated row keeps the line number & type of its source row.
+        """
+        # Blank rows (an empty multiline body line) are kept as they are
+        texts = [row.text for rows in files_rows for row in rows if row.text.strip()]
+        if self.glossary is None:
+            translated = iter(translate_segments(texts, self.engine, self.cache, self.fuzzy))
+        else:
+            texts = self.glossary.protect_many(texts)
+            translations = translate_segments(texts, self.engine, self.cache, self.fuzzy)
+            translated = iter(self.glossary.normalize_many(translations, texts))
+
+        with pause_gc():
+            return [[row.replace(next(translated)) if row.text.strip() else row for row in rows] for rows in files_rows]
+
+    def _write_debug(self, filename: str, stage: str, rows: List[Row]):
+        if self.dir_debug is None:
+            return
+        filename_no_ext = os.path.basename(filename).split(".")[0]
+        with open(os.path.join(self.dir_debug, f"{filename_no_ext}_{stage}.txt"), "w", encoding="windows-1251") as fp:
+            fp.writelines(row.format() for row in rows)
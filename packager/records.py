@@ -0,0 +1,90 @@
+import json
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+
+from packager.segment import Row
+
+LOGGER = logging.getLogger(__name__)
+
+# (line number, multiline tag - None / ML / MLS / MLE, row text w/o prefix or newline)
+RecordRow = Tuple[int, Optional[str], str]
+
+
+def segment_record(filename: str, rows: Iterable[Union[Row, RecordRow]]) -> Dict:
+    """
+    One JSONL record per segment: {"file": ..., "lines": [first, last], "rows": [[line, tag, text], ...]}.
+    Row text is kept exactly as in the bracket-prefixed format (;NEW_LINE; delimiters included),
+    so converting between the two formats is lossless.
+    """
+    rows_record = [list(row) for row in rows]
+    return {"file": filename, "lines": [rows_record[0][0], rows_record[-1][0]], "rows": rows_record}
+
+
+def parse_row(row: str) -> RecordRow:
+    return tuple(Row.parse(row))
+
+
+def format_row(row: RecordRow) -> str:
+    return Row(*row).format()
+
+
+def rows_to_records(rows: Iterable[str], filename: str) -> Iterator[Dict]:
+    """
+    Group bracket-prefixed rows into segment records - a simple row is a segment of its own,
+    consecutive multiline rows form one segment that an :MLE: row closes.
+    """
+    segment: List[RecordRow] = []
+    for row in rows:
+        if not row.strip():
+            continue
+        record_row = parse_row(row)
+        line_number, tag, _ = record_row
+
+        is_continued = (
+            tag in ("ML", "MLE")
+            and bool(segment)
+            and segment[-1][1] in ("MLS", "ML")
+            and segment[-1][0] + 1 == line_number
+        )
+        if segment and not is_continued:
+            yield segment_record(filename, segment)
+            segment = []
+        segment.append(record_row)
+
+    if segment:
+        yield segment_record(filename, segment)
+
+
+def records_to_rows(records: Iterable[Dict]) -> Iterator[str]:
+    for record in records:
+        for row in record["rows"]:
+            yield format_row(tuple(row))
+
+
+def read_records(records_fp: TextIO) -> Iterator[Dict]:
+    for line in records_fp:
+        if line.strip():
+            yield json.loads(line)
+
+
+def write_records(records_fp: TextIO, records: Iterable[Dict]) -> int:
+    written = 0
+    for record in records:
+        records_fp.write(dumps(record))
+        written = written + 1
+    return written
+
+
+def dumps(record: Dict) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def iter_rows(records: Iterable[Dict], filename: Optional[str] = None) -> Iterator[RecordRow]:
+    """
+    Rows of every record - no prefix parsing or repair. Records of other files are skipped when filename is given.
+    """
+    for record in records:
+        if filename is not None and record["file"] != filename:
+            continue
+        for line_number, tag, text in record["rows"]:
+            yield line_number, tag, text
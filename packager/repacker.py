@@ -1,97 +1,439 @@
-from enum import Enum
+from contextlib import ExitStack
+from glob import escape as glob_escape, glob
+import heapq
+import json
 import logging
+import mmap
+from operator import attrgetter
+import os
 import re
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Union
 
-from packager.constants import DELIMITER_NEWLINE
+from packager.constants import DELIMITER_NEWLINE, RECORDS_EXTENSION
+from packager.extractor import map_file, splice_rows, TextExtractor, XmlError
+from packager.glossary import Glossary
+from packager.incremental import Sidecar
+from packager.metrics import METRICS
+from packager.records import iter_rows, read_records
 from packager import rx
+from packager.segment import pause_gc, Row, TAG_BY_TRANSLATE_TYPE, TAGS, TranslateType
+from packager.unpacker import Unpacker
 
 LOGGER = logging.getLogger(__name__)
 
 
-class TranslateType(Enum):
-    SIMPLE = "SIMPLE"
-    MULTILINE_GENERAL = "MULTILINE_GENERAL"
-    MULTILINE_START = "MULTILINE_START"
-    MULTILINE_END = "MULTILINE_END"
+# Pattern locating the replaced span of each line type on the bytes path - a multiline body line is replaced whole
+XML_BYTES_BY_TYPE = {
+    TranslateType.SIMPLE: rx.XML_SIMPLE_BYTES,
+    TranslateType.MULTILINE_GENERAL: None,
+    TranslateType.MULTILINE_START: rx.XML_MULTILINE_START_BYTES,
+    TranslateType.MULTILINE_END: rx.XML_MULTILINE_END_BYTES,
+}
 
 
 class Repacker:
-    def __init__(self, filename_base, filename_translate, output_directory):
+    def __init__(
+        self,
+        filename_base: str,
+        filenames_translate: Union[str, List[str]],
+        output_directory: str,
+        manifest: Optional[Dict] = None,
+        sidecar: Optional[Sidecar] = None,
+        is_bytes_mode: bool = False,
+        is_expat: bool = False,
+        glossary: Optional[Glossary] = None,
+    ):
         self.filename_base = filename_base
-        self.filename_translate = filename_translate
-        self.filename_base_suffix = self.filename_base.split("\\")[-1]
-        self.filename_translate_suffix = self.filename_translate.split("\\")[-1]
+        if isinstance(filenames_translate, str):
+            filenames_translate = [filenames_translate]
+        self.filenames_translate = filenames_translate
+        self.filename_base_suffix = os.path.basename(self.filename_base)
+        self.filenames_translate_suffix = [os.path.basename(filename) for filename in self.filenames_translate]
         self.output_directory = output_directory
+        self.manifest = manifest
+        self.sidecar = sidecar
+        self.is_bytes_mode = is_bytes_mode
+        self.is_expat = is_expat
+        self.glossary = glossary
+
+        if self.manifest is None:
+            self._check_file_alignment()
+
+    @classmethod
+    def from_directory(
+        cls,
+        filename_base: str,
+        dir_input_repack: str,
+        output_directory: str,
+        sidecar: Optional[Sidecar] = None,
+        is_bytes_mode: bool = False,
+        is_expat: bool = False,
+        glossary: Optional[Glossary] = None,
+    ) -> "Repacker":
+        """
+        Repack from every translation partition of filename_base found in dir_input_repack.
+        With a sidecar there may be no partitions at all when nothing changed.
+        """
+        filenames_translate = cls.find_partitions(filename_base, dir_input_repack, required=sidecar is None)
+        return cls(
+            filename_base,
+            filenames_translate,
+            output_directory,
+            sidecar=sidecar,
+            is_bytes_mode=is_bytes_mode,
+            is_expat=is_expat,
+            glossary=glossary,
+        )
+
+    @classmethod
+    def from_manifest(
+        cls,
+        filename_base: str,
+        filename_manifest: str,
+        output_directory: str,
+        sidecar: Optional[Sidecar] = None,
+        is_bytes_mode: bool = False,
+        is_expat: bool = False,
+        glossary: Optional[Glossary] = None,
+    ) -> "Repacker":
+        """
+        Repack from the corpus partitions listed in a packing manifest.
+        Partition files are expected alongside the manifest.
+        """
+        with open(filename_manifest, "r", encoding="utf-8") as manifest_fp:
+            manifest = json.load(manifest_fp)
+
+        base_suffix = os.path.basename(filename_base)
+        dir_manifest = os.path.dirname(filename_manifest)
+        filenames_translate = [
+            os.path.join(dir_manifest, f"{partition['partition']}_translate.txt")
+            for partition in manifest["partitions"]
+            if any(segment["file"] == base_suffix for segment in partition["segments"])
+        ]
+        return cls(
+            filename_base,
+            filenames_translate,
+            output_directory,
+            manifest,
+            sidecar,
+            is_bytes_mode,
+            is_expat,
+            glossary,
+        )
+
+    @staticmethod
+    def find_partitions(filename_base: str, dir_input_repack: str, required: bool = True) -> List[str]:
+        """
+        Find <root>_translate.txt & every <root>_translate-N.txt (or .jsonl), ordered by partition number.
+        """
+        base_root = os.path.basename(filename_base).split(".")[0]
+        partitions = []
+        for filename in glob(os.path.join(dir_input_repack, glob_escape(base_root) + "_translate*")):
+            match = rx.TRANSLATE_PARTITION.fullmatch(os.path.basename(filename)[len(base_root):])
+            if match:
+                partitions.append((int(match.group(1) or -1), filename))
+
+        if not partitions and required:
+            raise Exception(f"No Translation File(s) Found. Base XML: {filename_base} - Directory: {dir_input_repack}")
 
-        self._check_file_alignment()
+        return [filename for _, filename in sorted(partitions)]
 
     def repack(self):
-        LOGGER.info(f"Repacking... |{self.filename_base_suffix}| <- |{self.filename_translate_suffix}|...")
+        with METRICS.timer("repack"):
+            self._repack()
+
+    def _repack(self):
+        LOGGER.info(f"Repacking... |{self.filename_base_suffix}| <- |{', '.join(self.filenames_translate_suffix)}|...")
+
+        # Merge-join every translation partition in line number order - rows are streamed, never concatenated
+        with ExitStack() as stack:
+            partitions_entries = []
+            for filename in self.filenames_translate:
+                if filename.endswith(RECORDS_EXTENSION):
+                    # Structured records carry their line numbers & types - nothing to parse or repair
+                    records_fp = stack.enter_context(open(filename, "r", encoding="utf-8"))
+                    partitions_entries.append(self._iter_index_records(read_records(records_fp)))
+                    continue
+
+                translate_fp = stack.enter_context(open(filename, "r"))
+                if self.manifest is not None:
+                    partitions_entries.append(self._iter_index(self._iter_manifest_rows(translate_fp, filename)))
+                else:
+                    partitions_entries.append(self._iter_index(translate_fp))
+
+            with pause_gc():
+                translate_index = self._build_index(heapq.merge(*partitions_entries, key=attrgetter("line_number")))
+        METRICS.count("rows_repacked", len(translate_index))
+
+        if self.glossary is not None:
+            # Translations made outside the tool carry no placeholders - only the term variants are normalized
+            with METRICS.timer("glossary"):
+                for row in translate_index:
+                    row.text = self.glossary.normalize(row.text)
+
+        # Carrying translations forward needs the decoded segments - only a plain repack can stay in bytes
+        if self.is_expat and self.sidecar is None:
+            try:
+                self._repack_spans(translate_index)
+                return
+            except XmlError as e:
+                # The output is written again from the start
+                LOGGER.warning(f"{e} - Falling Back to Line Matching")
+        if self.is_bytes_mode and self.sidecar is None:
+            self._repack_bytes(translate_index)
+            return
 
-        # Readlines base & store in array
         with open(self.filename_base, "r", encoding="windows-1251") as base_fp:
-            LOGGER.info(f"|{self.filename_base_suffix}| Loading into memory...")
-            base_contents = base_fp.readlines()
+            if self.sidecar is not None:
+                # Carrying forward reads the segments first - readlines base & store in array
+                LOGGER.info(f"|{self.filename_base_suffix}| Loading into memory...")
+                base_contents = base_fp.readlines()
+                translate_index = self._carry_forward(base_contents, translate_index)
+            else:
+                # Otherwise the base is streamed straight through to the output
+                base_contents = base_fp
 
-        # Iterate over text file
-        with open(self.filename_translate, "r") as translate_fp:
-            LOGGER.info(f"|{self.filename_translate_suffix}| Loading into memory...")
-            translate_contents = translate_fp.readlines()
+            self._write_to_file(self._iter_translated(base_contents, translate_index))
+
+        if self.sidecar is not None:
+            self.sidecar.save()
+
+    def _repack_bytes(self, translate_index: List[Row]):
+        """
+        Splice translations into the base XML without decoding it. The base is memory-mapped, every span
+        between translated lines is copied to the output as is & only the translated <text> bodies are encoded.
+        Line endings of the base (LF or CRLF) are kept.
+        """
+        output_filename = f"{self.output_directory}/{self.filename_base_suffix}"
+        with open(self.filename_base, "rb") as base_fp, open(output_filename, "wb") as output_fp:
+            # An empty file cannot be mapped - & has nothing to translate
+            if os.fstat(base_fp.fileno()).st_size == 0:
+                LOGGER.info(f"File: {self.filename_base_suffix} - Writing: {output_filename} - Successful")
+                return
 
-        translate_index = self._convert_to_index(translate_contents)
+            with mmap.mmap(base_fp.fileno(), 0, access=mmap.ACCESS_READ) as base_map:
+                find = base_map.find
+                write = output_fp.write
+                line_number = 1
+                line_start = 0
+                position_copied = 0
+                for row in translate_index:
+                    line_number_translate = row.line_number
+                    # Skip ahead newline by newline - untouched lines are never sliced or decoded
+                    while line_number < line_number_translate:
+                        line_start = find(b"\n", line_start) + 1
+                        if line_start == 0:
+                            raise Exception(
+                                "Line Number Out of Range."
+                                f"Base XML: {self.filename_base_suffix} - Line: {line_number_translate}"
+                            )
+                        line_number = line_number + 1
 
-        repack_contents = self._translate(base_contents, translate_index)
+                    line_end = find(b"\n", line_start)
+                    if line_end == -1:
+                        line_end = len(base_map)
+                    if line_end > line_start and base_map[line_end - 1] == 13:
+                        # Keep the \r of a CRLF ending out of the replaced span
+                        line_end = line_end - 1
 
-        self._write_to_file(repack_contents)
+                    regex = XML_BYTES_BY_TYPE[row.line_type]
+                    if regex is None:
+                        # A multiline body line is replaced whole - its line ending is copied through
+                        span_start, span_end = line_start, line_end
+                    else:
+                        # Search the map in place - the line is never copied out
+                        span_start, span_end = regex.search(base_map, line_start, line_end).span(1)
+
+                    write(base_map[position_copied:span_start])
+                    write(row.text.encode("windows-1251"))
+                    position_copied = span_end
+
+                write(base_map[position_copied:])
+                METRICS.count("bytes_copied", len(base_map))
+
+        LOGGER.info(f"File: {self.filename_base_suffix} - Writing: {output_filename} - Successful")
+
+    def _repack_spans(self, translate_index: List[Row]):
+        """
+        Splice translations into the undecoded XML by the <text> spans the XML parser reports - only the content
+        of translated elements is rebuilt, everything between is copied as is & no line is searched.
+        Parsing stops at the span following the last translated row.
+        :raise XmlError: The base is not well-formed, or a line holds more than one <text> element
+        """
+        output_filename = f"{self.output_directory}/{self.filename_base_suffix}"
+        with map_file(self.filename_base) as base_map, open(output_filename, "wb") as output_fp:
+            write = output_fp.write
+            rows = iter(translate_index)
+            row = next(rows, None)
+            position_copied = 0
+            line_last = 0
+            for span in TextExtractor(base_map, self.filename_base_suffix, is_decoded=False):
+                # Such a line was unpacked by line matching - its row covers every element on it
+                if span.line_start <= line_last:
+                    raise XmlError(
+                        "Line Mismatch. "
+                        f"File: {self.filename_base_suffix} - "
+                        f"Line: {span.line_start} Holds More Than One <text> Element"
+                    )
+                line_last = span.line_end
+                if row is None:
+                    break
+                if row.line_number > span.line_end:
+                    continue
+                if row.line_number < span.line_start:
+                    raise Exception(
+                        "Line Number Mismatch. "
+                        f"Base XML: {self.filename_base_suffix} - No <text> on Line: {row.line_number}"
+                    )
+
+                rows_span = []
+                while row is not None and row.line_number <= span.line_end:
+                    rows_span.append(row)
+                    row = next(rows, None)
+
+                write(base_map[position_copied:span.start])
+                if span.line_start == span.line_end:
+                    # A single line - the row is the whole content
+                    write(rows_span[0].text.encode("windows-1251"))
+                else:
+                    write(splice_rows(base_map[span.start:span.end], span.line_start, rows_span))
+                position_copied = span.end
+
+            if row is not None:
+                raise Exception(
+                    "Line Number Mismatch. "
+                    f"Base XML: {self.filename_base_suffix} - No <text> on Line: {row.line_number}"
+                )
+            write(base_map[position_copied:])
+            METRICS.count("bytes_copied", len(base_map))
+
+        LOGGER.info(f"File: {self.filename_base_suffix} - Writing: {output_filename} - Successful")
+
+    def _carry_forward(self, base_contents: List[str], translate_index: List[Row]) -> List[Row]:
+        """
+        Fill in translations of segments unchanged since the sidecar was recorded & record every segment's
+        translation for the next run.
+        :return: The index w/ the carried rows added
+        """
+        unpacker = Unpacker(self.filename_base, "", "")
+        translate_index = {row.line_number: row for row in translate_index}
+        segments = {}
+        carried = 0
+
+        for segment in unpacker.iter_segments(base_contents):
+            key = Sidecar.key(segment.string_id, segment.line_start)
+            text = segment.format()
+            line_numbers = range(segment.line_start, segment.line_end + 1)
+
+            is_translated = any(line_number in translate_index for line_number in line_numbers)
+            if not is_translated and self.sidecar.is_current(key, text):
+                for offset, line_type, text_translated in self.sidecar.rows(key):
+                    line_type = TranslateType(line_type)
+                    # Multiline body lines are recorded w/ their newline
+                    if line_type is TranslateType.MULTILINE_GENERAL and text_translated.endswith("\n"):
+                        text_translated = text_translated[:-1]
+                    line_number = segment.line_start + offset
+                    translate_index[line_number] = Row(line_number, TAG_BY_TRANSLATE_TYPE[line_type], text_translated)
+                carried = carried + 1
+
+            rows = [
+                (line_number - segment.line_start, row.line_type.value, self._sidecar_text(row))
+                for line_number, row in zip(line_numbers, map(translate_index.get, line_numbers))
+                if row is not None
+            ]
+            segments[key] = (text, rows)
+
+        self.sidecar.update(segments)
+        LOGGER.info(f"|{self.filename_base_suffix}| Incremental - Carried Forward: {carried} segments")
+        return sorted(translate_index.values(), key=attrgetter("line_number"))
+
+    @staticmethod
+    def _sidecar_text(row: Row) -> str:
+        if row.line_type is TranslateType.MULTILINE_GENERAL:
+            return row.text + "\n"
+        return row.text
 
     def _check_file_alignment(self):
         base_root = self.filename_base_suffix.split(".")[0]
-        translate_expected = base_root + "_translate.txt"
 
-        if self.filename_translate_suffix != translate_expected:
-            raise Exception(
-                "File Alignment Mismatch."
-                f"Base XML: {self.filename_base_suffix} <-/-> {self.filename_translate_suffix}"
+        for filename_translate_suffix in self.filenames_translate_suffix:
+            is_aligned = (
+                filename_translate_suffix.startswith(base_root)
+                and rx.TRANSLATE_PARTITION.fullmatch(filename_translate_suffix[len(base_root):])
             )
+            if not is_aligned:
+                raise Exception(
+                    "File Alignment Mismatch."
+                    f"Base XML: {self.filename_base_suffix} <-/-> {filename_translate_suffix}"
+                )
 
-    def _convert_to_index(self, translate_contents: List[str]) -> Dict[int, Tuple[TranslateType, str]]:
-        translate_index = {}
-        for row in translate_contents:
-            match_multiline_general = rx.CIPHER_MULTILINE_GENERAL.match(row)
-            match_multiline_start = rx.CIPHER_MULTILINE_START.match(row)
-            match_multiline_end = rx.CIPHER_MULTILINE_END.match(row)
-            match_simple = rx.CIPHER_SIMPLE.match(row)
-
-            if match_multiline_general:
-                match = match_multiline_general
-                line_type = TranslateType.MULTILINE_GENERAL
-            elif match_multiline_start:
-                match = match_multiline_start
-                line_type = TranslateType.MULTILINE_START
-            elif match_multiline_end:
-                match = match_multiline_end
-                line_type = TranslateType.MULTILINE_END
-            elif match_simple:
-                match = match_simple
-                line_type = TranslateType.SIMPLE
-            else:
-                raise Exception(f"Invalid Row format: {row}")
-
-            line_number = int(match.groups()[0])
+    def _iter_manifest_rows(self, translate_fp: Iterable[str], filename_translate: str) -> Iterator[str]:
+        """
+        Yield only the rows of a corpus partition that belong to the base file, using the manifest row counts.
+        Every row's [N] must fall in its segment's line range in order - a row dropped or added by the translator
+        would otherwise shift every later row onto another file's lines.
+        """
+        partition_root = os.path.basename(filename_translate)[:-len("_translate.txt")]
+        partition = next(
+            partition for partition in self.manifest["partitions"] if partition["partition"] == partition_root
+        )
 
-            # Strip out unpacker added newline at end of line for most line_type cases
-            if line_type is not TranslateType.MULTILINE_GENERAL:
-                text = row[match.end() + 1:-1]
-            else:
-                text = row[match.end() + 1:]
+        # Blank lines are never written by the packer - skip any added during translation
+        rows = (row for row in translate_fp if row.strip())
+        for segment in partition["segments"]:
+            line_start, line_end = segment["lines"]
+            line_number_last = line_start - 1
+            for _ in range(segment["rows"]):
+                row = next(rows, None)
+                if row is None:
+                    raise Exception(f"Translation Row Count Mismatch. Partition: {partition_root}")
+                match = rx.CIPHER_PREFIX.match(row)
+                line_number = int(match.group(1)) if match else None
+                if line_number is None or not line_number_last < line_number <= line_end:
+                    raise Exception(
+                        "Translation Row Mismatch. "
+                        f"Partition: {partition_root} - File: {segment['file']} - "
+                        f"Segment Lines: {line_start}-{line_end} - Row: {row[:40].rstrip()}"
+                    )
+                line_number_last = line_number
+                if segment["file"] == self.filename_base_suffix:
+                    yield row
 
-            text = self.post_process(text)
+    @classmethod
+    def _convert_to_index(cls, translate_contents: Iterable[str]) -> List[Row]:
+        with pause_gc():
+            return cls._build_index(cls._iter_index(translate_contents))
 
-            translate_index[line_number] = (line_type, text)
+    @staticmethod
+    def _build_index(translate_rows: Iterable[Row]) -> List[Row]:
+        """
+        :return: Rows in line number order, one per line - a sorted list holds no hash table next to the rows
+        """
+        # Stable - rows arriving in order (the common case) are not moved & duplicates stay adjacent
+        translate_index = sorted(translate_rows, key=attrgetter("line_number"))
+        position = 0
+        for row in translate_index:
+            if position and translate_index[position - 1].line_number == row.line_number:
+                LOGGER.warning(f"Duplicate Line Number: {row.line_number} - Keeping the last occurrence")
+                position = position - 1
+            translate_index[position] = row
+            position = position + 1
+        del translate_index[position:]
 
         return translate_index
 
+    @classmethod
+    def _iter_index(cls, translate_contents: Iterable[str]) -> Iterator[Row]:
+        for line in translate_contents:
+            # Line number & multiline tag share the [N] prefix - classify in a single match
+            row = Row.parse(line)
+            row.text = cls.post_process(row.text)
+            yield row
+
+    def _iter_index_records(self, records: Iterable[Dict]) -> Iterator[Row]:
+        for line_number, tag, text in iter_rows(records, self.filename_base_suffix):
+            yield Row(line_number, TAGS[tag], self.post_process(text))
+
     @staticmethod
     def post_process(text: str) -> str:
         # Replace DELIMITED newline with text embedded \n character
@@ -99,36 +441,51 @@ class Repacker:
 
         return text
 
-    def _write_to_file(self, file_contents_repacked: List[str]):
+    def _write_to_file(self, file_contents_repacked: Iterable[str]):
         output_filename = f"{self.output_directory}/{self.filename_base_suffix}"
         with open(output_filename, "w", encoding="windows-1251") as output_fp:
             output_fp.writelines(file_contents_repacked)
         LOGGER.info(f"File: {self.filename_base_suffix} - Writing: {output_filename} - Successful")
 
-    def _translate(
-        self,
-        file_contents: List[str],
-        translate_index: Dict[int, Tuple[TranslateType, str]]
-    ) -> List[str]:
-        repack_contents = file_contents.copy()
+    @classmethod
+    def repack_rows(cls, base_contents: List[str], translate_rows: Iterable[Row]) -> List[str]:
+        """
+        Repack in memory - base XML lines & unpacked rows in, repacked XML lines out.
+        """
+        rows = (Row(row.line_number, row.tag, cls.post_process(row.text)) for row in translate_rows)
+        with pause_gc():
+            translate_index = cls._build_index(rows)
+        return list(cls._iter_translated(base_contents, translate_index))
 
-        for line_number, (line_type, text_english) in translate_index.items():
-            line_xml = repack_contents[line_number - 1]
+    @classmethod
+    def _iter_translated(cls, file_contents: Iterable[str], translate_index: List[Row]) -> Iterator[str]:
+        """
+        Yield the base lines w/ the indexed ones translated - a replaced line is only built as it is written.
+        """
+        rows = iter(translate_index)
+        row = next(rows, None)
+        line_number = 0
+        for line_number, line_xml in enumerate(file_contents, start=1):
+            if row is None or row.line_number != line_number:
+                yield line_xml
+                continue
+
+            line_type = row.line_type
             if line_type is TranslateType.SIMPLE:
-                line_translate = self._text_replace(rx.XML_SIMPLE, text_english, line_xml)
+                yield cls._text_replace(rx.XML_SIMPLE, row.text, line_xml)
             elif line_type is TranslateType.MULTILINE_GENERAL:
-                line_translate = text_english
+                yield row.text + "\n"
             elif line_type is TranslateType.MULTILINE_START:
-                line_translate = self._text_replace(rx.XML_MULTILINE_START, text_english, line_xml)
+                yield cls._text_replace(rx.XML_MULTILINE_START, row.text, line_xml)
             elif line_type is TranslateType.MULTILINE_END:
-                line_translate = self._text_replace(rx.XML_MULTILINE_END, text_english, line_xml)
+                yield cls._text_replace(rx.XML_MULTILINE_END, row.text, line_xml)
             else:
                 raise Exception(f"Invalid TranslateType: {line_type}")
+            row = next(rows, None)
 
-            # Update the file_contents with the translation
-            repack_contents[line_number - 1] = line_translate
-
-        return repack_contents
+        METRICS.count("lines_scanned", line_number)
+        if row is not None:
+            raise Exception(f"Line Number Out of Range. Base XML Lines: {line_number} - Line: {row.line_number}")
 
     @staticmethod
     def _text_replace(regex: re.Pattern, text_replace: str, text_old: str):
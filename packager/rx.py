@@ -3,8 +3,22 @@ import re
 XML_SIMPLE = re.compile("<text>(.*)</text>")
 XML_MULTILINE_START = re.compile("<text>(.*)")
 XML_MULTILINE_END = re.compile("(.*)</text>")
+XML_STRING_ID = re.compile(r'<string\s+id\s*=\s*"([^"]*)"')
+
+# Byte patterns for the undecoded windows-1251 fast path - the tags are ASCII in both forms
+XML_SIMPLE_BYTES = re.compile(b"<text>(.*)</text>")
+XML_MULTILINE_START_BYTES = re.compile(b"<text>(.*)")
+XML_MULTILINE_END_BYTES = re.compile(b"(.*)</text>")
 
 CIPHER_SIMPLE = re.compile(r"\[(\d+)]")
 CIPHER_MULTILINE_GENERAL = re.compile(r"\[(\d+)]" + r":(ML):")
 CIPHER_MULTILINE_START = re.compile(r"\[(\d+)]" + r":(MLS):")
 CIPHER_MULTILINE_END = re.compile(r"\[(\d+)]" + r":(MLE):")
+
+# Line number & optional multiline tag (ML / MLS / MLE) of an unpacked row in a single pass
+CIPHER_PREFIX = re.compile(r"\[(\d+)](?::(ML[SE]?):)?")
+# A whole unpacked row - prefix, the optional space after it & the text up to the newline
+CIPHER_ROW = re.compile(r"\[(\d+)](?::(ML[SE]?):)? ?(.*)")
+
+# Suffix of a translation file after its base root: _translate.txt or _translate-N.txt (.jsonl for records)
+TRANSLATE_PARTITION = re.compile(r"_translate(?:-(\d+))?\.(?:txt|jsonl)")
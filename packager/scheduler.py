@@ -0,0 +1,72 @@
+from fnmatch import fnmatch
+import logging
+import os
+from typing import Container, List, Optional, Sequence, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+# Dialogue is what a player reads most - translated before everything else by default
+DEFAULT_PRIORITIES = ("*dialog*",)
+
+
+class QuotaScheduler:
+    """
+    Orders files by priority & selects the ones whose translation fits the remaining character quota.
+    Files are taken in priority order until the next one would exceed the quota - the run then stops
+    before sending anything it cannot pay for, and the rest is left for a rerun once the quota renews.
+    The characters of a file are the unique segments no earlier file, cache or journal already covers,
+    an upper bound of what is actually sent.
+    """
+    def __init__(self, quota: Optional[int] = None, priorities: Sequence[str] = DEFAULT_PRIORITIES):
+        self.quota = quota
+        self.priorities = priorities
+
+    def priority(self, filename: str) -> int:
+        """
+        :return: Position of the first pattern matching the file name - files matching none come last
+        """
+        name = os.path.basename(filename)
+        for position, pattern in enumerate(self.priorities):
+            if fnmatch(name, pattern):
+                return position
+        return len(self.priorities)
+
+    def order(self, filenames: List[str]) -> List[str]:
+        # Stable - files of equal priority keep their order
+        return sorted(filenames, key=self.priority)
+
+    def plan(
+        self,
+        files_segments: List[Tuple[str, List[str]]],
+        known: Container[str],
+    ) -> Tuple[List[str], List[str]]:
+        """
+        :param files_segments: (filename, segments) pairs in priority order
+        :param known: Segments that are translated without a request
+        :return: (files to translate, files deferred for lack of quota)
+        """
+        selected = []
+        characters_planned = 0
+        segments_planned = set()
+
+        for position, (filename, segments) in enumerate(files_segments):
+            segments_new = {segment for segment in segments if segment not in known and segment not in segments_planned}
+            characters = sum(len(segment) for segment in segments_new)
+
+            if self.quota is not None and characters_planned + characters > self.quota:
+                deferred = [filename_deferred for filename_deferred, _ in files_segments[position:]]
+                LOGGER.warning(
+                    "Character Quota Reached. "
+                    f"Quota: {self.quota} - "
+                    f"Planned: {characters_planned} - "
+                    f"Next File: {os.path.basename(filename)} Needs {characters} - "
+                    f"Deferred Files: {len(deferred)}"
+                )
+                return selected, deferred
+
+            selected.append(filename)
+            characters_planned = characters_planned + characters
+            segments_planned.update(segments_new)
+
+        LOGGER.info(f"Characters Planned: {characters_planned} - Quota: {self.quota}")
+        return selected, []
@@ -0,0 +1,124 @@
+from contextlib import contextmanager
+from enum import Enum
+import gc
+from typing import Iterator, List, Optional
+
+from packager.constants import DELIMITER_MULTILINE_END, DELIMITER_MULTILINE_GENERAL, DELIMITER_MULTILINE_START
+from packager import rx
+
+
+class TranslateType(Enum):
+    SIMPLE = "SIMPLE"
+    MULTILINE_GENERAL = "MULTILINE_GENERAL"
+    MULTILINE_START = "MULTILINE_START"
+    MULTILINE_END = "MULTILINE_END"
+
+
+# Row tags - the multiline delimiters w/o their colons
+TAG_MULTILINE_GENERAL = DELIMITER_MULTILINE_GENERAL.strip(":")
+TAG_MULTILINE_START = DELIMITER_MULTILINE_START.strip(":")
+TAG_MULTILINE_END = DELIMITER_MULTILINE_END.strip(":")
+
+TRANSLATE_TYPE_BY_TAG = {
+    None: TranslateType.SIMPLE,
+    TAG_MULTILINE_GENERAL: TranslateType.MULTILINE_GENERAL,
+    TAG_MULTILINE_START: TranslateType.MULTILINE_START,
+    TAG_MULTILINE_END: TranslateType.MULTILINE_END,
+}
+TAG_BY_TRANSLATE_TYPE = {line_type: tag for tag, line_type in TRANSLATE_TYPE_BY_TAG.items()}
+# One shared string per tag - a tag parsed from text would otherwise be a separate copy on every row
+TAGS = {tag: tag for tag in TRANSLATE_TYPE_BY_TAG}
+
+
+class Row:
+    """
+    One unpacked row - the XML line it belongs to, its multiline tag (None / ML / MLS / MLE) & its text.
+    The text carries neither the [N] prefix nor the newline; both are only built when the row is written,
+    so rows pass from unpack to repack without being formatted & parsed again.
+    """
+    __slots__ = ("line_number", "tag", "text")
+
+    def __init__(self, line_number: int, tag: Optional[str], text: str):
+        self.line_number = line_number
+        self.tag = tag
+        self.text = text
+
+    @property
+    def line_type(self) -> TranslateType:
+        return TRANSLATE_TYPE_BY_TAG[self.tag]
+
+    @property
+    def prefix(self) -> str:
+        return f"[{self.line_number}]" if self.tag is None else f"[{self.line_number}]:{self.tag}:"
+
+    def format(self) -> str:
+        if self.tag is None:
+            return f"[{self.line_number}] {self.text}\n"
+        return f"[{self.line_number}]:{self.tag}: {self.text}\n"
+
+    def replace(self, text: str) -> "Row":
+        return Row(self.line_number, self.tag, text)
+
+    @classmethod
+    def parse(cls, row: str) -> "Row":
+        """
+        :param row: Bracket-prefixed row - the space after the prefix & the newline are optional
+        """
+        match = rx.CIPHER_ROW.match(row)
+        if not match:
+            raise Exception(f"Invalid Row format: {row}")
+
+        line_number, tag, text = match.groups()
+        return cls(int(line_number), TAGS[tag], text)
+
+    def __iter__(self) -> Iterator:
+        # Unpacks like a (line number, tag, text) record row
+        return iter((self.line_number, self.tag, self.text))
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Row):
+            return NotImplemented
+        return (self.line_number, self.tag, self.text) == (other.line_number, other.tag, other.text)
+
+    def __repr__(self) -> str:
+        return f"Row({self.line_number}, {self.tag!r}, {self.text!r})"
+
+
+class Segment:
+    """
+    One <text> block - the XML lines it spans, the <string id> enclosing it & one row per line with text.
+    An empty multiline block spans lines but has no rows.
+    """
+    __slots__ = ("line_start", "line_end", "string_id", "rows")
+
+    def __init__(self, line_start: int, line_end: int, string_id: Optional[str], rows: List[Row]):
+        self.line_start = line_start
+        self.line_end = line_end
+        self.string_id = string_id
+        self.rows = rows
+
+    def format(self) -> str:
+        # Row.format inlined - a segment is formatted once per unpacked block
+        return "".join([
+            f"[{row.line_number}] {row.text}\n" if row.tag is None else f"[{row.line_number}]:{row.tag}: {row.text}\n"
+            for row in self.rows
+        ])
+
+    def __repr__(self) -> str:
+        return f"Segment({self.line_start}, {self.line_end}, {self.string_id!r}, {self.rows!r})"
+
+
+@contextmanager
+def pause_gc():
+    """
+    Hold off the cyclic garbage collector while a large number of rows is kept alive.
+    Rows only reference strings & ints, so they never form a cycle - but every one is tracked, and each
+    collection would walk all of them again as the collection grows.
+    """
+    is_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if is_enabled:
+            gc.enable()
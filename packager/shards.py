@@ -0,0 +1,362 @@
+from glob import glob
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from packager.cache import TranslationMemory
+from packager.constants import PACK_MANIFEST_FILENAME, SHARD_CHARACTER_LIMIT, SHARD_DIRECTORY
+from packager.engine import TranslationEngine
+from packager.fuzzy import FuzzyMemory
+from packager.glossary import Glossary
+from packager.metrics import METRICS
+from packager.packer import Packer
+from packager.repacker import Repacker
+from packager.segment import pause_gc, Row
+from packager.translator import translate_segments
+
+LOGGER = logging.getLogger(__name__)
+
+SHARD_PENDING = "pending"
+SHARD_CLAIMED = "claimed"
+SHARD_EXPIRED = "expired"
+SHARD_DONE = "done"
+
+
+class ShardQueue:
+    """
+    Work queue over a shared directory - the packed partitions of a corpus are the shards.
+    A worker claims a shard by creating its lock file exclusively & holds it as a lease, renewing the file's
+    modification time while it works. A lock left unrenewed for longer than the lease belongs to a worker
+    that died - the shard is taken over under an exclusive reclaim guard, whose holder re-checks the lock,
+    renames it away & confirms the file it moved is the stale one before writing its own lock.
+    The lock is read before a lease is renewed, completed or released - a worker whose shard was taken over
+    finds another owner & stops.
+    A translated shard is written under a temporary name, moved into place & marked done, so a shard is
+    either done w/ a complete translation or not done at all.
+    Nothing but create, rename & modification times is relied on - any directory the workers share will do.
+    """
+    def __init__(self, dir_shared: str, lease: float = 300.0, worker_id: Optional[str] = None):
+        self.dir_shared = dir_shared
+        self.dir_shards = os.path.join(dir_shared, SHARD_DIRECTORY)
+        self.filename_manifest = os.path.join(dir_shared, PACK_MANIFEST_FILENAME)
+        self.lease = lease
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+
+    @classmethod
+    def create(
+        cls,
+        filenames: List[str],
+        dir_shared: str,
+        character_limit: int = SHARD_CHARACTER_LIMIT,
+        jobs: int = 1,
+    ) -> "ShardQueue":
+        """
+        Unpack & pack every file into shards of up to character_limit characters w/ a manifest.
+        Locks & done markers of an earlier queue in the directory are removed.
+        """
+        queue = cls(dir_shared)
+        os.makedirs(queue.dir_shards, exist_ok=True)
+        for filename in glob(os.path.join(queue.dir_shards, "*")):
+            os.remove(filename)
+
+        Packer(filenames, dir_shared, dir_shared, character_limit, jobs).pack()
+        LOGGER.info(f"Shards: {len(queue.shards())} - Directory: {dir_shared}")
+        return queue
+
+    def shards(self) -> List[str]:
+        with open(self.filename_manifest, "r", encoding="utf-8") as manifest_fp:
+            manifest = json.load(manifest_fp)
+        return [partition["partition"] for partition in manifest["partitions"]]
+
+    def _lock(self, shard: str) -> str:
+        return os.path.join(self.dir_shards, f"{shard}.lock")
+
+    def _done(self, shard: str) -> str:
+        return os.path.join(self.dir_shards, f"{shard}.done")
+
+    def is_done(self, shard: str) -> bool:
+        return os.path.exists(self._done(shard))
+
+    def _lock_age(self, shard: str) -> Optional[float]:
+        try:
+            return time.time() - os.stat(self._lock(shard)).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def _lock_owner(self, shard: str) -> Optional[str]:
+        state = self._read_lock(self._lock(shard))
+        return None if state is None else state[1]
+
+    @staticmethod
+    def _read_lock(filename: str) -> Optional[Tuple[float, str]]:
+        """
+        :return: (modification time, worker id written into it) - None once the file is gone
+        """
+        try:
+            with open(filename, "r", encoding="utf-8") as lock_fp:
+                return os.fstat(lock_fp.fileno()).st_mtime, lock_fp.read()
+        except FileNotFoundError:
+            return None
+
+    def _create_lock(self, filename: str) -> bool:
+        try:
+            lock_fd = os.open(filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(lock_fd, "w", encoding="utf-8") as lock_fp:
+            lock_fp.write(self.worker_id)
+        return True
+
+    @staticmethod
+    def _remove(filename: str):
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            pass
+
+    def claim(self, shard: str) -> bool:
+        """
+        :return: The shard is now leased to this worker
+        """
+        age = self._lock_age(shard)
+        if age is None:
+            is_claimed = self._create_lock(self._lock(shard))
+        elif age < self.lease:
+            return False
+        else:
+            is_claimed = self._reclaim(shard)
+        if not is_claimed:
+            return False
+
+        # The previous holder may have finished just as its lease ran out
+        if self.is_done(shard):
+            self.release(shard)
+            return False
+        return True
+
+    def _reclaim(self, shard: str) -> bool:
+        """
+        Take over a shard whose lease expired - only the worker holding the reclaim guard may replace the lock.
+        """
+        filename_lock = self._lock(shard)
+        filename_guard = f"{filename_lock}.reclaim"
+        if not self._create_lock(filename_guard):
+            # A guard held for longer than a lease was left by a worker that died during a takeover
+            state = self._read_lock(filename_guard)
+            if state is not None and time.time() - state[0] >= self.lease:
+                self._remove_stale(filename_guard, state)
+            return False
+
+        try:
+            # The holder may have renewed, or another worker taken over, since the lock was first checked
+            state = self._read_lock(filename_lock)
+            if state is None or time.time() - state[0] < self.lease:
+                return False
+            if not self._remove_stale(filename_lock, state):
+                return False
+            LOGGER.warning(f"|{shard}| Lease of {state[1]} Expired - Reclaiming")
+            METRICS.count("shards_reclaimed")
+            return self._create_lock(filename_lock)
+        finally:
+            self._remove(filename_guard)
+
+    def _remove_stale(self, filename: str, state: Tuple[float, str]) -> bool:
+        """
+        Rename a stale lock away & confirm the file moved is still the one found stale.
+        :param state: (modification time, worker id) of the lock when it was found stale
+        :return: The stale lock is gone - False if it was renewed or replaced before the rename
+        """
+        filename_expired = f"{filename}.expired-{self.worker_id}"
+        try:
+            os.rename(filename, filename_expired)
+        except FileNotFoundError:
+            return False
+
+        if self._read_lock(filename_expired) != state:
+            # A live lock was moved - put it back unless a new one was already created in its place
+            if os.path.exists(filename):
+                os.remove(filename_expired)
+            else:
+                os.rename(filename_expired, filename)
+            return False
+        os.remove(filename_expired)
+        return True
+
+    def renew(self, shard: str) -> bool:
+        """
+        :return: The lease is still held - False once the lock is gone or belongs to another worker
+        """
+        owner = self._lock_owner(shard)
+        if owner == self.worker_id:
+            try:
+                os.utime(self._lock(shard))
+                return True
+            except FileNotFoundError:
+                owner = None
+
+        LOGGER.warning(f"|{shard}| Lease Lost - Owner: {owner}")
+        METRICS.count("shards_lost")
+        return False
+
+    def release(self, shard: str):
+        # A lock another worker took over is that worker's to remove
+        if self._lock_owner(shard) == self.worker_id:
+            self._remove(self._lock(shard))
+
+    def complete(self, shard: str, rows: List[Row]) -> bool:
+        """
+        :return: The translation was written - False if the lease was lost & the shard belongs to another worker
+        """
+        # Translation files are read w/ the platform encoding, as the Repacker reads them
+        filename_translate = os.path.join(self.dir_shared, f"{shard}_translate.txt")
+        filename_temporary = f"{filename_translate}.{self.worker_id}"
+        with open(filename_temporary, "w") as translate_fp:
+            translate_fp.writelines(row.format() for row in rows)
+
+        # Checked right before the move - the lease may have run out while the file was written
+        if self._lock_owner(shard) != self.worker_id:
+            os.remove(filename_temporary)
+            LOGGER.warning(f"|{shard}| Lease Lost - Translation Discarded")
+            METRICS.count("shards_lost")
+            return False
+        os.replace(filename_temporary, filename_translate)
+
+        with open(self._done(shard), "w") as done_fp:
+            done_fp.write(self.worker_id)
+        self.release(shard)
+        return True
+
+    def status(self) -> Dict:
+        shards = {}
+        for shard in self.shards():
+            age = self._lock_age(shard)
+            if self.is_done(shard):
+                shards[shard] = SHARD_DONE
+            elif age is None:
+                shards[shard] = SHARD_PENDING
+            else:
+                shards[shard] = SHARD_CLAIMED if age < self.lease else SHARD_EXPIRED
+
+        statuses = list(shards.values())
+        return {
+            "directory": self.dir_shared,
+            "shards": len(shards),
+            "counts": {
+                status: statuses.count(status) for status in (SHARD_PENDING, SHARD_CLAIMED, SHARD_EXPIRED, SHARD_DONE)
+            },
+            "pending": [shard for shard, status in shards.items() if status != SHARD_DONE],
+        }
+
+    def merge(self, filenames_base: List[str], output_directory: str):
+        """
+        Repack every base file from the translated shards.
+        """
+        shards_pending = self.status()["pending"]
+        if shards_pending:
+            raise Exception(f"Shard Mismatch. Shards Not Done: {', '.join(shards_pending)}")
+
+        for filename_base in filenames_base:
+            Repacker.from_manifest(filename_base, self.filename_manifest, output_directory).repack()
+        LOGGER.info(f"Merged Files: {len(filenames_base)} - Shards: {len(self.shards())}")
+
+
+class ShardWorker:
+    """
+    Claims & translates shards until every shard of the queue is done.
+    Shards held by live workers are skipped & retried every poll interval, to take over any whose lease expires.
+    """
+    def __init__(
+        self,
+        queue: ShardQueue,
+        engine: TranslationEngine,
+        cache: Optional[TranslationMemory] = None,
+        fuzzy: Optional[FuzzyMemory] = None,
+        glossary: Optional[Glossary] = None,
+        poll_interval: float = 5.0,
+    ):
+        self.queue = queue
+        self.engine = engine
+        self.cache = cache
+        self.fuzzy = fuzzy
+        self.glossary = glossary
+        self.poll_interval = poll_interval
+
+    def run(self) -> int:
+        """
+        :return: Number of shards this worker translated
+        """
+        shards_translated = 0
+        shards = self.queue.shards()
+        while True:
+            shards = [shard for shard in shards if not self.queue.is_done(shard)]
+            if not shards:
+                break
+
+            is_claimed = False
+            for shard in shards:
+                if self.queue.is_done(shard) or not self.queue.claim(shard):
+                    continue
+                is_claimed = True
+                try:
+                    is_translated = self._process(shard)
+                except Exception:
+                    # Leave the shard to another worker
+                    self.queue.release(shard)
+                    raise
+                if is_translated:
+                    shards_translated = shards_translated + 1
+
+            # Every shard left is leased to another worker - wait for it to finish or for its lease to expire
+            if not is_claimed:
+                time.sleep(self.poll_interval)
+
+        LOGGER.info(f"Worker: {self.queue.worker_id} - Shards Translated: {shards_translated}")
+        return shards_translated
+
+    def _process(self, shard: str) -> bool:
+        """
+        :return: The shard was translated - False if its lease was lost to another worker on the way
+        """
+        LOGGER.info(f"|{shard}| Claimed by {self.queue.worker_id}")
+        stopping = threading.Event()
+        lost = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(shard, stopping, lost), daemon=True)
+        heartbeat.start()
+        try:
+            filename_unpacked = os.path.join(self.queue.dir_shared, f"{shard}_unpacked.txt")
+            with METRICS.timer("shards"):
+                with open(filename_unpacked, "r", encoding="windows-1251") as unpacked_fp, pause_gc():
+                    rows = [Row.parse(line) for line in unpacked_fp if line.strip()]
+                rows = self.translate(rows)
+                # The shard was taken over - its new owner writes the translation
+                if lost.is_set() or not self.queue.complete(shard, rows):
+                    return False
+        finally:
+            stopping.set()
+            heartbeat.join()
+        METRICS.count("shards_translated")
+        METRICS.count("rows_translated", len(rows))
+        LOGGER.info(f"|{shard}| Done - Rows: {len(rows)}")
+        return True
+
+    def _heartbeat(self, shard: str, stopping: threading.Event, lost: threading.Event):
+        while not stopping.wait(self.queue.lease / 3):
+            if not self.queue.renew(shard):
+                lost.set()
+                break
+
+    def translate(self, rows: List[Row]) -> List[Row]:
+        # Blank rows (an empty multiline body line) are kept as they are
+        texts = [row.text for row in rows if row.text.strip()]
+        if self.glossary is not None:
+            texts = self.glossary.protect_many(texts)
+        translations = translate_segments(texts, self.engine, self.cache, self.fuzzy)
+        if self.glossary is not None:
+            translations = self.glossary.normalize_many(translations, texts)
+
+        translated = iter(translations)
+        return [row.replace(next(translated)) if row.text.strip() else row for row in rows]
@@ -0,0 +1,156 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+
+class StubServer:
+    """
+    Local stand-in for an HTTP JSON translation service - the wire format of the HttpJsonBackend.
+    Upper-cases every text after a configurable latency & injects server errors (503), rate limits (429)
+    and dropped connections at configurable rates, so throughput & retry behaviour can be measured offline.
+    Connections are kept alive (HTTP/1.1) unless one is dropped on purpose.
+    """
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        disconnect_rate: float = 0.0,
+        retry_after: float = 0.1,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.disconnect_rate = disconnect_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+
+        self.stats: Dict[str, int] = {
+            "connections": 0,
+            "requests": 0,
+            "texts": 0,
+            "characters": 0,
+            "errors": 0,
+            "rate_limits": 0,
+            "disconnects": 0,
+        }
+        self.lock = threading.Lock()
+
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/translate"
+
+    def _count(self, name: str, amount: int = 1):
+        with self.lock:
+            self.stats[name] = self.stats[name] + amount
+
+    def _draw(self) -> str:
+        # One draw per request decides which fault, if any, is injected
+        with self.lock:
+            draw = self.random.random()
+        if draw < self.disconnect_rate:
+            return "disconnect"
+        if draw < self.disconnect_rate + self.error_rate:
+            return "error"
+        if draw < self.disconnect_rate + self.error_rate + self.rate_limit_rate:
+            return "rate_limit"
+        return "ok"
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                stub._count("connections")
+
+            def log_message(self, format, *args):
+                LOGGER.debug("Stub Server: " + format, *args)
+
+            def _send_json(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None):
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._send_json(200, dict(stub.stats))
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                stub._count("requests")
+
+                time.sleep(stub.latency + (stub.random.uniform(0, stub.jitter) if stub.jitter else 0))
+
+                fault = stub._draw()
+                if fault == "disconnect":
+                    stub._count("disconnects")
+                    self.close_connection = True
+                    return
+                if fault == "error":
+                    stub._count("errors")
+                    self._send_json(503, {"message": "Injected Server Error"})
+                    return
+                if fault == "rate_limit":
+                    stub._count("rate_limits")
+                    self._send_json(429, {"message": "Injected Rate Limit"}, {"Retry-After": str(stub.retry_after)})
+                    return
+
+                try:
+                    texts = json.loads(body.decode("utf-8"))["texts"]
+                except (ValueError, KeyError) as e:
+                    self._send_json(400, {"message": f"Invalid Request: {e}"})
+                    return
+
+                stub._count("texts", len(texts))
+                stub._count("characters", sum(len(text) for text in texts))
+                self._send_json(200, {"translations": [text.upper() for text in texts]})
+
+        return Handler
+
+    def start(self) -> "StubServer":
+        self.thread = threading.Thread(target=self.server.serve_forever, name="stub-server", daemon=True)
+        self.thread.start()
+        LOGGER.info(f"Stub Server: Listening on {self.url}")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def serve_forever(self):
+        LOGGER.info(f"Stub Server: Listening on {self.url}")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
@@ -0,0 +1,139 @@
+import random
+from typing import Iterable, List, Tuple
+
+from packager.constants import DELIMITER_NEWLINE
+from packager import rx
+
+WORDS_RUSSIAN = [
+    "Зона", "сталкер", "артефакт", "аномалия", "бандит", "Долг", "Свобода", "патроны", "аптечка", "Бар",
+    "Затон", "Припять", "Янтарь", "выброс", "контролёр", "кровосос", "детектор", "наёмник", "военные", "учёный",
+]
+
+
+def _sentence(rng: random.Random, word_count: int) -> str:
+    return " ".join(rng.choices(WORDS_RUSSIAN, k=word_count))
+
+
+def _decorate(rng: random.Random, text: str) -> str:
+    # Embedded \n escapes & bracketed numbers - both are mangled by translators & repaired by the Aligner
+    roll = rng.random()
+    if roll < 0.2:
+        return text + "\\n" + _sentence(rng, rng.randint(2, 8))
+    if roll < 0.25:
+        return f"{text} [{rng.randint(1, 999)}]"
+    return text
+
+
+def generate_string_table(
+    filename: str,
+    size_bytes: int,
+    multiline_ratio: float = 0.3,
+    body_lines: Tuple[int, int] = (1, 4),
+    seed: int = 0,
+) -> int:
+    """
+    Write a windows-1251 S.T.A.L.K.E.R. string table of <string id><text> entries until it reaches size_bytes.
+    :param multiline_ratio: Share of entries whose <text> spans several lines
+    :param body_lines: Inclusive range of middle lines per multiline entry
+    :return: Number of strings written
+    """
+    rng = random.Random(seed)
+    written = 0
+    idx = 0
+    with open(filename, "w", encoding="windows-1251") as output_fp:
+        output_fp.write('<?xml version="1.0" encoding="windows-1251"?>\n<string_table>\n')
+        while written < size_bytes:
+            lines = [f'\t<string id="st_synthetic_{idx}">\n']
+            if rng.random() < multiline_ratio:
+                # Opening & closing lines may or may not carry text of their own
+                text_start = _sentence(rng, 8) if rng.random() < 0.8 else ""
+                lines.append(f"\t\t<text>{text_start}\n")
+                for _ in range(rng.randint(*body_lines)):
+                    lines.append(_decorate(rng, _sentence(rng, 12)) + "\\n\n")
+                text_end = _sentence(rng, 4) if rng.random() < 0.8 else ""
+                lines.append(f"{text_end}</text>\n")
+            else:
+                lines.append(f"\t\t<text>{_decorate(rng, _sentence(rng, rng.randint(3, 30)))}</text>\n")
+            lines.append("\t</string>\n")
+
+            chunk = "".join(lines)
+            output_fp.write(chunk)
+            written = written + len(chunk.encode("windows-1251"))
+            idx = idx + 1
+        output_fp.write("</string_table>\n")
+
+    return idx
+
+
+def generate_translation(rows: Iterable[str], mangle_ratio: float = 0.05, seed: int = 0) -> List[str]:
+    """
+    Stand-in for a translator - upper-cases unpacked rows & mangles a share of their prefixes the way
+    translators do: a ;NEW_LINE; replaced by the line number ([150] text [150] ...) or a dropped "]".
+    """
+    rng = random.Random(seed)
+    rows_translated = []
+    for row in rows:
+        match = rx.CIPHER_PREFIX.match(row)
+        row_translated = row[:match.end()] + row[match.end():].upper()
+
+        if rng.random() < mangle_ratio:
+            if DELIMITER_NEWLINE in row_translated:
+                row_translated = row_translated.replace(DELIMITER_NEWLINE, f"[{match.group(1)}]", 1)
+            elif match.group(2) is None:
+                row_translated = row_translated.replace("]", "", 1)
+
+        rows_translated.append(row_translated)
+
+    return rows_translated
+
+
+def generate_index_rows(row_count: int, seed: int = 0) -> List[str]:
+    """
+    Unpacked rows in the intermediate text format - a mix of simple & multiline groups.
+    """
+    rng = random.Random(seed)
+    rows = []
+    idx = 1
+    while len(rows) < row_count:
+        text = _sentence(rng, 6)
+        if rng.random() < 0.3:
+            body = rng.randint(1, 4)
+            rows.append(f"[{idx}]:MLS: {text}\n")
+            for offset in range(1, body + 1):
+                rows.append(f"[{idx + offset}]:ML: {text} {DELIMITER_NEWLINE} \n")
+            rows.append(f"[{idx + body + 1}]:MLE: {text}\n")
+            idx = idx + body + 2
+        else:
+            rows.append(f"[{idx}] {text} {DELIMITER_NEWLINE} \n")
+            idx = idx + 1
+    return rows
+
+
+TERMS_STALKER = [
+    (["Долг", "Долга", "Долгу", "Долгом", "Долге"], "Duty", ["Debt", "Dolg"]),
+    (["Свобода", "Свободы", "Свободе", "Свободу", "Свободой"], "Freedom", ["Svoboda", "Liberty"]),
+    (["Затон", "Затона", "Затоне"], "Zaton", ["Zatone", "Backwater"]),
+    (["Припять", "Припяти"], "Pripyat", ["Pripiat", "Pripjat"]),
+    (["Янтарь", "Янтаря", "Янтаре"], "Yantar", ["Amber"]),
+    (["Бар", "Бара", "Баре"], "Bar", []),
+]
+SYLLABLES_RUSSIAN = ["ба", "ве", "го", "да", "же", "зи", "ко", "ла", "ми", "но", "пу", "ре", "со", "ту", "фа", "хи"]
+ENDINGS_RUSSIAN = ["", "а", "у", "ом", "е"]
+
+
+def generate_glossary(term_count: int, seed: int = 0) -> List[Tuple[List[str], str, List[str]]]:
+    """
+    Glossary entries - the STALKER factions & locations, then made-up names w/ their case endings
+    until there are term_count entries.
+    """
+    rng = random.Random(seed)
+    entries = list(TERMS_STALKER[:term_count])
+    names = {form for forms_source, _, _ in entries for form in forms_source}
+    while len(entries) < term_count:
+        name = "".join(rng.choices(SYLLABLES_RUSSIAN, k=rng.randint(2, 4))).capitalize()
+        if name in names:
+            continue
+        names.add(name)
+        target = f"Term{len(entries)}"
+        entries.append(([name + ending for ending in ENDINGS_RUSSIAN], target, [target.lower()]))
+    return entries
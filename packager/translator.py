@@ -0,0 +1,143 @@
+import logging
+from typing import Dict, List, Optional
+
+from packager.cache import TranslationMemory
+from packager.constants import CHARACTER_LIMIT, TRANSLATE_BATCH_LIMIT
+from packager.engine import TranslationEngine
+from packager.fuzzy import FuzzyMemory
+from packager.journal import Journal
+from packager.metrics import METRICS
+
+LOGGER = logging.getLogger(__name__)
+
+
+def batch_segments(
+    segments: List[str],
+    character_limit: int = CHARACTER_LIMIT,
+    batch_limit: int = TRANSLATE_BATCH_LIMIT,
+) -> List[List[int]]:
+    """
+    Group segment positions into batches that respect the request size & count limits.
+    A single segment larger than the character limit is sent on its own.
+    :param segments: Texts to be translated, in file order
+    :param character_limit: Maximum number of characters per request
+    :param batch_limit: Maximum number of texts per request
+    :return: List of batches, each a list of positions into segments
+    """
+    batches = []
+    batch = []
+    characters_batched = 0
+
+    for position, segment in enumerate(segments):
+        # Flush existing batch if segment will overflow either limit
+        if batch and (characters_batched + len(segment) > character_limit or len(batch) >= batch_limit):
+            batches.append(batch)
+            batch = []
+            characters_batched = 0
+
+        batch.append(position)
+        characters_batched = characters_batched + len(segment)
+
+    # Final flush of batched segments
+    if batch:
+        batches.append(batch)
+
+    return batches
+
+
+def translate_segments(
+    segments: List[str],
+    engine: TranslationEngine,
+    cache: Optional[TranslationMemory] = None,
+    fuzzy: Optional[FuzzyMemory] = None,
+    journal: Optional[Journal] = None,
+) -> List[str]:
+    """
+    Translate segments with one list call per batch, returning translations in the original order.
+    Repeated segments are only sent once & segments found in the translation memory are not sent at all.
+    :param segments: Texts to be translated, in file order
+    :param engine: Engine sending the batched requests
+    :param cache: Optional translation memory checked before & filled after every request
+    :param fuzzy: Optional fuzzy memory - near-duplicates of known segments reuse their translation
+    :param journal: Optional checkpoint of the run - journaled segments are reused, every batch is journaled
+    :return: Translated texts aligned with segments
+    """
+    translations_known = journal.get_many(segments) if journal is not None else {}
+    METRICS.count("journal_hits", len(translations_known))
+    if cache is not None:
+        translations_cached = cache.get_many([segment for segment in segments if segment not in translations_known])
+        METRICS.count("cache_hits", len(translations_cached))
+        # Reused translations are journaled too - the journal alone is enough to resume the run
+        _update_reused(translations_known, translations_cached, journal)
+    METRICS.count("segments_translated", len(segments))
+
+    # Unique segments still requiring a request, in first-seen order
+    segments_pending = list(dict.fromkeys(segment for segment in segments if segment not in translations_known))
+
+    segments_deferred = []
+    if fuzzy is not None:
+        _update_reused(translations_known, fuzzy.lookup_many(segments_pending), journal)
+        segments_pending = [segment for segment in segments_pending if segment not in translations_known]
+
+        # Send one segment per masked form - the rest are filled from its translation afterwards
+        segments_by_mask = {}
+        for segment in segments_pending:
+            segments_by_mask.setdefault(fuzzy.mask(segment), []).append(segment)
+        segments_pending = [group[0] for group in segments_by_mask.values()]
+        segments_deferred = [segment for group in segments_by_mask.values() for segment in group[1:]]
+
+    _translate_pending(segments_pending, engine, translations_known, cache, fuzzy, journal)
+
+    if segments_deferred:
+        _update_reused(translations_known, fuzzy.lookup_many(segments_deferred), journal)
+        # Tokens that could not be carried over - these are sent after all
+        segments_pending = [segment for segment in segments_deferred if segment not in translations_known]
+        _translate_pending(segments_pending, engine, translations_known, cache, fuzzy, journal)
+
+    return [translations_known[segment] for segment in segments]
+
+
+def _update_reused(
+    translations_known: Dict[str, str],
+    translations_reused: Dict[str, str],
+    journal: Optional[Journal] = None,
+):
+    translations_known.update(translations_reused)
+    if journal is not None and translations_reused:
+        journal.put_many(list(translations_reused.items()))
+
+
+def _translate_pending(
+    segments_pending: List[str],
+    engine: TranslationEngine,
+    translations_known: Dict[str, str],
+    cache: Optional[TranslationMemory] = None,
+    fuzzy: Optional[FuzzyMemory] = None,
+    journal: Optional[Journal] = None,
+):
+    if not segments_pending:
+        return
+
+    batches = batch_segments(segments_pending)
+    METRICS.count("batches", len(batches))
+    METRICS.count("characters_sent", sum(len(segment) for segment in segments_pending))
+    LOGGER.info(f"Translating Unique Unknown Segments: {len(segments_pending)} - Requests: {len(batches)}...")
+
+    batches_texts = [[segments_pending[position] for position in batch] for batch in batches]
+    for position_batch, texts_translated in engine.map(batches_texts):
+        texts = batches_texts[position_batch]
+        if len(texts_translated) != len(texts):
+            raise Exception(
+                "Translation Count Mismatch."
+                f"Sent: {len(texts)}"
+                f"Received: {len(texts_translated)}"
+            )
+
+        pairs = list(zip(texts, texts_translated))
+        translations_known.update(pairs)
+        if cache is not None:
+            cache.put_many(pairs)
+        if fuzzy is not None:
+            fuzzy.add_many(pairs)
+        if journal is not None:
+            journal.put_many(pairs)
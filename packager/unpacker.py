@@ -1,24 +1,31 @@
+from glob import escape as glob_escape, glob
 import logging
 import os
-from typing import List
+from typing import Iterable, Iterator, List, Optional, TextIO, Tuple
 
-from packager import rx
-from packager.constants import (
-    CHARACTER_LIMIT,
-    DELIMITER_MULTILINE_GENERAL,
-    DELIMITER_MULTILINE_END,
-    DELIMITER_MULTILINE_START,
-    DELIMITER_NEWLINE,
-)
+from packager import records, rx
+from packager.extractor import map_file, span_segment, TextExtractor, XmlData, XmlError
+from packager.incremental import Sidecar
+from packager.metrics import METRICS
+from packager.constants import CHARACTER_LIMIT, DELIMITER_NEWLINE, RECORDS_EXTENSION
+from packager.segment import Row, Segment, TAG_MULTILINE_END, TAG_MULTILINE_GENERAL, TAG_MULTILINE_START
 
 LOGGER = logging.getLogger(__name__)
 
 
 class Unpacker:
-    def __init__(self, filename, dir_output_unpack, dir_input_repack, is_character_limit: bool = False):
+    def __init__(
+        self,
+        filename,
+        dir_output_unpack,
+        dir_input_repack,
+        is_character_limit: bool = False,
+        sidecar: Optional[Sidecar] = None,
+        is_jsonl: bool = False,
+        is_expat: bool = False,
+    ):
         self.filename = filename
-        # TODO: Change to os.sep
-        self.filename_suffix = self.filename.split("\\")[-1]
+        self.filename_suffix = os.path.basename(self.filename)
         self.dir_output_unpack = dir_output_unpack
         self.dir_input_repack = dir_input_repack
 
@@ -27,78 +34,179 @@ class Unpacker:
         self.output_file_partition = 0
         self.characters_written = 0
 
-    def unpack(self):
-        LOGGER.info(f"|{self.filename_suffix}| - Unpacking...")
-        text_unpacked = []
+        # Totals across all partitions
+        self.segments_unpacked = 0
+        self.characters_unpacked = 0
 
-        with open(self.filename, "r", encoding="windows-1251") as input_fp:
-            LOGGER.info(f"|{self.filename_suffix}| Loading into memory...")
-            file_contents = input_fp.readlines()
+        # Incremental Settings - segments unchanged since the sidecar was recorded are skipped
+        self.sidecar = sidecar
+        self.segments_skipped = 0
 
-            line_iter = enumerate(iter(file_contents), start=1)
-            for idx, line in line_iter:
-                match_simple = rx.XML_SIMPLE.search(line)
-                match_multiline = rx.XML_MULTILINE_START.search(line)
+        # Output Format - bracket-prefixed text or one JSONL record per segment
+        self.is_jsonl = is_jsonl
+        self.extension = RECORDS_EXTENSION if self.is_jsonl else ".txt"
 
-                if match_simple:
-                    LOGGER.info(f"|{self.filename_suffix}| [{idx}] Match - Simple")
-                    text = self.process_simple_match(match_simple, idx)
-                elif match_multiline:
-                    LOGGER.info(f"|{self.filename_suffix}| [{idx}] Match - Multiline")
-                    text = self.process_multiline_match(match_multiline, idx, line_iter)
-                else:
-                    LOGGER.info(f"|{self.filename_suffix}| [{idx}] Match - None")
+        # Extraction - the XML parser's <text> spans instead of the line regexes
+        self.is_expat = is_expat
+
+    def unpack(self) -> Tuple[int, int]:
+        LOGGER.info(f"|{self.filename_suffix}| - Unpacking...")
+        output_fp = None
+
+        if self.sidecar is not None:
+            self._remove_stale_partitions()
+
+        with METRICS.timer("unpack"):
+            # Lines are read lazily & each segment is written out as soon as it is complete
+            for segment in self._iter_file_segments():
+                if self.sidecar is not None and self.sidecar.is_current(
+                    Sidecar.key(segment.string_id, segment.line_start), segment.format()
+                ):
+                    self.segments_skipped = self.segments_skipped + 1
                     continue
 
-                text = self.post_process(text)
+                if self.is_jsonl:
+                    text = self.post_process_segment(segment).format()
+                else:
+                    # The prefixes hold no escaped newline - post-process the rows in a single pass
+                    text = self.post_process(segment.format())
 
                 if self.is_character_limit:
-                    # Write existing data to file if text will overflow character limit
+                    # Close existing partition if text will overflow character limit
                     if self.characters_written + len(text) >= CHARACTER_LIMIT:
-                        self.write_to_file(text_unpacked)
-                        text_unpacked = []
+                        output_fp = self.close_partition(output_fp)
+
+                if output_fp is None:
+                    output_fp = self.open_partition()
 
-                # Add Unpacked Text to Internal Memory Store & Update Characters Written
-                text_unpacked.append(text)
+                # Write Unpacked Text to Partition & Update Characters Written
+                if self.is_jsonl:
+                    # An empty <text></text> block spanning lines has no rows to record
+                    if segment.rows:
+                        output_fp.write(records.dumps(records.segment_record(self.filename_suffix, segment.rows)))
+                else:
+                    output_fp.write(text)
                 self.characters_written = self.characters_written + len(text)
+                self.segments_unpacked = self.segments_unpacked + 1
+                self.characters_unpacked = self.characters_unpacked + len(text)
 
             # Final flush of unpacked data
-            if text_unpacked:
-                self.write_to_file(text_unpacked)
+            if output_fp is not None:
+                self.close_partition(output_fp)
+
+        METRICS.count("segments_unpacked", self.segments_unpacked)
+        METRICS.count("characters_unpacked", self.characters_unpacked)
+
+        if self.sidecar is not None:
+            METRICS.count("segments_skipped", self.segments_skipped)
+            LOGGER.info(
+                f"|{self.filename_suffix}| Incremental - "
+                f"Changed: {self.segments_unpacked} - Unchanged: {self.segments_skipped}"
+            )
+
+        return self.segments_unpacked, self.characters_unpacked
+
+    def iter_segments(self, lines: Iterable[str]) -> Iterator[Segment]:
+        """
+        Lazily extract segments from XML lines.
+        :param lines: XML file lines - any iterable, including an open file
+        :return: One Segment per <text> block, rows holding the raw text (see post_process_segment)
+        """
+        string_id = None
+        # Per-line logging is only paid for when DEBUG is actually enabled
+        is_debug = LOGGER.isEnabledFor(logging.DEBUG)
+        idx = 0
+        line_iter = enumerate(lines, start=1)
+        try:
+            for idx, line in line_iter:
+                if "<string" in line:
+                    match_string_id = rx.XML_STRING_ID.search(line)
+                    if match_string_id:
+                        string_id = match_string_id.group(1)
+
+                match_simple = rx.XML_SIMPLE.search(line)
+                match_multiline = rx.XML_MULTILINE_START.search(line)
+
+                if match_simple:
+                    if is_debug:
+                        LOGGER.debug("|%s| [%d] Match - Simple", self.filename_suffix, idx)
+                    yield Segment(idx, idx, string_id, [self.process_simple_match(match_simple, idx)])
+                elif match_multiline:
+                    if is_debug:
+                        LOGGER.debug("|%s| [%d] Match - Multiline", self.filename_suffix, idx)
+                    idx_start = idx
+                    rows, idx = self.process_multiline_match(match_multiline, idx_start, line_iter)
+                    yield Segment(idx_start, idx, string_id, rows)
+                elif is_debug:
+                    LOGGER.debug("|%s| [%d] Match - None", self.filename_suffix, idx)
+        finally:
+            METRICS.count("lines_scanned", idx)
+
+    def iter_segments_spans(self, data: XmlData) -> Iterator[Segment]:
+        """
+        Extract segments from the <text> spans of the undecoded XML - rows match those of iter_segments.
+        :raise XmlError: The document is not well-formed, or a line holds more than one <text> element
+        """
+        line_last = 0
+        spans = 0
+        for span in TextExtractor(data, self.filename_suffix):
+            # Rows are keyed by line number - a line holding two <text> elements cannot be unpacked from spans
+            if span.line_start <= line_last:
+                raise XmlError(
+                    "Line Mismatch. "
+                    f"File: {self.filename_suffix} - Line: {span.line_start} Holds More Than One <text> Element"
+                )
+            line_last = span.line_end
+            spans = spans + 1
+            yield span_segment(span)
+        METRICS.count("spans_parsed", spans)
+
+    def _iter_file_segments(self) -> Iterator[Segment]:
+        if self.is_expat:
+            try:
+                # Every span is parsed before the first segment is written - a fallback starts from a clean slate
+                with map_file(self.filename) as xml_map:
+                    segments = list(self.iter_segments_spans(xml_map))
+            except XmlError as e:
+                LOGGER.warning(f"{e} - Falling Back to Line Matching")
+            else:
+                yield from segments
+                return
+
+        with open(self.filename, "r", encoding="windows-1251") as input_fp:
+            yield from self.iter_segments(input_fp)
 
     @staticmethod
-    def process_simple_match(match, idx: int) -> str:
-        processed_text = match.groups()[0] + "\n"
-        processed_text_prepended = f"[{idx}] " + processed_text
-        return processed_text_prepended
+    def process_simple_match(match, idx: int) -> Row:
+        return Row(idx, None, match.group(1))
 
     @staticmethod
-    def process_multiline_match(match, idx: int, line_iter) -> str:
+    def process_multiline_match(match, idx: int, line_iter) -> Tuple[List[Row], int]:
+        rows = []
+
         # Handle Starting Line
-        match_start = match.groups()[0]
+        match_start = match.group(1)
         if match_start:
-            prefix_start = f"[{idx}]{DELIMITER_MULTILINE_START} "
-            line_to_parse_prepended = prefix_start + match.groups()[0]
-            text = line_to_parse_prepended + "\n"
-        else:
-            text = ""
+            rows.append(Row(idx, TAG_MULTILINE_START, match_start))
 
         # Handle Body (Middle Line(s))
+        # Anchored match - an unanchored search of a leading (.*) is quadratic in the line length on a miss
         idx, line_to_parse = next(line_iter)
-        while not rx.XML_MULTILINE_END.search(line_to_parse):
-            prefix_middle = f"[{idx}]{DELIMITER_MULTILINE_GENERAL} "
-            line_to_parse_prepended = prefix_middle + line_to_parse
-            text = text + line_to_parse_prepended
+        match_end = rx.XML_MULTILINE_END.match(line_to_parse)
+        while not match_end:
+            # The whole XML line is the row - its newline is added back when the row is written
+            if line_to_parse.endswith("\n"):
+                line_to_parse = line_to_parse[:-1]
+            rows.append(Row(idx, TAG_MULTILINE_GENERAL, line_to_parse))
             idx, line_to_parse = next(line_iter)
+            match_end = rx.XML_MULTILINE_END.match(line_to_parse)
 
         # Handle Ending Line
-        match_end = rx.XML_MULTILINE_END.search(line_to_parse).groups()[0]
-        if match_end:
-            prefix_end = f"[{idx}]{DELIMITER_MULTILINE_END} "
-            line_to_parse_prepended = prefix_end + match_end
-            text = text + line_to_parse_prepended + "\n"
+        text_end = match_end.group(1)
+        if text_end:
+            rows.append(Row(idx, TAG_MULTILINE_END, text_end))
 
-        return text
+        return rows, idx
 
     @staticmethod
     def post_process(text: str) -> str:
@@ -107,24 +215,53 @@ class Unpacker:
 
         return text
 
-    def write_to_file(self, file_contents_unpacked: List[str]):
-        filename_no_ext = self.filename_suffix.split(".")[0]
-        # Write File Contents to Unpacker Output Directory
-        output_filename = f"{self.dir_output_unpack}/{filename_no_ext}_unpacked.txt"
-        if self.is_character_limit:
-            output_filename = output_filename.replace(".txt", f"-{self.output_file_partition}.txt")
-        LOGGER.info(f"File: {self.filename} - Writing: {output_filename} - Characters: {self.characters_written}...")
-        with open(output_filename, "w", encoding="windows-1251") as output_fp:
-            output_fp.writelines(file_contents_unpacked)
-        LOGGER.info(f"File: {self.filename_suffix} - Writing: {output_filename} - Successful")
+    @classmethod
+    def post_process_segment(cls, segment: Segment) -> Segment:
+        for row in segment.rows:
+            row.text = cls.post_process(row.text)
+        return segment
+
+    def open_partition(self) -> TextIO:
+        output_filename = self._output_filename()
+        LOGGER.info(f"File: {self.filename} - Writing: {output_filename}...")
+        return open(output_filename, "w", encoding="utf-8" if self.is_jsonl else "windows-1251")
+
+    def close_partition(self, output_fp: Optional[TextIO]) -> None:
+        # A partition may be closed before anything was written to it - still create the (empty) file
+        if output_fp is None:
+            output_fp = self.open_partition()
+        output_fp.close()
+        LOGGER.info(
+            f"File: {self.filename_suffix} - Writing: {output_fp.name} - "
+            f"Characters: {self.characters_written} - Successful"
+        )
 
         self.output_file_partition = self.output_file_partition + 1
         self.characters_written = 0
 
         # Create Empty File w/ Proper Naming Scheme in Repacker Input Directory
-        output_repack_filename = f"{self.dir_input_repack}/{filename_no_ext}_translate.txt"
+        filename_no_ext = self.filename_suffix.split(".")[0]
+        output_repack_filename = f"{self.dir_input_repack}/{filename_no_ext}_translate{self.extension}"
         if self.is_character_limit:
-            output_repack_filename = output_repack_filename.replace(".txt", f"-{self.output_file_partition}.txt")
+            output_repack_filename = output_repack_filename.replace(
+                self.extension, f"-{self.output_file_partition}{self.extension}"
+            )
 
         with open(output_repack_filename, "w"):
             pass
+
+    def _remove_stale_partitions(self):
+        # Translations from the previous run were recorded in the sidecar on repack - only changed segments remain
+        filename_no_ext = self.filename_suffix.split(".")[0]
+        for filename in glob(os.path.join(self.dir_input_repack, glob_escape(filename_no_ext) + "_translate*")):
+            if rx.TRANSLATE_PARTITION.fullmatch(os.path.basename(filename)[len(filename_no_ext):]):
+                LOGGER.info(f"|{self.filename_suffix}| Incremental - Removing: {filename}")
+                os.remove(filename)
+
+    def _output_filename(self) -> str:
+        filename_no_ext = self.filename_suffix.split(".")[0]
+        # Write File Contents to Unpacker Output Directory
+        output_filename = f"{self.dir_output_unpack}/{filename_no_ext}_unpacked{self.extension}"
+        if self.is_character_limit:
+            output_filename = output_filename.replace(self.extension, f"-{self.output_file_partition}{self.extension}")
+        return output_filename
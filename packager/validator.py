@@ -0,0 +1,205 @@
+from concurrent.futures import as_completed, ProcessPoolExecutor
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from packager.aligner import check_unpacked, generate_lookup
+from packager.constants import DELIMITER_NEWLINE
+from packager.metrics import METRICS, collect
+from packager import rx
+from packager.segment import pause_gc, TAGS
+
+LOGGER = logging.getLogger(__name__)
+
+ISSUE_MISMATCHED = "mismatched"
+ISSUE_MISSING = "missing"
+ISSUE_DUPLICATED = "duplicated"
+ISSUE_NEWLINE_LOST = "newline_lost"
+ISSUE_TYPES = (ISSUE_MISMATCHED, ISSUE_MISSING, ISSUE_DUPLICATED, ISSUE_NEWLINE_LOST)
+
+
+def issue(issue_type: str, row: Optional[int], line_number: Optional[int], detail: str) -> Dict:
+    """
+    :param row: Line of the translated file (1-based) - None for a row that is missing altogether
+    :param line_number: The [N] the row carries or should carry
+    """
+    return {"type": issue_type, "row": row, "line": line_number, "detail": detail}
+
+
+class Validator:
+    """
+    Read-only check of translated text files against their unpacked anchors - nothing is written.
+    Every problem that would make the Aligner guess or the Repacker fail is reported, not just the first.
+    """
+    def __init__(self, filenames_translate: List[str], filenames_anchor: List[str], jobs: int = 1):
+        self.map_filenames_translate: Dict[str, str] = generate_lookup(filenames_translate)
+        self.map_filenames_anchor: Dict[str, str] = generate_lookup(filenames_anchor)
+        self.jobs = jobs
+        check_unpacked(filenames_translate + filenames_anchor)
+
+    def validate(self) -> Dict:
+        """
+        Check every translated file - files are independent & run in worker processes when jobs > 1.
+        :return: Report - a summary & one entry per root filename listing its issues
+        """
+        LOGGER.info(f"Validating Files: {len(self.map_filenames_translate)}")
+        time_start = time.perf_counter()
+
+        files: Dict[str, Dict] = {}
+        if self.jobs > 1:
+            with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+                futures = {
+                    executor.submit(collect, self.validate_file, filename_root): filename_root
+                    for filename_root in self.map_filenames_translate
+                }
+                for future in as_completed(futures):
+                    files[futures[future]], snapshot = future.result()
+                    METRICS.merge(snapshot)
+        else:
+            for filename_root in self.map_filenames_translate:
+                files[filename_root] = self.validate_file(filename_root)
+
+        elapsed = time.perf_counter() - time_start
+        issues = [entry for report_file in files.values() for entry in report_file["issues"]]
+        files_invalid = sorted(root for root, report_file in files.items() if not report_file["valid"])
+        summary = {
+            "files": len(files),
+            "files_invalid": len(files_invalid),
+            "files_unreadable": sum(1 for report_file in files.values() if report_file["error"] is not None),
+            "rows": sum(report_file["rows"] for report_file in files.values()),
+            "issues": {issue_type: 0 for issue_type in ISSUE_TYPES},
+            "elapsed_s": round(elapsed, 3),
+        }
+        for entry in issues:
+            summary["issues"][entry["type"]] = summary["issues"][entry["type"]] + 1
+
+        LOGGER.info(
+            f"Validated Files: {len(files)} - "
+            f"Invalid: {len(files_invalid)} - "
+            f"Rows: {summary['rows']} - "
+            f"Issues: {len(issues)} - "
+            f"Elapsed: {elapsed:.2f}s"
+        )
+        if files_invalid:
+            LOGGER.warning(f"Invalid File(s): {', '.join(files_invalid)}")
+
+        return {
+            "valid": not files_invalid,
+            "summary": summary,
+            "files": {root: files[root] for root in sorted(files)},
+        }
+
+    def validate_file(self, filename_root: str) -> Dict:
+        filename_translate = self.map_filenames_translate[filename_root]
+        filename_anchor = self.map_filenames_anchor.get(filename_root)
+        report_file = {
+            "translation": filename_translate,
+            "anchor": filename_anchor,
+            "rows": 0,
+            "rows_anchor": 0,
+            "valid": False,
+            "error": None,
+            "issues": [],
+        }
+        if filename_anchor is None:
+            report_file["error"] = f"Anchor File Missing. Translation: {filename_translate}"
+            return report_file
+
+        try:
+            with pause_gc():
+                rows_anchor = self._read_anchor(filename_anchor)
+        except Exception as e:
+            report_file["error"] = str(e)
+            return report_file
+
+        with METRICS.timer("validate"), pause_gc():
+            with open(filename_translate, "r", encoding="windows-1251", errors="ignore") as translate_fp:
+                rows, issues = self.check_rows(translate_fp, rows_anchor)
+        METRICS.count("rows_validated", rows)
+        METRICS.count("issues_found", len(issues))
+
+        report_file["rows"] = rows
+        report_file["rows_anchor"] = len(rows_anchor)
+        report_file["valid"] = not issues
+        report_file["issues"] = issues
+        if issues:
+            LOGGER.info(f"{filename_root}: Issues: {len(issues)}")
+        return report_file
+
+    @staticmethod
+    def _read_anchor(filename: str) -> Dict[int, Tuple[Optional[str], int]]:
+        """
+        :return: Line number -> (multiline tag, ;NEW_LINE; delimiters in the text), in line number order
+        """
+        rows_anchor = {}
+        with open(filename, "r", encoding="windows-1251", errors="ignore") as anchor_fp:
+            for line in anchor_fp:
+                match = rx.CIPHER_PREFIX.match(line)
+                if not match:
+                    if not line.strip():
+                        continue
+                    raise Exception(f"Invalid Anchor Row format: {line}")
+                line_number, tag = match.groups()
+                rows_anchor[int(line_number)] = (TAGS[tag], line.count(DELIMITER_NEWLINE))
+        return rows_anchor
+
+    @staticmethod
+    def check_rows(
+        lines_translate: Iterable[str],
+        rows_anchor: Dict[int, Tuple[Optional[str], int]],
+    ) -> Tuple[int, List[Dict]]:
+        """
+        Key every translated row to its anchor row by the [N]/:MLx: prefix, as Aligner.repair_text does.
+        Blank lines are skipped as the Aligner does, but each issue names its line in the file.
+        :param lines_translate: Translated rows as read - prefixes may be mangled
+        :param rows_anchor: Line number -> (multiline tag, ;NEW_LINE; delimiters)
+        :return: (rows checked, issues in file order followed by the anchor rows no translated row carries)
+        """
+        issues = []
+        seen = set()
+        rows = 0
+        line_number_last = -1
+        for row, line in enumerate(lines_translate, start=1):
+            match = rx.CIPHER_PREFIX.match(line)
+            if not match:
+                if line.strip():
+                    rows = rows + 1
+                    issues.append(issue(ISSUE_MISMATCHED, row, None, f"Prefix Unreadable: {line[:40].rstrip()}"))
+                continue
+            rows = rows + 1
+
+            line_number, tag = match.groups()
+            line_number = int(line_number)
+            row_anchor = rows_anchor.get(line_number)
+            if row_anchor is None:
+                issues.append(issue(ISSUE_MISMATCHED, row, line_number, "Line Number Not in Anchor"))
+                continue
+            if line_number in seen:
+                issues.append(issue(ISSUE_DUPLICATED, row, line_number, "Line Number Already Used"))
+                continue
+            seen.add(line_number)
+
+            tag_anchor, newlines_anchor = row_anchor
+            if tag != tag_anchor:
+                issues.append(
+                    issue(ISSUE_MISMATCHED, row, line_number, f"Tag Mismatch - Expected: {tag_anchor} Found: {tag}")
+                )
+            elif line_number < line_number_last:
+                issues.append(issue(ISSUE_MISMATCHED, row, line_number, f"Out of Order - After: {line_number_last}"))
+            if line_number > line_number_last:
+                line_number_last = line_number
+
+            if newlines_anchor:
+                newlines = line.count(DELIMITER_NEWLINE)
+                if newlines < newlines_anchor:
+                    detail = f"Expected: {newlines_anchor} Found: {newlines}"
+                    # A delimiter the translator replaced with the line number - the Aligner repairs this one
+                    if rx.CIPHER_SIMPLE.search(line, match.end()):
+                        detail = f"{detail} - Replaced by a Line Number"
+                    issues.append(issue(ISSUE_NEWLINE_LOST, row, line_number, detail))
+
+        for line_number in rows_anchor:
+            if line_number not in seen:
+                issues.append(issue(ISSUE_MISSING, None, line_number, "No Translated Row"))
+
+        return rows, issues
@@ -0,0 +1,133 @@
+import argparse
+from glob import glob
+import logging
+import os
+
+from main import AUTH_KEY
+from packager.backends import BACKENDS, create_backend
+from packager.cache import TranslationMemory
+from packager.engine import TranslationEngine
+from packager.fuzzy import FuzzyMemory
+from packager.glossary import Glossary
+from packager.metrics import METRICS, profile
+from packager.pipeline import Pipeline
+
+logging.basicConfig(level=logging.INFO)
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+
+def type_xml(path: str):
+    filenames = glob(path)
+    if not filenames:
+        raise argparse.ArgumentTypeError(f"{path} does not match any file")
+    for filename in filenames:
+        if not filename.endswith(".xml"):
+            raise argparse.ArgumentTypeError(f"File: {filename} is not a valid XML file")
+    return path
+
+
+def dir_path(path):
+    if os.path.isdir(path):
+        return path
+    else:
+        raise argparse.ArgumentTypeError(f"readable_dir:{path} is not a valid path")
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Translate Russian XML File(s) End to End w/o Intermediate Files")
+    parser.add_argument(
+        "-in",
+        help="Russian XML File(s)",
+        dest="input",
+        type=type_xml,
+        required=True,
+    )
+    parser.add_argument(
+        "-out",
+        help="Output Directory For Translated XML File(s)",
+        dest="output",
+        type=dir_path,
+        required=True,
+    )
+    parser.add_argument(
+        "-backend",
+        help="Translation Backend - http Posts JSON to -url, echo Returns the Source Text (Dry Run)",
+        dest="backend",
+        choices=BACKENDS,
+        default="deepl",
+    )
+    parser.add_argument("-url", help="Endpoint of the http Backend", dest="url", default=None)
+    parser.add_argument(
+        "-debug",
+        help="Directory For the Unpacked & Translated Intermediate Text",
+        dest="debug",
+        type=dir_path,
+        default=None,
+    )
+    parser.add_argument("-cache", help="Translation Memory File (SQLite)", dest="cache", default=None)
+    parser.add_argument(
+        "-fuzzy",
+        help="Reuse Translations of Near-Duplicate Segments at or Above This Similarity (0-1)",
+        dest="fuzzy",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "-concurrency",
+        help="Number of Translation Requests in Flight at Once",
+        dest="concurrency",
+        type=int,
+        default=4,
+    )
+    parser.add_argument(
+        "-rate",
+        help="Maximum Translation Requests per Second",
+        dest="rate",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "-glossary",
+        help="Term File (TSV) - Protects Source Terms From the Translator & Normalizes Their Translations",
+        dest="glossary",
+        default=None,
+    )
+    parser.add_argument(
+        "-profile",
+        "--profile",
+        help="Profile the Run (cProfile + tracemalloc) - Writes pipeline.prof",
+        dest="profile",
+        action="store_true",
+    )
+
+    args = parser.parse_args()
+    if args.backend == "http" and not args.url:
+        parser.error("-backend http requires -url")
+
+    backend = create_backend(args.backend, auth_key=AUTH_KEY, url=args.url, pool_size=args.concurrency)
+    engine = TranslationEngine(backend.translate_batch, args.concurrency, args.rate)
+
+    cache = TranslationMemory(args.cache, backend=backend.name) if args.cache else None
+    fuzzy = None
+    if args.fuzzy is not None:
+        fuzzy = FuzzyMemory(args.fuzzy)
+        # Seed with everything translated in earlier runs
+        if cache is not None:
+            fuzzy.add_many(cache.items())
+    glossary = Glossary.from_file(args.glossary) if args.glossary else None
+
+    try:
+        with profile(args.profile, "pipeline"):
+            Pipeline(sorted(glob(args.input)), args.output, engine, cache, args.debug, fuzzy, glossary).run()
+    finally:
+        backend.close()
+        if cache is not None:
+            cache.close()
+        if fuzzy is not None:
+            fuzzy.report()
+        METRICS.report()
+
+
+if __name__ == "__main__":
+    run()
@@ -1,7 +1,14 @@
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
 import logging
 import os
+from typing import List, Optional
 
+from packager.constants import RECORDS_EXTENSION
+from packager.glossary import Glossary
+from packager.incremental import Sidecar
+from packager.metrics import METRICS, collect, profile
 from packager.repacker import Repacker
 
 logging.basicConfig(level=logging.INFO)
@@ -9,15 +16,17 @@ LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.INFO)
 
 
-def type_xml(filename: str):
-    if not filename.endswith(".xml"):
-        raise argparse.ArgumentTypeError(f"File: {filename} is not a valid XML file")
-    return filename
+def type_xml(path: str):
+    filenames = glob(path)
+    for filename in filenames:
+        if not filename.endswith(".xml"):
+            raise argparse.ArgumentTypeError(f"File: {filename} is not a valid XML file")
+    return path
 
 
 def type_txt(filename: str):
-    if not filename.endswith(".txt"):
-        raise argparse.ArgumentTypeError(f"File: {filename} is not a valid TXT file")
+    if not filename.endswith((".txt", RECORDS_EXTENSION)):
+        raise argparse.ArgumentTypeError(f"File: {filename} is not a valid TXT or JSONL file")
     return filename
 
 
@@ -32,17 +41,30 @@ def run():
     parser = argparse.ArgumentParser(description="Unpack Russian XML File(s) Into Text w/ Index")
     parser.add_argument(
         "-base",
-        help="Russian XML File",
+        help="Russian XML File(s)",
         dest="base",
         type=type_xml,
         required=True,
     )
     parser.add_argument(
         "-trans",
-        help="Translated Text File",
+        help="Translated Text or JSONL File - Omit to Use Every Partition Found in the Input Directory",
         dest="translate",
         type=type_txt,
-        required=True,
+        default=None,
+    )
+    parser.add_argument(
+        "-indir",
+        help="Input Directory Holding Translated Text File(s) - Default: input_repack",
+        dest="input_repack",
+        type=dir_path,
+        default=None,
+    )
+    parser.add_argument(
+        "-manifest",
+        help="Packing Manifest - Repack From Corpus Partitions",
+        dest="manifest",
+        default=None,
     )
     parser.add_argument(
         "-out",
@@ -51,10 +73,134 @@ def run():
         type=dir_path,
         default="output-repack"
     )
+    parser.add_argument(
+        "-jobs",
+        help="Number of Worker Processes Repacking Files in Parallel",
+        dest="jobs",
+        type=int,
+        default=1,
+    )
+
+    parser.add_argument(
+        "-incremental",
+        help="Carry Forward Translations of Unchanged Segments & Record a Sidecar in the Input Directory",
+        dest="incremental",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "-bytes",
+        help="Splice Translations Into the Undecoded XML (windows-1251 Fast Path, Ignored w/ -incremental)",
+        dest="bytes_mode",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "-expat",
+        help="Splice by the XML Parser's <text> Spans - Malformed XML Falls Back to the Regexes (Not w/ -incremental)",
+        dest="expat",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "-glossary",
+        help="Term File (TSV) - Normalizes Variants of the Glossary Terms in the Translations",
+        dest="glossary",
+        default=None,
+    )
+
+    parser.add_argument(
+        "-profile",
+        "--profile",
+        help="Profile the Run (cProfile + tracemalloc) - Writes repack.prof",
+        dest="profile",
+        action="store_true",
+    )
 
     args = parser.parse_args()
 
-    repacker = Repacker(args.base, args.translate, args.output)
+    filenames_base = glob(args.base)
+    if args.translate and len(filenames_base) > 1:
+        parser.error("-trans can only be used with a single -base file")
+
+    with profile(args.profile, "repack"):
+        repack(args, filenames_base)
+    METRICS.report()
+
+
+def repack(args: argparse.Namespace, filenames_base: List[str]):
+    input_repack = args.input_repack or "input_repack"
+    glossary = Glossary.from_file(args.glossary) if args.glossary else None
+
+    if args.jobs > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            futures = [
+                executor.submit(
+                    collect,
+                    repack_file,
+                    filename,
+                    args.translate,
+                    input_repack,
+                    args.manifest,
+                    args.output,
+                    args.incremental,
+                    args.bytes_mode,
+                    args.expat,
+                    glossary,
+                )
+                for filename in filenames_base
+            ]
+            for future in futures:
+                # Worker metrics are recorded in the worker process - fold them back in
+                _, snapshot = future.result()
+                METRICS.merge(snapshot)
+    else:
+        for filename in filenames_base:
+            repack_file(
+                filename,
+                args.translate,
+                input_repack,
+                args.manifest,
+                args.output,
+                args.incremental,
+                args.bytes_mode,
+                args.expat,
+                glossary,
+            )
+
+    LOGGER.info(f"Repacked Files: {len(filenames_base)}")
+
+
+def repack_file(
+    filename_base: str,
+    filename_translate: Optional[str],
+    dir_input_repack: str,
+    filename_manifest: Optional[str],
+    output_directory: str,
+    incremental: bool = False,
+    bytes_mode: bool = False,
+    expat: bool = False,
+    glossary: Optional[Glossary] = None,
+):
+    sidecar = Sidecar.for_base(filename_base, dir_input_repack) if incremental else None
+    if filename_translate:
+        repacker = Repacker(
+            filename_base,
+            filename_translate,
+            output_directory,
+            sidecar=sidecar,
+            is_bytes_mode=bytes_mode,
+            is_expat=expat,
+            glossary=glossary,
+        )
+    elif filename_manifest:
+        repacker = Repacker.from_manifest(
+            filename_base, filename_manifest, output_directory, sidecar, bytes_mode, expat, glossary
+        )
+    else:
+        repacker = Repacker.from_directory(
+            filename_base, dir_input_repack, output_directory, sidecar, bytes_mode, expat, glossary
+        )
     repacker.repack()
 
 
@@ -0,0 +1,211 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+import json
+import logging
+import os
+from typing import Optional
+
+from main import AUTH_KEY
+from packager.backends import BACKENDS, create_backend
+from packager.cache import TranslationMemory
+from packager.constants import SHARD_CHARACTER_LIMIT
+from packager.engine import TranslationEngine
+from packager.glossary import Glossary
+from packager.metrics import METRICS, collect
+from packager.shards import ShardQueue, ShardWorker
+
+logging.basicConfig(level=logging.INFO)
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+
+def type_xml(path: str):
+    filenames = glob(path)
+    for filename in filenames:
+        if not filename.endswith(".xml"):
+            raise argparse.ArgumentTypeError(f"File: {filename} is not a valid XML file")
+    return path
+
+
+def dir_path(path):
+    if os.path.isdir(path):
+        return path
+    else:
+        raise argparse.ArgumentTypeError(f"readable_dir:{path} is not a valid path")
+
+
+def run():
+    parser = argparse.ArgumentParser(
+        description="Translate a Corpus Across Machines - Shards in a Shared Directory Claimed by Leased Lock Files"
+    )
+    subparsers = parser.add_subparsers(dest="stage", required=True)
+
+    parser_create = subparsers.add_parser("create", help="Unpack & Pack XML File(s) Into Shards w/ a Manifest")
+    parser_create.add_argument("-in", help="Russian XML File(s)", dest="input", type=type_xml, required=True)
+    parser_create.add_argument("-dir", help="Shared Directory", dest="shared", type=dir_path, required=True)
+    parser_create.add_argument(
+        "-size",
+        help="Maximum Characters per Shard",
+        dest="size",
+        type=int,
+        default=SHARD_CHARACTER_LIMIT,
+    )
+    parser_create.add_argument(
+        "-jobs",
+        help="Number of Worker Processes Unpacking Files in Parallel",
+        dest="jobs",
+        type=int,
+        default=1,
+    )
+
+    parser_work = subparsers.add_parser("work", help="Claim & Translate Shards Until Every Shard is Done")
+    parser_work.add_argument("-dir", help="Shared Directory", dest="shared", type=dir_path, required=True)
+    parser_work.add_argument(
+        "-workers",
+        help="Number of Worker Processes on This Machine",
+        dest="workers",
+        type=int,
+        default=1,
+    )
+    parser_work.add_argument(
+        "-backend",
+        help="Translation Backend - http Posts JSON to -url, echo Returns the Source Text (Dry Run)",
+        dest="backend",
+        choices=BACKENDS,
+        default="deepl",
+    )
+    parser_work.add_argument("-url", help="Endpoint of the http Backend", dest="url", default=None)
+    parser_work.add_argument("-cache", help="Translation Memory File (SQLite)", dest="cache", default=None)
+    parser_work.add_argument(
+        "-concurrency",
+        help="Number of Translation Requests in Flight at Once per Worker",
+        dest="concurrency",
+        type=int,
+        default=4,
+    )
+    parser_work.add_argument(
+        "-rate",
+        help="Maximum Translation Requests per Second per Worker",
+        dest="rate",
+        type=float,
+        default=None,
+    )
+    parser_work.add_argument(
+        "-lease",
+        help="Seconds a Claim Holds Without Renewal Before Another Worker May Take the Shard Over",
+        dest="lease",
+        type=float,
+        default=300.0,
+    )
+    parser_work.add_argument(
+        "-poll",
+        help="Seconds Between Checks For Shards Held by Other Workers",
+        dest="poll",
+        type=float,
+        default=5.0,
+    )
+    parser_work.add_argument(
+        "-glossary",
+        help="Term File (TSV) - Protects Source Terms From the Translator & Normalizes Their Translations",
+        dest="glossary",
+        default=None,
+    )
+
+    parser_status = subparsers.add_parser("status", help="Print the State of Every Shard as JSON")
+    parser_status.add_argument("-dir", help="Shared Directory", dest="shared", type=dir_path, required=True)
+    parser_status.add_argument(
+        "-lease",
+        help="Seconds a Claim Holds Without Renewal",
+        dest="lease",
+        type=float,
+        default=300.0,
+    )
+
+    parser_merge = subparsers.add_parser("merge", help="Repack the XML File(s) From the Translated Shards")
+    parser_merge.add_argument("-base", help="Russian XML File(s)", dest="base", type=type_xml, required=True)
+    parser_merge.add_argument("-dir", help="Shared Directory", dest="shared", type=dir_path, required=True)
+    parser_merge.add_argument(
+        "-out",
+        help="Output Directory For Reconstructed XML File(s)",
+        dest="output",
+        type=dir_path,
+        default="output-repack",
+    )
+
+    args = parser.parse_args()
+    if args.stage == "work" and args.backend == "http" and not args.url:
+        parser.error("-backend http requires -url")
+
+    if args.stage == "create":
+        ShardQueue.create(sorted(glob(args.input)), args.shared, args.size, args.jobs)
+    elif args.stage == "work":
+        work(args)
+    elif args.stage == "status":
+        print(json.dumps(ShardQueue(args.shared, args.lease).status(), indent=1))
+    elif args.stage == "merge":
+        ShardQueue(args.shared).merge(sorted(glob(args.base)), args.output)
+    METRICS.report()
+
+
+def work(args: argparse.Namespace):
+    glossary = Glossary.from_file(args.glossary) if args.glossary else None
+    arguments = (
+        args.shared,
+        args.backend,
+        args.url,
+        args.cache,
+        args.concurrency,
+        args.rate,
+        args.lease,
+        args.poll,
+        glossary,
+    )
+
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = [executor.submit(collect, work_shards, *arguments) for _ in range(args.workers)]
+            shards_translated = 0
+            for future in futures:
+                # Worker metrics are recorded in the worker process - fold them back in
+                result, snapshot = future.result()
+                shards_translated = shards_translated + result
+                METRICS.merge(snapshot)
+    else:
+        shards_translated = work_shards(*arguments)
+
+    LOGGER.info(f"Shards Translated on This Machine: {shards_translated}")
+
+
+def work_shards(
+    dir_shared: str,
+    backend_name: str,
+    url: Optional[str],
+    filename_cache: Optional[str],
+    concurrency: int,
+    rate: Optional[float],
+    lease: float,
+    poll_interval: float,
+    glossary: Optional[Glossary] = None,
+) -> int:
+    # Every worker process has its own connections & translation memory connection
+    backend = create_backend(backend_name, auth_key=AUTH_KEY, url=url, pool_size=concurrency)
+    engine = TranslationEngine(backend.translate_batch, concurrency, rate)
+    cache = TranslationMemory(filename_cache, backend=backend.name) if filename_cache else None
+    try:
+        worker = ShardWorker(
+            ShardQueue(dir_shared, lease),
+            engine,
+            cache,
+            glossary=glossary,
+            poll_interval=poll_interval,
+        )
+        return worker.run()
+    finally:
+        backend.close()
+        if cache is not None:
+            cache.close()
+
+
+if __name__ == "__main__":
+    run()
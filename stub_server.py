@@ -0,0 +1,79 @@
+import argparse
+import logging
+
+from packager.stub_server import StubServer
+
+logging.basicConfig(level=logging.INFO)
+LOGGER = logging.getLogger(__name__)
+LOGGER.setLevel(logging.INFO)
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Local Stub Translation Server for the http Backend")
+    parser.add_argument("-host", help="Address to Listen On", dest="host", default="127.0.0.1")
+    parser.add_argument("-port", help="Port to Listen On", dest="port", type=int, default=8765)
+    parser.add_argument(
+        "-latency",
+        help="Simulated Processing Time per Request (Seconds)",
+        dest="latency",
+        type=float,
+        default=0.05,
+    )
+    parser.add_argument(
+        "-jitter",
+        help="Random Extra Latency of up to This Many Seconds",
+        dest="jitter",
+        type=float,
+        default=0.0,
+    )
+    parser.add_argument(
+        "-error-rate",
+        help="Share of Requests Answered w/ 503 Service Unavailable",
+        dest="error_rate",
+        type=float,
+        default=0.0,
+    )
+    parser.add_argument(
+        "-rate-limit-rate",
+        help="Share of Requests Answered w/ 429 Too Many Requests",
+        dest="rate_limit_rate",
+        type=float,
+        default=0.0,
+    )
+    parser.add_argument(
+        "-disconnect-rate",
+        help="Share of Requests Whose Connection is Dropped w/o a Response",
+        dest="disconnect_rate",
+        type=float,
+        default=0.0,
+    )
+    parser.add_argument(
+        "-retry-after",
+        help="Retry-After Sent w/ Injected 429 Responses (Seconds)",
+        dest="retry_after",
+        type=float,
+        default=0.1,
+    )
+    parser.add_argument("-seed", help="Random Seed For Reproducible Fault Injection", dest="seed", type=int)
+
+    args = parser.parse_args()
+
+    stub = StubServer(
+        args.host,
+        args.port,
+        args.latency,
+        args.jitter,
+        args.error_rate,
+        args.rate_limit_rate,
+        args.disconnect_rate,
+        args.retry_after,
+        args.seed,
+    )
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        LOGGER.info(f"Stub Server: Stopped - {stub.stats}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,84 @@
+import pytest
+
+from packager.aligner import Aligner
+from packager.segment import Row
+
+
+def rows_anchor(count: int):
+    return [Row(line_number, None, "") for line_number in range(1, count + 1)]
+
+
+def contents_base(count: int):
+    return [f"[{line_number}] text {line_number}\n" for line_number in range(1, count + 1)]
+
+
+def test_repair_text_mistyped_prefix_duplicating_a_later_row():
+    # Row 3 carries row 15's number - neither row may shadow the rows between them
+    base = contents_base(20)
+    base[2] = "[15] text 3\n"
+
+    repaired, unplaced = Aligner.repair_text(base, rows_anchor(20))
+
+    assert repaired == contents_base(20)
+    assert unplaced == []
+
+
+def test_repair_text_mistyped_prefix_jumping_past_its_successors():
+    # Row 3 carries the number of row 17, which the translator dropped
+    base = contents_base(20)
+    base[2] = "[17] text 3\n"
+    del base[16]
+
+    repaired, unplaced = Aligner.repair_text(base, rows_anchor(20))
+
+    expected = contents_base(20)
+    del expected[16]
+    assert repaired == expected
+    assert unplaced == []
+
+
+@pytest.mark.parametrize(
+    "tag_anchor, prefix_base",
+    [
+        (None, "[1]:ML:"),
+        (None, "[1]:MLS:"),
+        (None, "[1]:MLE:"),
+        ("ML", "[1]"),
+        ("MLS", "[1]"),
+        ("MLE", "[1]"),
+        ("MLS", "[1]:MLE:"),
+        ("MLE", "[1]:ML:"),
+    ],
+)
+def test_repair_text_rewrites_a_swapped_tag(tag_anchor, prefix_base):
+    # "[1]:ML:" starts w/ "[1]" - a tag left as the translator wrote it would corrupt the XML line on repack
+    anchor = [Row(1, tag_anchor, "")]
+
+    repaired, unplaced = Aligner.repair_text([f"{prefix_base} hello\n"], anchor)
+
+    assert repaired == [f"{anchor[0].prefix} hello\n"]
+    assert unplaced == []
+
+
+def test_repair_text_returns_rows_it_cannot_place():
+    base = contents_base(4)
+    base[1] = "text 2\n"
+    base.insert(2, "text 2b\n")
+
+    repaired, unplaced = Aligner.repair_text(base, rows_anchor(4))
+
+    assert repaired == [base[0], base[3], base[4]]
+    assert unplaced == ["text 2\n", "text 2b\n"]
+
+
+def test_align_fails_a_file_w_unrecoverable_rows(tmp_path):
+    base = contents_base(4)
+    base[1] = "text 2\n"
+    base.insert(2, "text 2b\n")
+    (tmp_path / "st_f0_translate.txt").write_text("".join(base), encoding="windows-1251")
+    (tmp_path / "st_f0_unpacked.txt").write_text("".join(contents_base(4)), encoding="windows-1251")
+
+    aligner = Aligner([str(tmp_path / "st_f0_translate.txt")], [str(tmp_path / "st_f0_unpacked.txt")], str(tmp_path))
+    with pytest.raises(Exception, match="File Alignment Failed"):
+        aligner.align()
+    assert not (tmp_path / "st_f0_aligned.txt").exists()
@@ -0,0 +1,101 @@
+import pytest
+
+from packager.glossary import Glossary, PLACEHOLDER, TermAutomaton
+
+
+def matched(automaton: TermAutomaton, text: str):
+    return [text[start:end] for start, end, _ in automaton.find(text)]
+
+
+def test_find_prefers_the_longest_of_terms_starting_together():
+    automaton = TermAutomaton({"Долина": "1", "Тёмная Долина": "2", "Тёмная": "3"})
+
+    assert matched(automaton, "Тёмная Долина за Долиной и Тёмная") == ["Тёмная Долина", "Тёмная"]
+
+
+def test_find_prefers_the_leftmost_of_overlapping_terms():
+    automaton = TermAutomaton({"Чистое Небо": "1", "Небо Зоны": "2"})
+
+    assert matched(automaton, "Чистое Небо Зоны") == ["Чистое Небо"]
+    assert matched(automaton, "Небо Зоны") == ["Небо Зоны"]
+
+
+def test_find_overlap_w_a_shorter_term_inside_a_longer_one():
+    # The failure link of "Агропром НИИ" leads into "НИИ" - the longer match still wins
+    automaton = TermAutomaton({"Агропром НИИ": "1", "НИИ": "2", "Агропром": "3"})
+
+    assert matched(automaton, "НИИ Агропром НИИ Агропром") == ["НИИ", "Агропром НИИ", "Агропром"]
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("Долг", ["Долг"]),
+        ("Долг, Свобода & Монолит.", ["Долг"]),
+        ("(Долг)", ["Долг"]),
+        ("Долги", []),
+        ("предолг Долг2", []),
+        ("«Долг»", ["Долг"]),
+    ],
+)
+def test_find_matches_whole_words_only(text, expected):
+    automaton = TermAutomaton({"Долг": "Duty"})
+
+    assert matched(automaton, text) == expected
+
+
+def test_find_term_edged_w_punctuation_ignores_word_boundaries():
+    automaton = TermAutomaton({"$$ACTION$$": "key"})
+
+    assert matched(automaton, "Press$$ACTION$$now") == ["$$ACTION$$"]
+
+
+def test_find_is_case_sensitive_in_cyrillic():
+    # Only the forms listed are matched - a lower case or upper case form is a term of its own
+    automaton = TermAutomaton({"Янтарь": "Yantar", "ЯНТАРЬ": "YANTAR"})
+
+    assert matched(automaton, "Янтарь янтарь ЯНТАРЬ") == ["Янтарь", "ЯНТАРЬ"]
+
+
+def test_replace_counts_replacements():
+    automaton = TermAutomaton({"Янтарь": "Yantar", "Янтаре": "Yantar"})
+
+    assert automaton.replace("На Янтаре, у озера Янтарь") == ("На Yantar, у озера Yantar", 2)
+    assert automaton.replace("Нет терминов") == ("Нет терминов", 0)
+
+
+def test_glossary_protects_and_normalizes_a_term_w_its_variants():
+    glossary = Glossary([(["Янтарь", "Янтаре"], "Yantar", ["Amber"])])
+    placeholder = PLACEHOLDER.format(0)
+
+    assert glossary.protect("Учёные на Янтаре") == f"Учёные на {placeholder}"
+    assert glossary.normalize(f"Scientists at {placeholder} & the Amber lake") == (
+        "Scientists at Yantar & the Yantar lake"
+    )
+    # A variant inside a longer word is left alone
+    assert glossary.normalize("Ambers") == "Ambers"
+
+
+def test_glossary_from_file(tmp_path):
+    filename = tmp_path / "glossary.tsv"
+    filename.write_text(
+        "# Factions\n"
+        "\n"
+        "Долг|Долга|Долгу\tDuty\tDolg|Debt\n"
+        "Свобода\tFreedom\n",
+        encoding="utf-8",
+    )
+
+    glossary = Glossary.from_file(str(filename))
+
+    assert len(glossary.source) == 4
+    assert glossary.normalize(glossary.protect("Бойцы Долга и Свобода")) == "Бойцы Duty и Freedom"
+    assert glossary.normalize("Dolg & Debt") == "Duty & Duty"
+
+
+def test_glossary_from_file_rejects_a_row_w_o_target(tmp_path):
+    filename = tmp_path / "glossary.tsv"
+    filename.write_text("Долг\n", encoding="utf-8")
+
+    with pytest.raises(Exception, match="Invalid Glossary Row format"):
+        Glossary.from_file(str(filename))
@@ -0,0 +1,135 @@
+import os
+import time
+
+import pytest
+
+from packager.constants import SHARD_DIRECTORY
+from packager.segment import Row
+from packager.shards import ShardQueue
+
+SHARD = "corpus-0"
+ROWS = [Row(1, None, "Duty"), Row(2, None, "Freedom")]
+
+
+@pytest.fixture
+def queues(tmp_path):
+    os.makedirs(tmp_path / SHARD_DIRECTORY)
+    return [ShardQueue(str(tmp_path), lease=60.0, worker_id=worker_id) for worker_id in ("A", "B", "C")]
+
+
+def expire(queue: ShardQueue, shard: str = SHARD):
+    time_expired = time.time() - 2 * queue.lease
+    os.utime(queue._lock(shard), (time_expired, time_expired))
+
+
+def filename_translate(queue: ShardQueue) -> str:
+    return os.path.join(queue.dir_shared, f"{SHARD}_translate.txt")
+
+
+def test_claim_is_exclusive_while_the_lease_holds(queues):
+    worker_a, worker_b, _ = queues
+
+    assert worker_a.claim(SHARD)
+    assert not worker_b.claim(SHARD)
+    assert worker_a.renew(SHARD)
+
+
+def test_expired_lease_is_taken_over_by_one_worker(queues):
+    worker_a, worker_b, worker_c = queues
+    assert worker_a.claim(SHARD)
+    expire(worker_a)
+
+    assert worker_b.claim(SHARD)
+    assert not worker_c.claim(SHARD)
+    assert worker_a._lock_owner(SHARD) == "B"
+    assert not os.path.exists(f"{worker_a._lock(SHARD)}.reclaim")
+
+
+def test_takeover_waits_for_a_live_reclaim_guard(queues):
+    worker_a, worker_b, worker_c = queues
+    assert worker_a.claim(SHARD)
+    expire(worker_a)
+    with open(f"{worker_a._lock(SHARD)}.reclaim", "w") as guard_fp:
+        guard_fp.write("C")
+
+    assert not worker_b.claim(SHARD)
+    assert worker_a._lock_owner(SHARD) == "A"
+
+
+def test_stale_reclaim_guard_is_cleared(queues):
+    worker_a, worker_b, _ = queues
+    assert worker_a.claim(SHARD)
+    expire(worker_a)
+    filename_guard = f"{worker_a._lock(SHARD)}.reclaim"
+    with open(filename_guard, "w") as guard_fp:
+        guard_fp.write("C")
+    time_expired = time.time() - 2 * worker_a.lease
+    os.utime(filename_guard, (time_expired, time_expired))
+
+    # The guard of the dead worker is cleared on one attempt & the lease taken over on the next
+    assert not worker_b.claim(SHARD)
+    assert not os.path.exists(filename_guard)
+    assert worker_b.claim(SHARD)
+    assert worker_a._lock_owner(SHARD) == "B"
+
+
+def test_renewed_lock_is_not_removed_as_stale(queues):
+    worker_a, worker_b, _ = queues
+    assert worker_a.claim(SHARD)
+    state_stale = worker_a._read_lock(worker_a._lock(SHARD))
+    state_stale = (state_stale[0] - 2 * worker_a.lease, state_stale[1])
+
+    # The lock was renewed between the age check & the rename - it is put back
+    assert not worker_b._remove_stale(worker_b._lock(SHARD), state_stale)
+    assert worker_a._lock_owner(SHARD) == "A"
+
+
+def test_lost_lease_is_reported_and_its_translation_discarded(queues):
+    worker_a, worker_b, _ = queues
+    assert worker_a.claim(SHARD)
+    expire(worker_a)
+    assert worker_b.claim(SHARD)
+
+    assert not worker_a.renew(SHARD)
+    assert not worker_a.complete(SHARD, ROWS)
+    worker_a.release(SHARD)
+
+    assert worker_a._lock_owner(SHARD) == "B"
+    assert not os.path.exists(filename_translate(worker_a))
+    assert not worker_a.is_done(SHARD)
+    assert worker_b.renew(SHARD)
+
+
+def test_lease_lost_while_writing_keeps_the_new_owners_translation(queues):
+    worker_a, worker_b, _ = queues
+    assert worker_a.claim(SHARD)
+
+    class RowTakenOver(Row):
+        __slots__ = ()
+
+        def format(self) -> str:
+            # B takes the shard over & completes it while A is still writing its translation
+            expire(worker_a)
+            assert worker_b.claim(SHARD)
+            assert worker_b.complete(SHARD, [Row(1, None, "B")])
+            return super().format()
+
+    assert not worker_a.complete(SHARD, [RowTakenOver(1, None, "A")])
+
+    with open(filename_translate(worker_a), "r") as translate_fp:
+        assert translate_fp.read() == "[1] B\n"
+    # A's temporary file is removed
+    assert sorted(os.listdir(worker_a.dir_shared)) == [f"{SHARD}_translate.txt", SHARD_DIRECTORY]
+
+
+def test_complete_marks_the_shard_done_and_releases_it(queues):
+    worker_a, worker_b, _ = queues
+    assert worker_a.claim(SHARD)
+
+    assert worker_a.complete(SHARD, ROWS)
+
+    assert worker_a.is_done(SHARD)
+    assert worker_a._lock_owner(SHARD) is None
+    with open(filename_translate(worker_a), "r") as translate_fp:
+        assert translate_fp.read() == "[1] Duty\n[2] Freedom\n"
+    assert not worker_b.claim(SHARD)
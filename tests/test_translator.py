@@ -0,0 +1,91 @@
+from packager.backends import EchoBackend, HttpJsonBackend
+from packager.constants import CHARACTER_LIMIT, TRANSLATE_BATCH_LIMIT
+from packager.engine import TranslationEngine
+from packager.stub_server import StubServer
+from packager.translator import batch_segments, translate_segments
+
+
+def segments_varied(count: int):
+    # Lengths vary so that batches are closed by either limit
+    return [f"Сталкер {position} " + "x" * (position * 37 % 400) for position in range(count)]
+
+
+class RecordingBackend(EchoBackend):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def translate_batch(self, texts):
+        self.batches.append(list(texts))
+        return [text.upper() for text in texts]
+
+
+def test_batch_segments_keeps_order_within_limits():
+    segments = segments_varied(500)
+
+    batches = batch_segments(segments, character_limit=2000, batch_limit=7)
+
+    assert [position for batch in batches for position in batch] == list(range(len(segments)))
+    for batch in batches:
+        assert len(batch) <= 7
+        assert sum(len(segments[position]) for position in batch) <= 2000
+
+
+def test_batch_segments_sends_an_oversized_segment_alone():
+    segments = ["a", "b" * 50, "c", "d"]
+
+    assert batch_segments(segments, character_limit=10, batch_limit=5) == [[0], [1], [2, 3]]
+
+
+def test_translate_segments_respects_request_limits_in_order():
+    segments = segments_varied(400)
+    backend = RecordingBackend()
+
+    translations = translate_segments(segments, TranslationEngine(backend.translate_batch, concurrency=4))
+
+    assert translations == [segment.upper() for segment in segments]
+    assert len(backend.batches) > 1
+    for texts in backend.batches:
+        assert len(texts) <= TRANSLATE_BATCH_LIMIT
+        assert sum(len(text) for text in texts) <= CHARACTER_LIMIT
+
+
+def test_translate_segments_round_trips_through_the_echo_backend():
+    segments = segments_varied(200)
+
+    assert translate_segments(segments, TranslationEngine(EchoBackend().translate_batch, concurrency=4)) == segments
+
+
+def test_translate_segments_sends_repeated_segments_once():
+    segments = ["Долг", "Свобода", "Долг", "Долг"]
+    backend = RecordingBackend()
+
+    translations = translate_segments(segments, TranslationEngine(backend.translate_batch))
+
+    assert translations == ["ДОЛГ", "СВОБОДА", "ДОЛГ", "ДОЛГ"]
+    assert backend.batches == [["Долг", "Свобода"]]
+
+
+def test_translate_segments_round_trips_through_the_stub_server():
+    segments = segments_varied(300)
+
+    with StubServer(latency=0.001, seed=1) as stub, HttpJsonBackend(stub.url, pool_size=4) as backend:
+        engine = TranslationEngine(backend.translate_batch, concurrency=4)
+        translations = translate_segments(segments, engine)
+
+    assert translations == [segment.upper() for segment in segments]
+    assert stub.stats["requests"] == engine.requests == len(batch_segments(segments))
+    assert stub.stats["texts"] == len(segments)
+
+
+def test_translate_segments_retries_injected_faults():
+    segments = segments_varied(300)
+
+    with StubServer(error_rate=0.2, rate_limit_rate=0.1, retry_after=0.01, seed=7) as stub:
+        with HttpJsonBackend(stub.url, pool_size=4) as backend:
+            engine = TranslationEngine(backend.translate_batch, concurrency=4, max_retries=10, backoff_base=0.01)
+            translations = translate_segments(segments, engine)
+
+    assert translations == [segment.upper() for segment in segments]
+    assert stub.stats["errors"] + stub.stats["rate_limits"] > 0
+    assert engine.retries == stub.stats["errors"] + stub.stats["rate_limits"]
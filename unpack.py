@@ -1,8 +1,15 @@
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 from glob import glob
+from itertools import repeat
 import logging
 import os
+import time
+from typing import Tuple
 
+from packager.incremental import Sidecar
+from packager.metrics import METRICS, collect, profile
+from packager.packer import Packer
 from packager.unpacker import Unpacker
 
 logging.basicConfig(level=logging.INFO)
@@ -56,11 +63,133 @@ def run():
         default=False,
     )
 
+    parser.add_argument(
+        "-jobs",
+        help="Number of Worker Processes Unpacking Files in Parallel",
+        dest="jobs",
+        type=int,
+        default=1,
+    )
+
+    parser.add_argument(
+        "-pack",
+        help="Pack Segments From All Files Into the Fewest Character Limited Partitions w/ a Manifest",
+        dest="pack",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "-incremental",
+        help="Only Unpack Segments Added or Changed Since the Last Repack (Sidecar in -indir)",
+        dest="incremental",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "-jsonl",
+        help="Write One JSONL Record per Segment Instead of Bracket-Prefixed Text (Not w/ -pack)",
+        dest="jsonl",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "-expat",
+        help="Find Text w/ the XML Parser - Malformed XML Falls Back to the Line Regexes (Not w/ -pack)",
+        dest="expat",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "-profile",
+        "--profile",
+        help="Profile the Run (cProfile + tracemalloc) - Writes unpack.prof",
+        dest="profile",
+        action="store_true",
+    )
+
     args = parser.parse_args()
+    if args.pack and args.jsonl:
+        parser.error("-jsonl cannot be used with -pack")
+    if args.pack and args.expat:
+        parser.error("-expat cannot be used with -pack")
+
+    with profile(args.profile, "unpack"):
+        unpack(args)
+    METRICS.report()
+
+
+def unpack(args: argparse.Namespace):
+    filenames = glob(args.input)
+    time_start = time.perf_counter()
+
+    if args.pack:
+        packer = Packer(
+            sorted(filenames),
+            args.output_unpack,
+            args.input_repack,
+            jobs=args.jobs,
+            incremental=args.incremental,
+        )
+        packer.pack()
+        LOGGER.info(f"Packed Files: {len(filenames)} - Elapsed: {time.perf_counter() - time_start:.2f}s")
+        return
+
+    if args.jobs > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            results = []
+            # Worker metrics are recorded in the worker process - fold them back in
+            for result, snapshot in executor.map(
+                collect,
+                repeat(unpack_file),
+                filenames,
+                repeat(args.output_unpack),
+                repeat(args.input_repack),
+                repeat(args.partition),
+                repeat(args.incremental),
+                repeat(args.jsonl),
+                repeat(args.expat),
+            ):
+                results.append(result)
+                METRICS.merge(snapshot)
+    else:
+        results = [
+            unpack_file(
+                filename,
+                args.output_unpack,
+                args.input_repack,
+                args.partition,
+                args.incremental,
+                args.jsonl,
+                args.expat,
+            )
+            for filename in filenames
+        ]
+
+    elapsed = time.perf_counter() - time_start
+    segments = sum(segments for segments, _ in results)
+    characters = sum(characters for _, characters in results)
+    LOGGER.info(
+        f"Unpacked Files: {len(filenames)} - "
+        f"Segments: {segments} - "
+        f"Characters: {characters} - "
+        f"Elapsed: {elapsed:.2f}s - "
+        f"Characters/s: {characters / elapsed if elapsed else 0:.0f}"
+    )
+
 
-    for filename in glob(args.input):
-        unpacker = Unpacker(filename, args.output_unpack, args.input_repack, args.partition)
-        unpacker.unpack()
+def unpack_file(
+    filename: str,
+    output_unpack: str,
+    input_repack: str,
+    partition: bool,
+    incremental: bool = False,
+    jsonl: bool = False,
+    expat: bool = False,
+) -> Tuple[int, int]:
+    # Every file writes only to its own output files - safe to run in separate processes
+    sidecar = Sidecar.for_base(filename, input_repack) if incremental else None
+    unpacker = Unpacker(filename, output_unpack, input_repack, partition, sidecar, jsonl, expat)
+    return unpacker.unpack()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,83 @@
+import argparse
+from glob import glob
+import json
+import logging
+import sys
+
+from packager.metrics import METRICS, profile
+from packager.validator import Validator
+
+logging.basicConfig(level=logging.INFO)
+LOGGER = logging.getLogger(__name__)
+
+
+def type_txt(path: str):
+    filenames = glob(path)
+    for filename in filenames:
+        if not filename.endswith(".txt"):
+            raise argparse.ArgumentTypeError(f"File: {filename} is not a valid TXT file")
+    return path
+
+
+def run():
+    parser = argparse.ArgumentParser(
+        description="Check Translated Text File(s) Against the Unpacked Line Numbers w/o Writing Any Output"
+    )
+    parser.add_argument(
+        "-in-eng",
+        help="English TXT File - Unpacker Output + Manual Translation",
+        dest="input_english",
+        type=type_txt,
+        required=True,
+    )
+    parser.add_argument(
+        "-in-rus",
+        help="Russian TXT File - Unpacker Primary Output",
+        dest="input_russian",
+        type=type_txt,
+        required=True,
+    )
+    parser.add_argument(
+        "-report",
+        help="JSON Report File - Default: Standard Output",
+        dest="report",
+        default=None,
+    )
+    parser.add_argument(
+        "-jobs",
+        help="Number of Worker Processes Checking Files in Parallel",
+        dest="jobs",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "-profile",
+        "--profile",
+        help="Profile the Run (cProfile + tracemalloc) - Writes validate.prof",
+        dest="profile",
+        action="store_true",
+    )
+
+    args = parser.parse_args()
+
+    try:
+        with profile(args.profile, "validate"):
+            validator = Validator(glob(args.input_english), glob(args.input_russian), args.jobs)
+            report = validator.validate()
+    finally:
+        METRICS.report()
+
+    if args.report is None:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=1)
+        sys.stdout.write("\n")
+    else:
+        with open(args.report, "w", encoding="utf-8") as report_fp:
+            json.dump(report, report_fp, ensure_ascii=False, indent=1)
+        LOGGER.info(f"Report: {args.report}")
+
+    # A batch w/ any issue fails the check
+    sys.exit(0 if report["valid"] else 1)
+
+
+if __name__ == "__main__":
+    run()